@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Offline micro-benchmarks for the scraping, image and caption hot paths.
+
+Every benchmark runs against the saved fixtures in benchmarks/fixtures/, so
+no network access is needed and results are comparable between runs:
+
+    python benchmarks/bench.py                     # run everything
+    python benchmarks/bench.py -k parse            # only names containing "parse"
+    python benchmarks/bench.py --json after.json --compare before.json
+
+Each benchmark reports throughput (ops/sec, mean time per op) and memory
+per op measured with tracemalloc: the peak allocated during one op and the
+amount still held once it returns.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from unittest import mock
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(BENCH_DIR, 'fixtures')
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fallen.records import HeroRecord
+from fallen.scripts import load_script
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a benchmark factory. The factory returns the callable to time."""
+    def register(factory):
+        BENCHMARKS.append((name, factory))
+        return factory
+    return register
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURES, name)
+
+
+def read_fixture(name, mode='r'):
+    with open(fixture_path(name), mode) as f:
+        return f.read()
+
+
+class FixtureResponse:
+    """Minimal stand-in for requests.Response serving a fixture"""
+
+    def __init__(self, body, content_type='text/html; charset=utf-8'):
+        self.content = body.encode('utf-8') if isinstance(body, str) else body
+        self.text = body if isinstance(body, str) else body.decode('latin-1')
+        self.status_code = 200
+        self.headers = {'content-type': content_type}
+
+    def iter_content(self, chunk_size=8192):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+def serve(response):
+    return lambda *args, **kwargs: response
+
+
+SEARCH_DATE = datetime(2005, 10, 20)
+WORK_DIR = tempfile.mkdtemp(prefix='fallen-bench-')
+
+
+# --- Search page parsing -------------------------------------------------
+
+def search_benchmark(script, method, fixture):
+    def factory():
+        module = load_script(script)
+        scraper = module.MilitaryTimesScraper()
+        scraper.session.get = serve(FixtureResponse(read_fixture(fixture)))
+        return lambda: getattr(scraper, method)(SEARCH_DATE)
+    return factory
+
+
+for fixture in ('search_many.html', 'search_typical.html'):
+    label = fixture[:-5]
+    benchmark(f"parse.{label}[service-all]")(search_benchmark('service-all-fb', 'get_fallen_service_members', fixture))
+    benchmark(f"parse.{label}[soldier-basic]")(search_benchmark('soldier-fb', 'get_fallen_service_members_basic', fixture))
+    benchmark(f"parse.{label}[soldier]")(search_benchmark('soldier-fb', 'get_fallen_service_members', fixture))
+
+
+@benchmark("parse.search_many[query-fallen]")
+def _():
+    module = load_script('query-fallen')
+    get = serve(FixtureResponse(read_fixture('search_many.html')))
+
+    def run():
+        with mock.patch.object(module.transport, 'get', get):
+            return module.get_fallen_service_members(SEARCH_DATE)
+    return run
+
+
+# --- Profile extraction ----------------------------------------------------
+
+def profile_benchmark(script, fixture):
+    def factory():
+        module = load_script(script)
+        scraper = module.MilitaryTimesScraper()
+        scraper.session.get = serve(FixtureResponse(read_fixture(fixture)))
+        # Undecorated: the coalesced method would time a cache hit after the first op
+        scrape = module.MilitaryTimesScraper.scrape_hero_profile.__wrapped__
+        return lambda: scrape(scraper, 'https://thefallen.militarytimes.com/bench/1')
+    return factory
+
+
+for fixture in ('profile_typical.html', 'profile_no_photo.html'):
+    label = fixture[:-5]
+    benchmark(f"extract.{label}[service-all]")(profile_benchmark('service-all-fb', fixture))
+    benchmark(f"extract.{label}[soldier]")(profile_benchmark('soldier-fb', fixture))
+
+
+@benchmark("extract.profile_typical[query-fallen]")
+def _():
+    module = load_script('query-fallen')
+    get = serve(FixtureResponse(read_fixture('profile_typical.html')))
+    extract = module.get_detailed_service_member_info.__wrapped__  # Without the coalescing cache
+
+    def run():
+        with mock.patch.object(module.transport, 'get', get):
+            return extract('/bench/1')
+    return run
+
+
+# --- Image work --------------------------------------------------------------
+
+def optimize_benchmark(script, processor_class, fixture):
+    def factory():
+        module = load_script(script)
+        processor = getattr(module, processor_class)(download_dir=WORK_DIR)
+        source = fixture_path(fixture)
+        target = os.path.join(WORK_DIR, f"optimize_{script}_{fixture}")
+
+        def run():
+            shutil.copyfile(source, target)  # optimize_image rewrites the file in place
+            processor.optimize_image(target)
+        return run
+    return factory
+
+
+for fixture in ('portrait_small.jpg', 'portrait_large.jpg'):
+    label = fixture[:-4]
+    benchmark(f"image.optimize_{label}[service-all]")(optimize_benchmark('service-all-fb', 'ImageProcessor', fixture))
+    benchmark(f"image.optimize_{label}[soldier]")(optimize_benchmark('soldier-fb', 'ImageDownloader', fixture))
+
+
+@benchmark("image.placeholder[service-all]")
+def _():
+    processor = load_script('service-all-fb').ImageProcessor(download_dir=WORK_DIR)
+    hero = {'name': 'Marine Staff Sgt. Jimmy J. Arroyave'}
+    target = os.path.join(WORK_DIR, 'placeholder_service_all.jpg')
+    return lambda: processor.create_placeholder_image(hero, target)
+
+
+@benchmark("image.placeholder[soldier]")
+def _():
+    downloader = load_script('soldier-fb').ImageDownloader(download_dir=WORK_DIR)
+    target = os.path.join(WORK_DIR, 'placeholder_soldier.jpg')
+    return lambda: downloader.create_placeholder_image('Marine Staff Sgt. Jimmy J. Arroyave', target)
+
+
+@benchmark("image.original_size[query-fallen]")
+def _():
+    module = load_script('query-fallen')
+    data = read_fixture('portrait_small.jpg', 'rb')
+    return lambda: module.process_image_original_size(data)
+
+
+# --- Caption builders --------------------------------------------------------
+
+def sample_heroes(count):
+    branches = ['U.S. Army', 'U.S. Marines', 'U.S. Navy', 'U.S. Air Force']
+    return [HeroRecord({
+        'name': f"Army Staff Sgt. Example Hero {i}",
+        'date_of_death': f"October 20, {2003 + i % 18}",
+        'branch': branches[i % len(branches)],
+        'location': 'Iraq' if i % 2 else 'Afghanistan',
+        'age': str(19 + i % 20),
+        'hometown': 'Morgantown, KY',
+        'unit': '617th Military Police Company',
+        'circumstances': 'Killed in action when an improvised explosive device detonated near his vehicle.',
+        'profile_url': f"https://thefallen.militarytimes.com/example-hero/{i}",
+        'year': 2003 + i % 18
+    }) for i in range(count)]
+
+
+@benchmark("caption.comprehensive_75[service-all]")
+def _():
+    poster = load_script('service-all-fb').FacebookMultiPoster(None, None, exchange_token=False)
+    heroes = sample_heroes(75)
+    return lambda: poster.create_comprehensive_post_text(heroes, SEARCH_DATE)
+
+
+@benchmark("caption.memorial[soldier]")
+def _():
+    poster = load_script('soldier-fb').FacebookPoster(None, None, exchange_token=False)
+    hero = sample_heroes(1)[0]
+    return lambda: poster.create_memorial_text(hero)
+
+
+@benchmark("caption.individual[query-fallen]")
+def _():
+    module = load_script('query-fallen')
+    hero = sample_heroes(1)[0]
+    person = {'name': hero['name'], 'date': hero['date_of_death'], 'link': hero['profile_url']}
+    details = dict(hero, full_name_with_rank=hero['name'], operation='Operation Iraqi Freedom',
+                   formatted_date=hero['date_of_death'], death_location='Baghdad, Iraq')
+    return lambda: module.create_individual_hero_caption(person, details, 1, 1)
+
+
+# --- Runner -------------------------------------------------------------------
+
+def measure(func, min_time, alloc_runs):
+    """Time func until min_time has elapsed, then sample its memory use"""
+    func()  # Warm-up: first-call imports, font loading, regex caches
+
+    iterations = 0
+    elapsed = 0.0
+    batch = 1
+    while elapsed < min_time:
+        start = time.perf_counter()
+        for _ in range(batch):
+            func()
+        elapsed += time.perf_counter() - start
+        iterations += batch
+        batch = min(batch * 2, 1000)
+
+    peak = retained = 0
+    tracemalloc.start()
+    for _ in range(alloc_runs):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = func()
+        current, run_peak = tracemalloc.get_traced_memory()
+        del result
+        peak = max(peak, run_peak - before)
+        retained = max(retained, current - before)
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'ops_per_sec': iterations / elapsed,
+        'mean_us': elapsed / iterations * 1e6,
+        'peak_kib': peak / 1024,
+        'retained_kib': retained / 1024
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline micro-benchmarks for Fallen Heroes hot paths")
+    parser.add_argument('-k', '--filter', default='', help="only run benchmarks whose name contains this")
+    parser.add_argument('--min-time', type=float, default=1.0, help="seconds to spend timing each benchmark")
+    parser.add_argument('--alloc-runs', type=int, default=3, help="ops sampled under tracemalloc")
+    parser.add_argument('--json', metavar='PATH', help="write results as JSON")
+    parser.add_argument('--compare', metavar='PATH', help="JSON results from an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    selected = [(name, factory) for name, factory in BENCHMARKS if args.filter in name]
+    header = f"{'benchmark':<42} {'ops/sec':>10} {'mean':>11} {'peak KiB':>9} {'kept KiB':>9}"
+    if baseline:
+        header += f" {'vs base':>8}"
+    print(header)
+    print('-' * len(header))
+
+    results = {}
+    for name, factory in selected:
+        # The scripts print progress for every entry; keep that out of the timings
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            func = factory()
+            result = measure(func, args.min_time, args.alloc_runs)
+        results[name] = result
+
+        line = (f"{name:<42} {result['ops_per_sec']:>10.1f} {result['mean_us'] / 1000:>9.3f}ms "
+                f"{result['peak_kib']:>9.1f} {result['retained_kib']:>9.1f}")
+        if name in baseline:
+            change = result['ops_per_sec'] / baseline[name]['ops_per_sec'] - 1
+            line += f" {change:>+7.1%}"
+        print(line)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'python': sys.version.split()[0],
+                'results': results
+            }, f, indent=2)
+        print(f"\nSaved results to {args.json}")
+
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
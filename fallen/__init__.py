@@ -0,0 +1,6 @@
+"""
+Shared helpers for the Fallen Heroes memorial scripts.
+
+The top-level scripts (query-fallen.py, soldier-fb.py, service-all-fb.py)
+stay runnable on their own; anything they need in common lives here.
+"""
@@ -0,0 +1,7 @@
+"""python -m fallen: see fallen/cli.py"""
+
+import sys
+
+from fallen.cli import main
+
+sys.exit(main())
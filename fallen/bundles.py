@@ -0,0 +1,179 @@
+"""
+Precomputed post bundles.
+
+A bundle is everything needed to publish one day's post without touching
+Military Times: the final post text, the optimized images and the selected
+hero(es). Bundles are written ahead of time by the scripts' --precompute
+mode and picked up by the scheduled publish run.
+
+Layout:
+    <BUNDLE_DIR>/<script>/<YYYY-MM-DD>/bundle.json
+    <BUNDLE_DIR>/<script>/<YYYY-MM-DD>/*.jpg
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime, timedelta
+
+from fallen import clock, metrics, records
+
+BUNDLE_DIR = os.getenv('BUNDLE_DIR', 'precomputed')
+BUNDLE_VERSION = 1
+# Bundles older than this are re-scraped live (profile data or photos may have changed)
+BUNDLE_MAX_AGE_DAYS = int(os.getenv('BUNDLE_MAX_AGE_DAYS', '45'))
+
+
+def bundle_dir(script, date):
+    """Directory holding the bundle for a script and date"""
+    return os.path.join(BUNDLE_DIR, script, date.strftime('%Y-%m-%d'))
+
+
+def upcoming_dates(days, start=None):
+    """The next `days` dates, starting tomorrow unless `start` is given"""
+    if start is None:
+        start = clock.now() + timedelta(days=1)
+    return [start + timedelta(days=offset) for offset in range(days)]
+
+
+def prepare_bundle_dir(script, date):
+    """Create an empty bundle directory, discarding any previous bundle"""
+    path = bundle_dir(script, date)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def prune_bundles(script, before=None):
+    """
+    Delete a script's bundles dated before `before` (today by default).
+    Their day has passed, so they will never be published. Returns the
+    number removed.
+    """
+    cutoff = (before or clock.now()).strftime('%Y-%m-%d')
+    root = os.path.join(BUNDLE_DIR, script)
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    for name in sorted(os.listdir(root)):
+        try:
+            datetime.strptime(name, '%Y-%m-%d')
+        except ValueError:
+            continue  # Not a bundle directory
+        if name < cutoff:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"🧹 Removed {removed} past {script} bundle(s)")
+    return removed
+
+
+def save_bundle(script, date, payload, files):
+    """
+    Write bundle.json for a script and date.
+
+    payload is the script-specific, JSON-serializable content. files lists
+    the image files (inside the bundle directory) the payload refers to;
+    they are checked again when the bundle is loaded.
+    """
+    path = bundle_dir(script, date)
+    bundle = {
+        'version': BUNDLE_VERSION,
+        'script': script,
+        'date': date.strftime('%Y-%m-%d'),
+        'created_at': clock.now().isoformat(timespec='seconds'),
+        'files': [os.path.basename(f) for f in files],
+        'payload': payload
+    }
+
+    _write_bundle(path, bundle)
+    print(f"💾 Saved {script} bundle for {bundle['date']} ({len(bundle['files'])} images)")
+    return path
+
+
+def _write_bundle(path, bundle):
+    # Write atomically so a crashed precompute never leaves a half-written bundle
+    tmp_path = os.path.join(path, 'bundle.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(bundle, f, indent=2, default=records.json_default)
+    os.replace(tmp_path, os.path.join(path, 'bundle.json'))
+
+
+def _read_bundle(script, date):
+    """The raw bundle.json for a script and date, or None; no freshness checks"""
+    try:
+        with open(os.path.join(bundle_dir(script, date), 'bundle.json'), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def mark_scheduled(script, date, post_ids):
+    """
+    Record in a date's bundle that its post(s) were submitted as scheduled
+    posts, so the run on that date doesn't publish them a second time.
+    """
+    bundle = _read_bundle(script, date)
+    if bundle is None:
+        print(f"⚠️ No {script} bundle for {date.strftime('%Y-%m-%d')} to mark as scheduled")
+        return
+    bundle['payload']['scheduled_post_ids'] = list(post_ids)
+    _write_bundle(bundle_dir(script, date), bundle)
+
+
+def scheduled_post_ids(script, date):
+    """
+    IDs of the scheduled posts a date's bundle went out as, or [] if it was
+    never scheduled. Read even from a stale bundle: posts are scheduled up
+    to 75 days ahead, longer than BUNDLE_MAX_AGE_DAYS.
+    """
+    bundle = _read_bundle(script, date)
+    return (bundle or {}).get('payload', {}).get('scheduled_post_ids') or []
+
+
+def load_bundle(script, date):
+    """
+    Load a ready-to-publish bundle, or None if it is missing or stale.
+
+    Returns (payload, bundle_path). Image paths inside the payload are
+    relative to bundle_path.
+    """
+    path = bundle_dir(script, date)
+    bundle_file = os.path.join(path, 'bundle.json')
+    label = f"{script} bundle for {date.strftime('%Y-%m-%d')}"
+
+    if not os.path.exists(bundle_file):
+        print(f"ℹ️ No precomputed {label}")
+        metrics.cache_miss('bundle')
+        return None, path
+
+    try:
+        with open(bundle_file, 'r') as f:
+            bundle = json.load(f)
+    except Exception as e:
+        print(f"⚠️ Could not read {label}: {e}")
+        metrics.cache_miss('bundle')
+        return None, path
+
+    if bundle.get('version') != BUNDLE_VERSION or bundle.get('script') != script:
+        print(f"⚠️ Ignoring {label}: incompatible bundle version")
+        metrics.cache_miss('bundle')
+        return None, path
+
+    created_at = datetime.fromisoformat(bundle.get('created_at', '1970-01-01T00:00:00'))
+    # A scheduled bundle is already on the page, so it is never re-scraped
+    scheduled = bundle['payload'].get('scheduled_post_ids')
+    if not scheduled and clock.now() - created_at > timedelta(days=BUNDLE_MAX_AGE_DAYS):
+        print(f"⚠️ Ignoring stale {label} (created {created_at:%Y-%m-%d})")
+        metrics.cache_miss('bundle')
+        return None, path
+
+    missing = [f for f in bundle.get('files', []) if not os.path.exists(os.path.join(path, f))]
+    if missing:
+        print(f"⚠️ Ignoring {label}: {len(missing)} image(s) missing")
+        metrics.cache_miss('bundle')
+        return None, path
+
+    print(f"📦 Using precomputed {label} (created {created_at:%Y-%m-%d %H:%M})")
+    metrics.cache_hit('bundle')
+    return bundle['payload'], path
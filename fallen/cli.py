@@ -0,0 +1,362 @@
+"""
+Single command-line entry point for the memorial tools.
+
+    python -m fallen search [--date YYYY-MM-DD] [--json]     list the heroes for a date
+    python -m fallen select [--date YYYY-MM-DD]              pick today's hero, no posting
+    python -m fallen render soldier-fb --days 7              precompute images and captions
+    python -m fallen publish service-all-fb [--schedule 7]   run a poster exactly as its script
+    python -m fallen crawl --from 2003-03-20 -o heroes.json  search every day in a range
+    python -m fallen crawl --shard 0/4 -o part0.json         one shard of a backfill (merge with roster --merge)
+    python -m fallen check                                   verify the Facebook credentials
+    python -m fallen bench [-k parse] | bench --startup      micro-benchmarks / cold-start times
+    python -m fallen snapshot export|import|verify           carry state between CI runs
+    python -m fallen roster --branch marines --state TX --today   query heroes already scraped
+
+Nothing heavy is imported until a command runs, and then only what that
+command needs: the scripts themselves defer Pillow, numpy and BeautifulSoup,
+and the posters also defer requests until their first HTTP call
+(fallen/lazy.py). Imports are timed as the `import` stage of the run report,
+and `bench --startup` measures whole cold starts per command in fresh
+interpreters.
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+from fallen import metrics, records
+
+STARTUP_RUNS = 5
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d')
+
+
+def parse_shard(value):
+    """'INDEX/COUNT' -> (index, count), with 0 <= index < count"""
+    index, count = (int(part) for part in value.split('/'))
+    if not 0 <= index < count:
+        raise ValueError(value)
+    return index, count
+
+
+def load(script):
+    """Import one of the top-level scripts, timed as an import"""
+    from fallen.scripts import load_script
+    with metrics.stage('import', module=script):
+        return load_script(script)
+
+
+# --- Commands -----------------------------------------------------------------
+#
+# Each command is a pair: prepare(args) does the imports and returns whatever
+# run(args, prepared) needs. `bench --startup` runs prepare() alone to time it.
+
+def prepare_search(args):
+    return load('soldier-fb').MilitaryTimesScraper()
+
+
+def run_search(args, scraper):
+    from fallen import clock, throttle
+
+    target = args.date or clock.now()
+    dates = []
+    for year in range(2003, clock.now().year + 1):
+        try:
+            dates.append(target.replace(year=year))
+        except ValueError:
+            continue  # Feb 29 in a non-leap year
+
+    heroes = []
+    for date, found in zip(dates, throttle.gather(scraper.get_fallen_service_members_basic, dates)):
+        for hero in found:
+            hero['year'] = date.year
+            heroes.append(hero)
+
+    if args.json:
+        print(json.dumps(heroes, indent=2, default=records.json_default))
+    else:
+        for hero in heroes:
+            print(f"{hero['year']}  {hero['name']}  {hero['link']}")
+        print(f"\n{len(heroes)} hero(s) for {target.strftime('%B %d')}")
+    return 0
+
+
+def prepare_select(args):
+    return load('soldier-fb').MilitaryTimesScraper()
+
+
+def run_select(args, scraper):
+    from fallen import clock
+
+    hero = scraper.get_single_hero_for_date(args.date or clock.now())
+    if not hero:
+        return 1
+    print(json.dumps(hero, indent=2, default=records.json_default))
+    return 0
+
+
+def prepare_render(args):
+    return load(args.script)
+
+
+def run_render(args, module):
+    module.precompute(args.days, args.start)
+    return 0
+
+
+def prepare_publish(args):
+    return load(args.script)
+
+
+def run_publish(args, module):
+    # The script parses its own flags, exactly as when run directly
+    sys.argv = [f"{args.script}.py"] + args.script_args
+    return module.main()
+
+
+def prepare_crawl(args):
+    return load('query-fallen')
+
+
+def run_crawl(args, module):
+    from datetime import timedelta
+    from fallen import clock, parse_pool, priority, shards
+
+    end = args.end or clock.now()
+    if args.shard:
+        index, count = args.shard
+        days = [args.start + timedelta(days=offset) for offset in range((end - args.start).days + 1)]
+        days = shards.shard_days(days, index, count)
+        print(f"[*] Shard {index}/{count}: {len(days)} of the days from {args.start:%m/%d/%Y} to {end:%m/%d/%Y}")
+        with parse_pool.start(args.parse_workers), priority.level(priority.BACKFILL):
+            heroes = module.search_days(days)
+        shards.write_partial(args.output or shards.default_path(index, count), heroes,
+                             index, count, args.start, end, len(days))
+        return 0
+
+    with parse_pool.start(args.parse_workers), priority.level(priority.BACKFILL):
+        heroes = module.search_comprehensive_range(args.start, end)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(heroes, f, indent=2, default=records.json_default)
+        print(f"💾 Saved {len(heroes)} heroes to {args.output}")
+    else:
+        print(json.dumps(heroes, indent=2, default=records.json_default))
+    return 0
+
+
+def prepare_check(args):
+    return load('query-fallen')
+
+
+def run_check(args, module):
+    return 0 if module.test_facebook_credentials() else 1
+
+
+def prepare_bench(args):
+    return None
+
+
+def run_bench(args, _):
+    if args.startup:
+        return startup_times(args.runs)
+
+    from fallen.scripts import REPO_DIR
+    sys.argv = ['bench.py'] + args.bench_args
+    sys.path.insert(0, os.path.join(REPO_DIR, 'benchmarks'))
+    import bench
+    bench.main()
+    return 0
+
+
+def prepare_snapshot(args):
+    from fallen import snapshot
+    return snapshot
+
+
+def run_snapshot(args, snapshot):
+    if args.action == 'export':
+        snapshot.export(args.dir)
+        return 0
+    if args.action == 'import':
+        snapshot.restore(args.dir)
+        return 0
+    return 0 if snapshot.verify(args.dir) else 1
+
+
+def prepare_roster(args):
+    from fallen import roster
+    return roster.load()
+
+
+def run_roster(args, index):
+    import time
+    from fallen import clock, roster
+
+    if args.merge:
+        from fallen import shards
+        shards.merge(args.merge, index)
+        return 0
+
+    if args.facets:
+        for value, count in index.facets(args.facets).items():
+            print(f"{count:>6}  {value}")
+        return 0
+
+    month_day = args.month_day
+    if args.today:
+        month_day = clock.now().strftime('%m-%d')
+    filters = {field: getattr(args, field) for field in roster.INDEXED_FIELDS + roster.WORD_FIELDS
+               if field != 'month_day'}
+    start = time.perf_counter()
+    heroes = index.query(month_day=month_day, **filters)
+    elapsed = time.perf_counter() - start
+
+    if args.json:
+        print(json.dumps(heroes, indent=2, default=records.json_default))
+    else:
+        for hero in heroes:
+            print(f"{hero['date'] or '?':<10}  {hero['rank']} {hero['name']}  {hero['hometown']}  {hero['unit']}")
+        print(f"\n{len(heroes)} of {len(index.records)} hero(s) in {elapsed * 1000:.1f}ms")
+    return 0
+
+
+COMMANDS = {
+    'search': (prepare_search, run_search),
+    'select': (prepare_select, run_select),
+    'render': (prepare_render, run_render),
+    'publish': (prepare_publish, run_publish),
+    'crawl': (prepare_crawl, run_crawl),
+    'check': (prepare_check, run_check),
+    'bench': (prepare_bench, run_bench),
+    'snapshot': (prepare_snapshot, run_snapshot),
+    'roster': (prepare_roster, run_roster),
+}
+
+# Minimal arguments for timing each command's imports in `bench --startup`
+STARTUP_ARGS = {
+    'search': ['search'],
+    'select': ['select'],
+    'render': ['render', 'service-all-fb'],
+    'publish': ['publish', 'service-all-fb'],
+    'crawl': ['crawl'],
+    'check': ['check'],
+    'bench': ['bench'],
+    'snapshot': ['snapshot', 'verify'],
+    'roster': ['roster'],
+}
+
+
+def startup_times(runs):
+    """Time `--imports-only` cold starts of every command in fresh interpreters"""
+    import statistics
+    import subprocess
+    import time
+    from fallen.scripts import REPO_DIR
+
+    print(f"{'command':<10} {'median':>9} {'min':>9}   slowest imports (cumulative)")
+    print('-' * 78)
+    for command, argv in STARTUP_ARGS.items():
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'fallen', '--imports-only'] + argv,
+                                    cwd=REPO_DIR, capture_output=True, text=True,
+                                    env=dict(os.environ, RUN_REPORT='false'))
+            timings.append(time.perf_counter() - start)
+
+        slowest = sorted(parse_importtime(result.stderr), key=lambda item: -item[1])
+        top = ', '.join(f"{name} {us / 1000:.0f}ms" for name, us in slowest[:3])
+        print(f"{command:<10} {statistics.median(timings) * 1000:>7.0f}ms {min(timings) * 1000:>7.0f}ms   {top}")
+    return 0
+
+
+def parse_importtime(stderr):
+    """(module, cumulative microseconds) for each top-level line of -X importtime output"""
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):  # Skip modules imported by other modules
+            yield name.strip(), int(cumulative)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m fallen', description="Fallen Heroes memorial tools")
+    parser.add_argument('--imports-only', action='store_true', help=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    search = commands.add_parser('search', help="list every hero for a date across all years")
+    search.add_argument('--date', type=parse_date, help="YYYY-MM-DD (default today)")
+    search.add_argument('--json', action='store_true', help="print JSON instead of a table")
+
+    select = commands.add_parser('select', help="pick a hero the way soldier-fb does, without posting")
+    select.add_argument('--date', type=parse_date, help="YYYY-MM-DD (default today)")
+
+    render = commands.add_parser('render', help="precompute images and captions for upcoming days")
+    render.add_argument('script', choices=['soldier-fb', 'service-all-fb'])
+    render.add_argument('--days', type=int, default=1, help="how many days to render (default 1)")
+    render.add_argument('--start', type=parse_date, help="first day, YYYY-MM-DD (default tomorrow)")
+
+    publish = commands.add_parser('publish', help="run one of the posting scripts")
+    publish.add_argument('script', choices=['query-fallen', 'soldier-fb', 'service-all-fb'])
+    publish.add_argument('script_args', nargs=argparse.REMAINDER, help="passed through to the script")
+
+    crawl = commands.add_parser('crawl', help="search every day in a date range")
+    crawl.add_argument('--from', dest='start', type=parse_date, default=datetime(2003, 3, 20),
+                       help="first day, YYYY-MM-DD (default 2003-03-20)")
+    crawl.add_argument('--to', dest='end', type=parse_date, help="last day, YYYY-MM-DD (default today)")
+    crawl.add_argument('-o', '--output', help="write the heroes as JSON to this file")
+    crawl.add_argument('--parse-workers', type=int,
+                       help="parse search pages in this many processes (default PARSE_WORKERS, 0 = in-thread)")
+    crawl.add_argument('--shard', type=parse_shard, metavar='INDEX/COUNT',
+                       help="search only this shard's months, e.g. 0/4, and write a partial roster to -o")
+
+    commands.add_parser('check', help="verify FB_ACCESS_TOKEN and FB_PAGE_ID against the Graph API")
+
+    bench = commands.add_parser('bench', help="run benchmarks/bench.py, or time cold starts")
+    bench.add_argument('--startup', action='store_true', help="time each command's imports in fresh interpreters")
+    bench.add_argument('--runs', type=int, default=STARTUP_RUNS, help="cold starts per command (default 5)")
+    bench.add_argument('bench_args', nargs=argparse.REMAINDER, help="passed through to bench.py")
+
+    snapshot = commands.add_parser('snapshot', help="export, import or verify the state snapshot")
+    snapshot.add_argument('action', choices=['export', 'import', 'verify'])
+    snapshot.add_argument('--dir', default=os.getenv('SNAPSHOT_DIR', '.fallen-snapshot'),
+                          help="snapshot directory (default SNAPSHOT_DIR or .fallen-snapshot)")
+
+    roster = commands.add_parser('roster', help="query heroes already scraped, by branch, state, unit...")
+    roster.add_argument('--branch', help="e.g. army, marines, 'air force'")
+    roster.add_argument('--state', help="home state, by name or postal code")
+    roster.add_argument('--country', help="country of death, e.g. Iraq")
+    roster.add_argument('--operation', help="e.g. 'Enduring Freedom'")
+    roster.add_argument('--year', help="year of death")
+    roster.add_argument('--month-day', help="MM-DD of death")
+    roster.add_argument('--today', action='store_true', help="died on today's month and day")
+    roster.add_argument('--unit', help="words that must all appear in the unit")
+    roster.add_argument('--hometown', help="words that must all appear in the hometown")
+    roster.add_argument('--location', help="words that must all appear in the place of death")
+    roster.add_argument('--facets', choices=['branch', 'state', 'country', 'operation', 'year'],
+                        help="count heroes per value of a field instead")
+    roster.add_argument('--json', action='store_true', help="print JSON instead of a table")
+    roster.add_argument('--merge', nargs='+', metavar='FILE', help="merge partial rosters from crawl --shard")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    prepare, run = COMMANDS[args.command]
+
+    if args.imports_only:
+        prepare(args)
+        return 0
+
+    metrics.start(args.script if args.command == 'publish' else f"fallen-{args.command}")
+    if args.command not in ('bench', 'snapshot'):
+        from fallen import snapshot
+        snapshot.restore_at_startup()
+    prepared = prepare(args)
+    return metrics.finish(run(args, prepared))
@@ -0,0 +1,26 @@
+"""
+The date the scripts treat as "today".
+
+RUN_DATE=YYYY-MM-DD pins it (for reruns and testing); replaying an HTTP
+cassette pins it to the day the cassette was recorded. Otherwise it is
+simply datetime.now().
+"""
+
+import os
+from datetime import datetime
+
+# Set by fallen.transport when replaying a cassette
+frozen = None
+
+
+def now():
+    """Current datetime, with the date replaced by RUN_DATE or the replayed date"""
+    if frozen is None and os.getenv('HTTP_CASSETTE'):
+        # The scripts import transport lazily; load the cassette before answering
+        from fallen import transport
+    current = datetime.now()
+    pinned = frozen or os.getenv('RUN_DATE')
+    if pinned:
+        day = datetime.strptime(pinned, '%Y-%m-%d')
+        return current.replace(year=day.year, month=day.month, day=day.day)
+    return current
@@ -0,0 +1,34 @@
+"""
+Base URLs for every external service the scripts talk to.
+
+By default these are the real Military Times, S3 and Graph API hosts. Each
+can be overridden on its own (MILITARY_TIMES_URL, S3_URL, GRAPH_API_URL), or
+USE_MOCK_SERVERS=true points all three at the local stand-ins started with
+`python -m fallen.mock_servers` (see that module for ports).
+"""
+
+import os
+
+MOCK_HOST = os.getenv('MOCK_HOST', '127.0.0.1')
+MOCK_PORT = int(os.getenv('MOCK_PORT', '8700'))
+USE_MOCK_SERVERS = os.getenv('USE_MOCK_SERVERS', 'false').lower() == 'true'
+
+if USE_MOCK_SERVERS:
+    _defaults = {
+        'MILITARY_TIMES_URL': f"http://{MOCK_HOST}:{MOCK_PORT}",
+        'S3_URL': f"http://{MOCK_HOST}:{MOCK_PORT + 1}/",
+        'GRAPH_API_URL': f"http://{MOCK_HOST}:{MOCK_PORT + 2}/v18.0",
+    }
+else:
+    _defaults = {
+        'MILITARY_TIMES_URL': "https://thefallen.militarytimes.com",
+        'S3_URL': "https://s3.amazonaws.com/",
+        'GRAPH_API_URL': "https://graph.facebook.com/v18.0",
+    }
+
+# No trailing slash: profile links are appended as "/slug/id"
+MILITARY_TIMES_URL = os.getenv('MILITARY_TIMES_URL', _defaults['MILITARY_TIMES_URL']).rstrip('/')
+# Trailing slash kept so startswith() checks only match this host
+S3_URL = os.getenv('S3_URL', _defaults['S3_URL']).rstrip('/') + '/'
+S3_FALLEN_PREFIX = f"{S3_URL}static.militarytimes.com/thefallen/"
+GRAPH_API_URL = os.getenv('GRAPH_API_URL', _defaults['GRAPH_API_URL']).rstrip('/')
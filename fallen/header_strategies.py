@@ -0,0 +1,94 @@
+"""
+Learned request-header profiles, per host and path prefix.
+
+Some image hosts answer 403 unless the request looks a particular way. The
+answer is the same for every image under a prefix, so instead of working
+down the fallback cascade for every hero, the profile that last succeeded
+is remembered and tried first:
+
+    for profile in header_strategies.registry.order(url, ['browser', 'minimal', 'referer']):
+        response = fetch(url, profile)
+        if response.status_code != 403:
+            break
+    if response.status_code == 200:
+        header_strategies.registry.succeeded(url, profile)
+
+The table is kept in the state directory (fallen.state), so it survives
+between runs and travels with the CI snapshot. A learned profile that
+starts failing is simply outranked by whichever profile succeeds next.
+"""
+
+import json
+import os
+import threading
+from urllib.parse import urlsplit
+
+from fallen import clock, metrics, state
+
+HEADER_STRATEGY_FILE = 'header_strategies.json'
+PATH_PREFIX_DEPTH = 2  # Path segments that make up a prefix, e.g. /static.militarytimes.com/thefallen
+
+
+def prefix_key(url):
+    """'host/first/segments' that a learned profile applies to"""
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split('/') if segment][:PATH_PREFIX_DEPTH]
+    return '/'.join([parts.netloc] + segments)
+
+
+class HeaderStrategyRegistry:
+    """Which header profile last worked for each host and path prefix"""
+
+    def __init__(self, filename=HEADER_STRATEGY_FILE):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.entries = None  # Loaded on first use
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        self.entries = {}
+        path = os.path.join(state.STATE_DIR, self.filename)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, 'r') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read learned header profiles: {e}")
+
+    def _save(self):
+        try:
+            state.write_json(state.state_path(self.filename), self.entries, indent=2, sort_keys=True)
+        except OSError as e:
+            print(f"⚠️ Could not save learned header profiles: {e}")
+
+    def learned(self, url):
+        """The profile that last succeeded for url's prefix, or None"""
+        with self.lock:
+            self._load()
+            entry = self.entries.get(prefix_key(url))
+            return entry['profile'] if entry else None
+
+    def order(self, url, profiles):
+        """profiles with the learned one (if any) moved to the front"""
+        best = self.learned(url)
+        if best in profiles:
+            metrics.count('header_profile_learned')
+            return [best] + [profile for profile in profiles if profile != best]
+        return list(profiles)
+
+    def succeeded(self, url, profile):
+        """Remember that profile worked for url's prefix"""
+        key = prefix_key(url)
+        with self.lock:
+            self._load()
+            entry = self.entries.get(key)
+            if entry and entry['profile'] == profile:
+                return
+            self.entries[key] = {'profile': profile, 'learned_on': clock.now().strftime('%Y-%m-%d')}
+            self._save()
+        print(f"    🧠 Learned header profile '{profile}' for {key}")
+
+
+registry = HeaderStrategyRegistry()
@@ -0,0 +1,38 @@
+"""
+Deferred imports for the heavy optional dependencies.
+
+    np = lazy.module('numpy')
+
+binds `np` right away but only imports numpy the first time an attribute
+is used, so runs that never render a collage or parse a page never pay for
+numpy, Pillow or BeautifulSoup. Each real import is timed as an `import`
+stage in the run report.
+"""
+
+import importlib
+import types
+
+from fallen import metrics
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in that imports the real module on first attribute access"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__['_lazy_loaded'] = False
+
+    def __getattr__(self, attr):
+        # Only reached for attributes not copied over yet, i.e. before the import
+        if self.__dict__['_lazy_loaded']:
+            raise AttributeError(f"module '{self.__name__}' has no attribute '{attr}'")
+        with metrics.stage('import', module=self.__name__):
+            real = importlib.import_module(self.__name__)
+        self.__dict__.update(real.__dict__)
+        self.__dict__['_lazy_loaded'] = True
+        return getattr(real, attr)
+
+
+def module(name):
+    """A module object for name that is imported on first use"""
+    return LazyModule(name)
@@ -0,0 +1,228 @@
+"""
+Run instrumentation: per-stage wall time, HTTP counts and bytes per host,
+cache hit rates, retries and encoded image sizes.
+
+The scripts mark their stages with @metrics.timed('search') (or
+`with metrics.stage('upload'):`), fallen.transport reports every request,
+and when the run ends a report is written:
+
+    reports/<script>-<YYYYMMDD-HHMMSS>.json   full report for this run
+    reports/<script>.prom                     Prometheus textfile, replaced each run
+
+Point METRICS_TEXTFILE into node_exporter's textfile collector directory to
+scrape the daily numbers, or keep the JSON reports to compare runs.
+
+Stage times are "self" time: a download that renders a placeholder counts
+the rendering under `render`, not twice. Time spent in worker threads is
+summed, so stages can add up to more than the run's wall time.
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from fallen import profiling, tracing
+
+RUN_REPORT_DIR = os.getenv('RUN_REPORT_DIR', 'reports')
+METRICS_TEXTFILE = os.getenv('METRICS_TEXTFILE')  # Defaults to <RUN_REPORT_DIR>/<script>.prom
+RUN_REPORT = os.getenv('RUN_REPORT', 'true').lower() == 'true'
+
+_lock = threading.Lock()
+_local = threading.local()
+
+_run = {'script': None, 'started_at': None, 'start': None, 'exit_code': None}
+_stages = defaultdict(lambda: {'calls': 0, 'seconds': 0.0, 'inclusive_seconds': 0.0})
+_hosts = defaultdict(lambda: {'requests': 0, 'errors': 0, 'retries': 0, 'bytes': 0,
+                              'seconds': 0.0, 'by_status': defaultdict(int)})
+_caches = defaultdict(lambda: {'hits': 0, 'misses': 0})
+_images = defaultdict(lambda: {'count': 0, 'bytes': 0, 'max_bytes': 0})
+_counters = defaultdict(int)
+
+
+@contextmanager
+def stage(name, **args):
+    """Time the enclosed block under the given stage name (also traced and profiled when enabled)"""
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+
+    stack.append(0.0)  # Time spent in stages nested inside this one
+    start = time.perf_counter()
+    try:
+        with tracing.span(name, 'stage', **args), profiling.stage(name):
+            yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with _lock:
+            entry = _stages[name]
+            entry['calls'] += 1
+            entry['seconds'] += elapsed - nested
+            entry['inclusive_seconds'] += elapsed
+
+
+def timed(name):
+    """Decorator form of stage()"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name, function=func.__qualname__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, amount=1):
+    """Bump a named counter (retries, skips, fallbacks...)"""
+    with _lock:
+        _counters[name] += amount
+
+
+def cache_hit(cache):
+    with _lock:
+        _caches[cache]['hits'] += 1
+
+
+def cache_miss(cache):
+    with _lock:
+        _caches[cache]['misses'] += 1
+
+
+def image_encoded(kind, nbytes):
+    """Record the size of an encoded image (photo, placeholder, collage...)"""
+    with _lock:
+        entry = _images[kind]
+        entry['count'] += 1
+        entry['bytes'] += nbytes
+        entry['max_bytes'] = max(entry['max_bytes'], nbytes)
+
+
+def request_finished(host, status, nbytes, seconds, retries=0):
+    """Called by fallen.transport for every request; status is None on a connection error"""
+    with _lock:
+        entry = _hosts[host]
+        entry['requests'] += 1
+        entry['bytes'] += nbytes
+        entry['seconds'] += seconds
+        entry['retries'] += retries
+        entry['by_status'][str(status) if status else 'error'] += 1
+        if not status or status >= 400:
+            entry['errors'] += 1
+
+
+def start(script):
+    """Begin a run; the report is written when the process exits"""
+    _run['script'] = script
+    _run['started_at'] = datetime.now()
+    _run['start'] = time.perf_counter()
+    if RUN_REPORT:
+        atexit.register(write_report)
+
+
+def finish(exit_code):
+    """Record the script's exit code. Returns it, for exit(metrics.finish(main()))."""
+    # Same mapping as exit(): None means success, other non-integers failure
+    _run['exit_code'] = 0 if exit_code is None else exit_code if isinstance(exit_code, int) else 1
+    return exit_code
+
+
+def report():
+    """The run so far as a JSON-serializable dict"""
+    with _lock:
+        caches = {}
+        for name, entry in _caches.items():
+            lookups = entry['hits'] + entry['misses']
+            caches[name] = dict(entry, hit_rate=round(entry['hits'] / lookups, 4) if lookups else None)
+
+        return {
+            'script': _run['script'],
+            'started_at': _run['started_at'].isoformat(timespec='seconds') if _run['started_at'] else None,
+            'duration_seconds': round(time.perf_counter() - _run['start'], 3) if _run['start'] else None,
+            'exit_code': _run['exit_code'],
+            'stages': {name: {'calls': entry['calls'],
+                              'seconds': round(entry['seconds'], 4),
+                              'inclusive_seconds': round(entry['inclusive_seconds'], 4)}
+                       for name, entry in _stages.items()},
+            'hosts': {host: dict(entry, seconds=round(entry['seconds'], 4), by_status=dict(entry['by_status']))
+                      for host, entry in _hosts.items()},
+            'caches': caches,
+            'images': {kind: dict(entry) for kind, entry in _images.items()},
+            'counters': dict(_counters)
+        }
+
+
+def prometheus_text(data):
+    """Render a report in the Prometheus text exposition format"""
+    script = data['script']
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append(f"# HELP fallen_{name} {help_text}")
+        lines.append(f"# TYPE fallen_{name} gauge")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in [('script', script)] + labels)
+            lines.append(f"fallen_{name}{{{label_text}}} {value}")
+
+    metric('run_duration_seconds', "Wall time of the last run", [([], data['duration_seconds'])])
+    metric('run_exit_code', "Exit code of the last run (-1 if unknown)",
+           [([], data['exit_code'] if isinstance(data['exit_code'], int) else -1)])
+    metric('run_timestamp_seconds', "When the last run started",
+           [([], int(datetime.fromisoformat(data['started_at']).timestamp()))])
+
+    stages = data['stages'].items()
+    metric('stage_seconds', "Self time spent in each stage", [([('stage', name)], s['seconds']) for name, s in stages])
+    metric('stage_calls', "Times each stage ran", [([('stage', name)], s['calls']) for name, s in stages])
+
+    hosts = data['hosts'].items()
+    metric('http_requests', "HTTP requests by host and status",
+           [([('host', host), ('status', status)], n) for host, h in hosts for status, n in h['by_status'].items()])
+    metric('http_bytes', "Response bytes received by host", [([('host', host)], h['bytes']) for host, h in hosts])
+    metric('http_retries', "Transport-level retries by host", [([('host', host)], h['retries']) for host, h in hosts])
+    metric('http_seconds', "Time spent waiting on each host", [([('host', host)], h['seconds']) for host, h in hosts])
+
+    caches = data['caches'].items()
+    metric('cache_hits', "Cache hits", [([('cache', name)], c['hits']) for name, c in caches])
+    metric('cache_misses', "Cache misses", [([('cache', name)], c['misses']) for name, c in caches])
+
+    images = data['images'].items()
+    metric('images_encoded', "Images encoded by kind", [([('kind', kind)], i['count']) for kind, i in images])
+    metric('image_bytes', "Total encoded image bytes by kind", [([('kind', kind)], i['bytes']) for kind, i in images])
+
+    metric('events', "Named event counters", [([('event', name)], n) for name, n in data['counters'].items()])
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+    os.replace(tmp_path, path)  # The textfile collector must never see a half-written file
+
+
+def write_report():
+    """Write the JSON report and the Prometheus textfile"""
+    if not _hosts and set(_stages) <= {'import'}:
+        return  # Nothing ran beyond imports (e.g. --help)
+    data = report()
+    script = data['script']
+    json_path = os.path.join(RUN_REPORT_DIR, f"{script}-{_run['started_at'].strftime('%Y%m%d-%H%M%S')}.json")
+    prom_path = METRICS_TEXTFILE or os.path.join(RUN_REPORT_DIR, f"{script}.prom")
+    try:
+        _write_atomic(json_path, json.dumps(data, indent=2) + '\n')
+        _write_atomic(prom_path, prometheus_text(data))
+        print(f"📊 Run report saved to {json_path}")
+    except OSError as e:
+        print(f"⚠️  Could not write run report: {e}")
@@ -0,0 +1,430 @@
+"""
+Local stand-ins for Military Times, the S3 portrait bucket and the Graph API.
+
+Lets the full pipelines run on a laptop - including 200-hero days,
+throttling and CAPTCHA pages - without touching the live site or a real
+Facebook page:
+
+    python -m fallen.mock_servers --heroes-per-search 9 --latency 0.05 --throttle-rate 0.02
+    USE_MOCK_SERVERS=true FB_ACCESS_TOKEN=x FB_PAGE_ID=123 python service-all-fb.py
+
+Three servers are started on consecutive ports (see fallen/endpoints.py):
+
+    MOCK_PORT      Military Times: /, /search, /<slug>/<profile-id>
+    MOCK_PORT + 1  S3: /static.militarytimes.com/thefallen/<file>.jpg
+    MOCK_PORT + 2  Graph API: /v18.0/<page>, /<page>/photos, /<page>/feed,
+                   /<page>/scheduled_posts, /<post-id>
+
+Search results are generated deterministically from the searched date, so
+every run sees the same heroes. GET /__stats on any server returns request
+counts for all three.
+"""
+
+import argparse
+import hashlib
+import html
+import io
+import itertools
+import json
+import random
+import threading
+import time
+from calendar import monthrange
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+FIRST_NAMES = ['James', 'Michael', 'Robert', 'David', 'Daniel', 'Joseph', 'Christopher', 'Anthony',
+               'Jose', 'Brian', 'Kevin', 'Jason', 'Matthew', 'Joshua', 'Andrew', 'Ryan', 'Justin',
+               'Eric', 'Aaron', 'Travis', 'Marcus', 'Luis', 'Tyler', 'Nathan', 'Adam', 'Maria', 'Ashley']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor',
+              'Moore', 'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez']
+RANKS = [('Army', 'Spc.'), ('Army', 'Sgt.'), ('Army', 'Staff Sgt.'), ('Army', 'Pfc.'), ('Army', '1st Lt.'),
+         ('Army', 'Sgt. 1st Class'), ('Marine', 'Lance Cpl.'), ('Marine', 'Cpl.'), ('Marine', 'Sgt.'),
+         ('Navy', 'Petty Officer 2nd Class'), ('Navy', 'Hospital Corpsman 3rd Class'),
+         ('Air Force', 'Senior Airman'), ('Air Force', 'Staff Sgt.')]
+HOMETOWNS = ['Morgantown, Ky.', 'San Antonio, Texas', 'El Paso, Texas', 'Fresno, Calif.', 'Tucson, Ariz.',
+             'Columbus, Ohio', 'Savannah, Ga.', 'Albany, N.Y.', 'Spokane, Wash.', 'Tulsa, Okla.']
+UNITS = ['617th Military Police Company, 503rd Military Police Battalion, Fort Bragg, N.C.',
+         '1st Battalion, 5th Marine Regiment, 1st Marine Division, Camp Pendleton, Calif.',
+         '2nd Battalion, 502nd Infantry Regiment, 101st Airborne Division, Fort Campbell, Ky.',
+         'Naval Mobile Construction Battalion 74, Gulfport, Miss.',
+         '4th Civil Engineer Squadron, Seymour Johnson Air Force Base, N.C.']
+PLACES = ['Baghdad, Iraq', 'Ramadi, Iraq', 'Kandahar province, Afghanistan', 'Helmand province, Afghanistan']
+
+CAPTCHA_PAGE = "<html><body><h1>Security check</h1><p>Please complete the Captcha to continue.</p></body></html>"
+
+
+class MockState:
+    """Options, generated data and counters shared by the three servers"""
+
+    def __init__(self, options):
+        self.options = options
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.started = time.time()
+        self.ids = itertools.count(1000)
+        self.posts = {}
+        self.portrait = make_portrait(options.photo_size)
+        self.fault_rng = random.Random(options.seed)
+
+    def count(self, service, kind, status):
+        with self.lock:
+            self.counts[f"{service} {kind} {status}"] += 1
+
+    def roll(self, rate):
+        with self.lock:
+            return self.fault_rng.random() < rate
+
+    def next_id(self):
+        with self.lock:
+            return next(self.ids)
+
+    def stats(self):
+        with self.lock:
+            elapsed = time.time() - self.started
+            total = sum(self.counts.values())
+            return {
+                'elapsed_seconds': round(elapsed, 1),
+                'requests': total,
+                'requests_per_second': round(total / elapsed, 2) if elapsed else 0,
+                'by_endpoint': dict(sorted(self.counts.items())),
+                'posts': len(self.posts)
+            }
+
+
+def make_portrait(size):
+    """Render one JPEG portrait used for every S3 request"""
+    from PIL import Image, ImageDraw
+
+    width, height = size
+    img = Image.new('RGB', size, (70, 90, 60))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse([width * 0.3, height * 0.15, width * 0.7, height * 0.45], fill=(200, 170, 140))
+    draw.rectangle([width * 0.2, height * 0.45, width * 0.8, height], fill=(60, 80, 50))
+    output = io.BytesIO()
+    img.save(output, 'JPEG', quality=90)
+    return output.getvalue()
+
+
+def slugify(text):
+    return '-'.join(''.join(c.lower() if c.isalnum() else ' ' for c in text).split())
+
+
+def generate_hero(date, index, photo_rate):
+    """Deterministic hero for (date, index) - the same on every request"""
+    seed = int(hashlib.md5(f"{date:%Y%m%d}-{index}".encode()).hexdigest()[:12], 16)
+    rng = random.Random(seed)
+    branch, rank = rng.choice(RANKS)
+    name = f"{branch} {rank} {rng.choice(FIRST_NAMES)} {rng.choice('ABCDEFGHJKLMNPRST')}. {rng.choice(LAST_NAMES)}"
+    profile_id = f"{date:%Y%m%d}-{index}"
+    return {
+        'name': name,
+        'branch': branch,
+        'date': date,
+        'profile_id': profile_id,
+        'link': f"/{slugify(name)}/{profile_id}",
+        'photo': f"{slugify(name).replace('-', '_')}_{profile_id}" if rng.random() < photo_rate else None,
+        'age': rng.randint(19, 42),
+        'hometown': rng.choice(HOMETOWNS),
+        'unit': rng.choice(UNITS),
+        'place': rng.choice(PLACES)
+    }
+
+
+def heroes_for_date(date, options):
+    return [generate_hero(date, i, options.photo_rate) for i in range(options.heroes_per_search)]
+
+
+def search_page(heroes, s3_url, page=1, page_size=0, query=None):
+    """Results page number `page`, with page_size results per page (0: all on one page)"""
+    total = len(heroes)
+    first = (page - 1) * page_size if page_size else 0
+    shown = heroes[first:first + page_size] if page_size else heroes
+    pager = ''
+    if page_size and first + page_size < total:
+        params = {key: values[0] for key, values in (query or {}).items()}
+        params['page'] = str(page + 1)
+        pager = f"<div class=\"pagination\"><a rel=\"next\" href=\"/search?{html.escape(urlencode(params))}\">Next</a></div>"
+    boxes = []
+    for hero in shown:
+        image = f"{s3_url}static.militarytimes.com/thefallen/{hero['photo']}_sm.jpg" if hero['photo'] else "/static/img/no-photo.png"
+        boxes.append(f"""<div class="data-box">
+  <div class="data-box-left"><a href="{hero['link']}"><img src="{image}" width="60"></a></div>
+  <div class="data-box-right">
+    <h3><a href="{hero['link']}">{hero['name']}</a></h3>
+    <p>Died <span class="blue-bold">{hero['date']:%B %d, %Y}</span></p>
+  </div>
+</div>""")
+    return (f"<html><head><title>Search | Honor the Fallen</title></head><body>"
+            f"<div class=\"results-header\"><p>Showing {min(first + 1, total)} - {first + len(shown)} of {total} results</p></div>"
+            f"<div class=\"search-results\">{''.join(boxes)}</div>{pager}</body></html>")
+
+
+def profile_page(hero, s3_url):
+    image = f"{s3_url}static.militarytimes.com/thefallen/{hero['photo']}_lg.jpg" if hero['photo'] else "/static/img/no-photo.png"
+    return f"""<html><head><title>{hero['name']} | Honor the Fallen</title></head><body>
+<div class="content-div">
+  <div class="record-image"><img src="{image}" width="125"></div>
+  <div class="record-txt">
+    <h1 class="h1-size">{hero['name']}</h1>
+    <h2>Died {hero['date']:%B %d, %Y} Serving During Operation Iraqi Freedom</h2>
+    <input type="hidden" name="dimension2" value="{hero['branch']}">
+    <hr>
+    {hero['age']}, of {hero['hometown']}; assigned to the {hero['unit']}; killed in action when an improvised explosive device detonated near his vehicle in {hero['place']}.
+    <hr>
+  </div>
+</div>
+</body></html>"""
+
+
+def parse_search_date(query):
+    """Date searched for by the scripts' start_date=MM/DD/YYYY parameter"""
+    value = query.get('start_date', [''])[0]
+    try:
+        return datetime.strptime(value, '%m/%d/%Y')
+    except ValueError:
+        return None
+
+
+def parse_search_month(query):
+    """Every day of the month searched for by year_month=YYYY-MM (month-bucket prefetch)"""
+    value = query.get('year_month', [''])[0]
+    try:
+        first = datetime.strptime(value, '%Y-%m')
+    except ValueError:
+        return []
+    return [first.replace(day=day) for day in range(1, monthrange(first.year, first.month)[1] + 1)]
+
+
+def make_handler(service, state, urls):
+    """Request handler class for one of 'militarytimes', 's3' or 'graph'"""
+    options = state.options
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            if options.verbose:
+                super().log_message(format, *args)
+
+        def send(self, status, body, content_type='text/html; charset=utf-8', kind='other', headers=None):
+            if isinstance(body, str):
+                body = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+            state.count(service, kind, status)
+
+        def send_json(self, status, data, kind):
+            self.send(status, json.dumps(data), 'application/json', kind)
+
+        def read_body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(length) if length else b''
+
+        def inject_faults(self, kind):
+            """Apply latency and random failures. Returns True if a fault was sent."""
+            delay = options.latency + random.uniform(0, options.jitter)
+            if delay > 0:
+                time.sleep(delay)
+
+            if state.roll(options.error_rate):
+                self.send(500, "Internal Server Error", 'text/plain', kind)
+                return True
+            if state.roll(options.throttle_rate):
+                if service == 'graph':
+                    self.send_json(400, {'error': {'code': 4, 'message': '(#4) Application request limit reached'}}, kind)
+                else:
+                    self.send(429, "Too Many Requests", 'text/plain', kind, {'Retry-After': str(options.retry_after)})
+                return True
+            if service == 'militarytimes' and state.roll(options.captcha_rate):
+                self.send(200, CAPTCHA_PAGE, kind=kind)
+                return True
+            return False
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == '/__stats':
+                self.send_json(200, state.stats(), 'stats')
+                return
+            getattr(self, f"get_{service}")(url, parse_qs(url.query))
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self.read_body()
+            if service != 'graph':
+                self.send(405, "Method Not Allowed", 'text/plain', 'post')
+                return
+            self.post_graph(url, body)
+
+        # --- Military Times ---
+
+        def get_militarytimes(self, url, query):
+            if url.path in ('', '/'):
+                if not self.inject_faults('home'):
+                    self.send(200, "<html><body><h1>Honor the Fallen</h1></body></html>", kind='home')
+                return
+
+            if url.path == '/search':
+                if self.inject_faults('search'):
+                    return
+                date = parse_search_date(query)
+                if date:
+                    heroes = heroes_for_date(date, options)
+                else:
+                    heroes = [hero for day in parse_search_month(query) for hero in heroes_for_date(day, options)]
+                try:
+                    page = max(1, int(query.get('page', ['1'])[0]))
+                except ValueError:
+                    page = 1
+                self.send(200, search_page(heroes, urls['s3'], page, options.page_size, query), kind='search')
+                return
+
+            parts = url.path.strip('/').split('/')
+            if len(parts) == 2:
+                if self.inject_faults('profile'):
+                    return
+                try:
+                    date_part, index = parts[1].split('-')
+                    hero = generate_hero(datetime.strptime(date_part, '%Y%m%d'), int(index), options.photo_rate)
+                except ValueError:
+                    self.send(404, "Not Found", kind='profile')
+                    return
+                self.send(200, profile_page(hero, urls['s3']), kind='profile')
+                return
+
+            self.send(404, "Not Found", kind='other')
+
+        # --- S3 ---
+
+        def get_s3(self, url, query):
+            if not url.path.startswith('/static.militarytimes.com/thefallen/'):
+                self.send(403, "<Error><Code>AccessDenied</Code></Error>", 'application/xml', 'image')
+                return
+            if options.require_referer and not self.headers.get('Referer'):
+                # Hotlink protection, as some image hosts do
+                self.send(403, "<Error><Code>AccessDenied</Code></Error>", 'application/xml', 'image')
+                return
+            if not self.inject_faults('image'):
+                self.send(200, state.portrait, 'image/jpeg', 'image')
+
+        # --- Graph API ---
+
+        def get_graph(self, url, query):
+            parts = url.path.strip('/').split('/')[1:]  # drop the version prefix
+            if self.inject_faults('graph-get'):
+                return
+
+            if len(parts) == 2 and parts[1] == 'scheduled_posts':
+                with state.lock:
+                    scheduled = [post for post in state.posts.values() if post.get('scheduled_publish_time')]
+                self.send_json(200, {'data': scheduled}, 'scheduled_posts')
+            elif len(parts) == 1 and parts[0] in state.posts:
+                self.send_json(200, state.posts[parts[0]], 'post')
+            elif len(parts) == 1:
+                self.send_json(200, {'id': parts[0], 'name': 'Mock Memorial Page',
+                                     'access_token': 'mock-page-token'}, 'page')
+            else:
+                self.send_json(404, {'error': {'code': 803, 'message': 'Unknown path'}}, 'graph-get')
+
+        def post_graph(self, url, body):
+            parts = url.path.strip('/').split('/')[1:]
+            kind = parts[-1] if parts else 'graph-post'
+            if self.inject_faults(kind):
+                return
+
+            if len(parts) == 2 and parts[1] == 'photos':
+                self.send_json(200, {'id': str(state.next_id())}, 'photos')
+            elif len(parts) == 2 and parts[1] == 'feed':
+                form = {k: v[0] for k, v in parse_qs(body.decode('utf-8')).items()}
+                post_id = f"{parts[0]}_{state.next_id()}"
+                post = {'id': post_id, 'message': form.get('message', ''),
+                        'is_published': form.get('published', 'true') != 'false'}
+                if form.get('scheduled_publish_time'):
+                    post['scheduled_publish_time'] = int(form['scheduled_publish_time'])
+                media = [json.loads(value)['media_fbid'] for key, value in sorted(form.items())
+                         if key.startswith('attached_media[')]
+                if media:
+                    post['attachments'] = {'data': [{'subattachments': {
+                        'data': [{'target': {'id': fbid}} for fbid in media]}}]}
+                with state.lock:
+                    state.posts[post_id] = post
+                self.send_json(200, {'id': post_id}, 'feed')
+            else:
+                self.send_json(404, {'error': {'code': 803, 'message': 'Unknown path'}}, 'graph-post')
+
+    return Handler
+
+
+def start_servers(options):
+    """Start the three servers in background threads. Returns (servers, state)."""
+    state = MockState(options)
+    urls = {
+        'militarytimes': f"http://{options.host}:{options.port}",
+        's3': f"http://{options.host}:{options.port + 1}/",
+        'graph': f"http://{options.host}:{options.port + 2}/v18.0",
+    }
+
+    servers = []
+    for offset, service in enumerate(('militarytimes', 's3', 'graph')):
+        server = ThreadingHTTPServer((options.host, options.port + offset), make_handler(service, state, urls))
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        print(f"🧪 Mock {service} listening on {urls[service]}")
+
+    return servers, state
+
+
+def parse_size(value):
+    width, height = value.lower().split('x')
+    return int(width), int(height)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Local stand-ins for Military Times, S3 and the Graph API")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700, help="first of three consecutive ports")
+    parser.add_argument('--heroes-per-search', type=int, default=3, help="heroes returned for each searched date")
+    parser.add_argument('--page-size', type=int, default=0, help="results per search page (default 0: one page)")
+    parser.add_argument('--photo-rate', type=float, default=0.8, help="share of heroes with an S3 portrait")
+    parser.add_argument('--photo-size', type=parse_size, default=(125, 200), help="portrait size, e.g. 125x200")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="share of requests throttled (429 + Retry-After; Graph error code 4)")
+    parser.add_argument('--retry-after', type=int, default=2, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--captcha-rate', type=float, default=0.0, help="share of Military Times pages replaced by a CAPTCHA")
+    parser.add_argument('--require-referer', action='store_true', help="answer S3 requests without a Referer with 403")
+    parser.add_argument('--seed', type=int, default=0, help="seed for fault injection")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    return parser
+
+
+def main():
+    options = build_parser().parse_args()
+    servers, state = start_servers(options)
+    print(f"\nPoint the scripts here with: USE_MOCK_SERVERS=true MOCK_PORT={options.port}")
+    print("Press Ctrl+C to stop and print request statistics.\n")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.shutdown()
+        print(json.dumps(state.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Month-bucket prefetch for the Military Times search.
+
+Finding a date's heroes takes one exact-date search per year since 2003,
+so every daily run (and every day of a precompute) costs about 23 search
+requests. The search form also takes year= and year_month=, which return a
+whole month at once. With MONTH_PREFETCH=true the search for July 4,
+2007 fetches the July 2007 bucket instead. That bucket then answers every
+other day of July 2007 locally:
+
+    MONTH_PREFETCH=true python service-all-fb.py --precompute 30
+
+A month of daily runs then costs about 23 month queries in total, not 23
+queries per day.
+
+Buckets are kept as raw search pages in the state directory
+(month_buckets/YYYY-MM.json.gz holds every page of a month's results). Each
+script parses them with its own parser, and the cache travels with the CI
+snapshot. A month that ended more than MONTH_SETTLE_DAYS ago is kept for
+good. A newer one is fetched again after MONTH_BUCKET_TTL hours, because
+deaths are still being added to it.
+
+A bucket is only used when all of its pages were fetched
+(fallen.search_cursor follows the pagination) and they carry a results
+header. A failed or blocked page, or a hero whose date can't be read,
+sends the search back to the exact date.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from calendar import monthrange
+from datetime import datetime, timedelta
+
+from fallen import clock, endpoints, metrics, roster, search_cursor, state, transport
+
+MONTH_PREFETCH = os.getenv('MONTH_PREFETCH', 'false').lower() == 'true'
+MONTH_BUCKET_TTL = float(os.getenv('MONTH_BUCKET_TTL', '12'))  # Hours before a recent month is fetched again
+MONTH_SETTLE_DAYS = 60  # Days after a month ends before its bucket is kept for good
+BUCKET_DIR = 'month_buckets'
+
+
+def month_url(year, month):
+    """Search URL for every hero who died in one month"""
+    return (f"{endpoints.MILITARY_TIMES_URL}/search?year={year}&year_month={year}-{month:02d}"
+            f"&first_name=&last_name=&start_date=&end_date=&conflict=&home_state=&home_town=")
+
+
+def is_settled(year, month):
+    """True once a month is old enough that no more deaths will be added to it"""
+    month_end = datetime(year, month, monthrange(year, month)[1])
+    return clock.now() - month_end > timedelta(days=MONTH_SETTLE_DAYS)
+
+
+def bucket_path(year, month):
+    return os.path.join(state.STATE_DIR, BUCKET_DIR, f"{year}-{month:02d}.json.gz")
+
+
+class MonthBuckets:
+    """Month search pages, cached in memory and in the state directory"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = {}  # (year, month) -> [html], or None when the bucket can't be used
+        self.page_locks = {}
+        self.days = {}  # (parse, year, month) -> {day: [heroes]}, or None
+
+    def _read(self, year, month):
+        path = bucket_path(year, month)
+        try:
+            age = time.time() - os.path.getmtime(path)
+            if age > MONTH_BUCKET_TTL * 3600 and not is_settled(year, month):
+                return None
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, EOFError, ValueError):
+            return None
+
+    def _write(self, year, month, pages):
+        path = bucket_path(year, month)
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(pages, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️ Could not save month bucket {year}-{month:02d}: {e}")
+
+    def _fetch(self, year, month, get):
+        cursor = search_cursor.SearchCursor(month_url(year, month), get)
+        pages = cursor.pages()
+        if not cursor.complete or cursor.total is None:
+            metrics.count('month_bucket_incomplete')
+            print(f"  ⚠️ Month bucket {year}-{month:02d} is incomplete; searching exact dates")
+            return None
+        metrics.count('month_bucket_fetches')
+        self._write(year, month, pages)
+        return pages
+
+    def page(self, year, month, get):
+        """The month's search pages, or None if they can't stand in for the daily searches"""
+        key = (year, month)
+        with self.lock:
+            if key in self.pages:
+                return self.pages[key]
+            page_lock = self.page_locks.setdefault(key, threading.Lock())
+        # One fetch per month even when several of its days are searched at once
+        with page_lock:
+            with self.lock:
+                if key in self.pages:
+                    return self.pages[key]
+            pages = self._read(year, month)
+            if pages is not None:
+                metrics.count('month_bucket_cached')
+            else:
+                pages = self._fetch(year, month, get)
+            with self.lock:
+                self.pages[key] = pages
+            return pages
+
+    def search(self, date, parse, get):
+        """Heroes who died on date, split out of its month's bucket; None to search the date instead"""
+        key = (parse, date.year, date.month)
+        with self.lock:
+            cached = key in self.days
+            days = self.days.get(key)
+        if not cached:
+            pages = self.page(date.year, date.month, get)
+            days = None if pages is None else split_days(hero for page in pages for hero in parse(page))
+            with self.lock:
+                self.days[key] = days
+        if days is None:
+            return None
+        metrics.count('month_bucket_days')
+        return [hero.copy() for hero in days.get(date.day, [])]
+
+
+def split_days(heroes):
+    """{day of month: heroes}, or None if any hero's date can't be read"""
+    days = {}
+    for hero in heroes:
+        died = roster.parse_date(hero.get('date'))
+        if died is None:
+            return None
+        days.setdefault(died.day, []).append(hero)
+    return days
+
+
+buckets = MonthBuckets()
+
+
+def search(date, parse, get=None):
+    """
+    Heroes for one exact date from the month bucket, with each page parsed
+    by the calling script's parse(html). Returns None when prefetch is off
+    or the bucket can't be used; the caller then runs its exact-date search.
+    """
+    if not MONTH_PREFETCH:
+        return None
+    return buckets.search(date, parse, get or transport.get)
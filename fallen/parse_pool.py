@@ -0,0 +1,125 @@
+"""
+Process pool for parsing search and profile pages during a crawl.
+
+A comprehensive crawl fetches thousands of search pages concurrently
+(fallen/throttle.py gather), but every fetching thread then parses its page
+with BeautifulSoup while holding the GIL. Past a few pages a second, the
+crawl waits on parsing, not on the network. A script's parse function can be
+marked so that, once the pool is started, pages are parsed in worker
+processes instead:
+
+    @parse_pool.offload('query-fallen')
+    def parse_search_results(html):
+        ...
+
+    python -m fallen crawl --from 2003-03-20 --parse-workers 8
+
+Parse methods of a script's class are marked with the class name; each
+worker builds one instance of the class (its scraper) and calls the method
+on that, so those methods must not depend on the caller's instance state:
+
+    class MilitaryTimesScraper:
+        @parse_pool.offload('soldier-fb', 'MilitaryTimesScraper')
+        def parse_profile_page(self, content):
+            ...
+
+The fetching thread sends the page (the response's raw bytes, or the text a
+SearchCursor already decoded) to a worker and waits for the records, which
+come back as plain field dicts (records.HeroRecord pickles compactly).
+Workers are spawned, not forked, because the fetching threads are already
+running. Each worker imports the script once (fallen/scripts.py) and looks
+the function up by name, so only its arguments and its records cross the
+process boundary. With no pool started, an offloaded function runs in the
+calling thread exactly as before.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import wraps
+
+from fallen import metrics
+
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', '0'))  # Parse processes for a crawl; 0 parses in the fetching threads
+
+
+_instances = {}  # (script, class name) -> the instance a worker parses with
+
+
+def _parse_in_worker(script, name, html, owner=None):
+    """Runs in a worker: the script's undecorated parse function or owner method, applied to html"""
+    from fallen.scripts import load_script
+    module = load_script(script)
+    if owner is None:
+        return getattr(module, name).__wrapped__(html)
+    if (script, owner) not in _instances:
+        _instances[script, owner] = getattr(module, owner)()
+    instance = _instances[script, owner]
+    return getattr(type(instance), name).__wrapped__(instance, html)
+
+
+class ParsePool:
+    """The process pool offloaded parse functions use while it is running"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def start(self, workers=None):
+        workers = PARSE_WORKERS if workers is None else workers
+        if workers <= 0:
+            return
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=workers,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+                print(f"⚙️ Parsing pages in {workers} worker processes")
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def parse(self, script, func, html, owner=None, instance=None):
+        """func(html), or func(instance, html) for a method, in a worker process while the pool is running"""
+        executor = self.executor
+        if executor is None:
+            return func(html) if owner is None else func(instance, html)
+        metrics.count('pages_parsed_offloaded')
+        return executor.submit(_parse_in_worker, script, func.__name__, html, owner).result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+pool = ParsePool()
+
+
+def start(workers=None):
+    """Start the shared pool (PARSE_WORKERS processes by default); use as a context manager to stop it"""
+    pool.start(workers)
+    return pool
+
+
+def offload(script, owner=None):
+    """
+    Decorator for a script's module-level parse(html) function, or for a
+    parse(self, html) method of the script's class named owner: while the
+    pool runs, calls are parsed in a worker process.
+    """
+    def decorate(func):
+        if owner is None:
+            @wraps(func)
+            def wrapper(html):
+                return pool.parse(script, func, html)
+        else:
+            @wraps(func)
+            def wrapper(self, html):
+                return pool.parse(script, func, html, owner, self)
+        return wrapper
+    return decorate
@@ -0,0 +1,91 @@
+"""
+Priority classes for Military Times and S3 requests.
+
+Today's post, precomputed bundles for the coming days and a historical
+crawl all draw on the same polite request budget: the per-host throttle
+controllers (fallen/throttle.py) and, across processes, the shared rate
+limit (fallen/shared_rate.py). Every request carries one of three classes:
+
+- critical: anything the post being published now is waiting on (default)
+- prefetch: precompute / `fallen render` for upcoming days
+- backfill: `fallen crawl` and other bulk history
+
+    with priority.level(priority.BACKFILL):
+        heroes = search_days(days)
+
+    REQUEST_PRIORITY=backfill python query-fallen.py    # a whole process
+
+The controllers serve waiting requests in class order. A lower class gets
+no new slot while a higher one is waiting. For PRIORITY_RESERVE_HOLD
+seconds after a critical request to a host, lower classes also can't fill
+that host's last PRIORITY_RESERVE slots, including the only slot at a limit
+of 1, so the next critical request doesn't queue behind a crawl's in-flight
+requests. Once critical traffic stops, background work gets the whole limit
+back; otherwise a crawl could stall at a limit of 1. In-flight requests are
+never cut off, so preemption happens at the next slot. In the shared bucket, only critical
+requests may borrow tokens ahead of time. The other classes take a token
+only when one is free, so background processes soak up leftover capacity
+and don't queue in front of another process's post.
+
+The class is per thread. throttle.gather() and throttle.ahead() hand the
+caller's class on to their worker threads.
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+CRITICAL, PREFETCH, BACKFILL = 0, 1, 2
+NAMES = ('critical', 'prefetch', 'backfill')
+
+PRIORITY_RESERVE = int(os.getenv('PRIORITY_RESERVE', '1'))  # Slots per host that only critical requests may use
+PRIORITY_RESERVE_HOLD = float(os.getenv('PRIORITY_RESERVE_HOLD', '30'))  # Seconds the reserve is kept after a host's last critical request
+
+
+def parse(value):
+    """A class from its name, e.g. REQUEST_PRIORITY=backfill; raises ValueError for unknown names"""
+    try:
+        return NAMES.index(value.strip().lower())
+    except ValueError:
+        raise ValueError(f"unknown request priority {value!r} (expected {', '.join(NAMES)})") from None
+
+
+try:
+    DEFAULT = parse(os.getenv('REQUEST_PRIORITY', 'critical'))  # Class of requests outside level()
+except ValueError as e:
+    print(f"⚠️ REQUEST_PRIORITY: {e}; using critical")
+    DEFAULT = CRITICAL
+
+_local = threading.local()
+
+
+def current():
+    """The calling thread's request class"""
+    return getattr(_local, 'level', DEFAULT)
+
+
+def name(value=None):
+    return NAMES[current() if value is None else value]
+
+
+@contextmanager
+def level(value):
+    """Send the requests made inside the block with class value"""
+    previous = current()
+    _local.level = value
+    try:
+        yield
+    finally:
+        _local.level = previous
+
+
+def bind(func):
+    """func, run with the caller's class when called from another thread (e.g. a pool worker)"""
+    value = current()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with level(value):
+            return func(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,168 @@
+"""
+Per-stage CPU and memory profiling, switched on with --profile.
+
+Every metrics stage (search, profile, download, render, upload, publish)
+runs under its own cProfile profiler and is bracketed by tracemalloc
+snapshots. When the run ends the results land next to the run report:
+
+    reports/<script>-<timestamp>.profile.txt       hotspots, allocation sites, peak memory
+    reports/<script>-<timestamp>-<stage>.pstats    raw profiles (snakeviz, pstats)
+
+Like the stage timings, CPU time is "self" time: a nested stage pauses the
+profiler of the stage around it. tracemalloc counters are process-wide, so
+a stage's peak includes whatever other threads allocated at the same time.
+Profiling slows the run down considerably; only compare profiled runs with
+each other. cProfile, pstats and tracemalloc are only imported once
+profiling is enabled, keeping them out of every normal start.
+"""
+
+import atexit
+import io
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+REPORT_DIR = os.getenv('RUN_REPORT_DIR', 'reports')
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', '25'))  # Rows in each hotspot / allocation table
+TRACEMALLOC_FRAMES = 1
+
+enabled = False
+
+_lock = threading.Lock()
+_local = threading.local()
+_started_at = None
+
+_profiles = defaultdict(list)  # stage -> cProfile.Profile objects, one per thread and call site
+_calls = Counter()
+_peaks = Counter()  # stage -> highest traced memory seen while it ran
+_allocations = defaultdict(Counter)  # stage -> {(file, line): bytes still held when it finished}
+
+
+def enable():
+    """Start profiling every stage; the report is written when the process exits"""
+    global enabled, _started_at
+    if enabled:
+        return
+    import tracemalloc
+    enabled = True
+    _started_at = datetime.now()
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+    atexit.register(write_report)
+    print("🔬 Profiling enabled (cProfile + tracemalloc per stage)")
+
+
+def _snapshot():
+    import tracemalloc
+    # Leave out tracemalloc's own bookkeeping
+    return tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+
+
+def _profiler(name):
+    """This thread's profiler for a stage"""
+    import cProfile
+    profilers = getattr(_local, 'profilers', None)
+    if profilers is None:
+        profilers = _local.profilers = {}
+    if name not in profilers:
+        profilers[name] = cProfile.Profile()
+        with _lock:
+            _profiles[name].append(profilers[name])
+    return profilers[name]
+
+
+def _switch(frame, on):
+    profiler = frame['profiler']
+    if profiler is None:
+        return
+    if not on:
+        profiler.disable()
+        return
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one active profiler per process; a stage running
+        # alongside another thread's keeps its memory numbers but no CPU profile
+        frame['profiler'] = None
+
+
+@contextmanager
+def stage(name):
+    """Profile the enclosed block as part of the named stage"""
+    if not enabled:
+        yield
+        return
+    import tracemalloc
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+
+    parent = stack[-1] if stack else None
+    if parent:
+        _switch(parent, False)
+        parent['peak'] = max(parent['peak'], tracemalloc.get_traced_memory()[1])
+
+    frame = {'profiler': _profiler(name), 'peak': 0}
+    stack.append(frame)
+    before = _snapshot()
+    tracemalloc.reset_peak()
+    _switch(frame, True)
+    try:
+        yield
+    finally:
+        _switch(frame, False)
+        peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+        grown = _snapshot().compare_to(before, 'lineno')
+        stack.pop()
+
+        with _lock:
+            _calls[name] += 1
+            _peaks[name] = max(_peaks[name], peak)
+            sites = _allocations[name]
+            for stat in grown:
+                if stat.size_diff > 0:
+                    frame_info = stat.traceback[0]
+                    sites[(frame_info.filename, frame_info.lineno)] += stat.size_diff
+
+        if parent:
+            parent['peak'] = max(parent['peak'], peak)
+            _switch(parent, True)
+
+
+def stage_report(name):
+    """Hotspot and allocation tables for one stage, as text"""
+    import pstats
+    out = io.StringIO()
+    out.write(f"{'=' * 78}\nStage: {name}  ({_calls[name]} calls, peak traced memory {_peaks[name] / 1024 / 1024:.1f} MiB)\n{'=' * 78}\n")
+
+    stats = pstats.Stats(*_profiles[name], stream=out)
+    stats.strip_dirs().sort_stats('tottime').print_stats(PROFILE_TOP)
+
+    out.write("Top allocation sites by memory still held when the stage returned (summed over calls):\n")
+    for (filename, lineno), size in _allocations[name].most_common(PROFILE_TOP):
+        out.write(f"  {size / 1024:>10.1f} KiB  {filename}:{lineno}\n")
+    out.write('\n')
+    return out.getvalue()
+
+
+def write_report():
+    """Write the text report and one .pstats file per stage"""
+    import pstats
+    script = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+    prefix = os.path.join(REPORT_DIR, f"{script}-{_started_at.strftime('%Y%m%d-%H%M%S')}")
+    try:
+        os.makedirs(REPORT_DIR, exist_ok=True)
+        with open(f"{prefix}.profile.txt", 'w') as f:
+            f.write(f"Profile of {script} started {_started_at.isoformat(timespec='seconds')}\n")
+            f.write(f"Stages: {', '.join(_profiles)}\n\n")
+            for name in _profiles:
+                f.write(stage_report(name))
+
+        for name, profiles in _profiles.items():
+            pstats.Stats(*profiles).dump_stats(f"{prefix}-{name}.pstats")
+        print(f"🔬 Profile saved to {prefix}.profile.txt")
+    except OSError as e:
+        print(f"⚠️  Could not write profile: {e}")
@@ -0,0 +1,200 @@
+"""
+Proxy pool for Military Times and S3 traffic.
+
+    PROXY_POOL=http://a:3128,http://b:3128 python service-all-fb.py
+    PROXY_POOL_FILE=proxies.txt python query-fallen.py      # one URL per line, # comments
+
+USE_PROXY=true with PROXY_URL is a pool of one. fallen.transport picks the
+proxy for every request to the throttled hosts (fallen/throttle.py); Graph
+API calls always go direct. The pool (and PROXY_POOL_FILE) is read the
+first time current() is called, not at import.
+
+- Sticky: each host keeps using one proxy, so cookies and the site's view
+  of the client stay consistent.
+- Budget: each proxy has its own token bucket (PROXY_RATE requests per
+  second, bursts up to PROXY_BURST). When the host's proxy is out of
+  budget, the request goes through the best-scoring proxy that has budget
+  left, and the host keeps its sticky proxy.
+- Score: moving averages of latency and failure rate. A connection error,
+  a 5xx or a block page all count as failures. After a failure the host
+  moves to whichever proxy scores best, and a request that could not
+  reach its proxy is retried through another one.
+- Eviction: a proxy whose failure rate passes PROXY_MAX_FAILURE_RATE is
+  evicted for PROXY_EVICT_SECONDS. Its hosts move to the best remaining
+  proxy. When the time is up it is re-admitted on probation with a fresh
+  score. If every proxy is evicted, the one due back first is used anyway.
+"""
+
+import atexit
+import os
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+from fallen import metrics, tracing
+
+PROXY_POOL = os.getenv('PROXY_POOL', '')  # Comma-separated proxy URLs
+PROXY_POOL_FILE = os.getenv('PROXY_POOL_FILE')  # One proxy URL per line
+PROXY_RATE = float(os.getenv('PROXY_RATE', '2'))  # Requests per second per proxy
+PROXY_BURST = float(os.getenv('PROXY_BURST', '4'))
+PROXY_EVICT_SECONDS = float(os.getenv('PROXY_EVICT_SECONDS', '300'))
+PROXY_MAX_FAILURE_RATE = float(os.getenv('PROXY_MAX_FAILURE_RATE', '0.5'))
+PROXY_MIN_SAMPLES = 3  # Requests before a proxy can be evicted
+SCORE_WEIGHT = 0.3  # Weight of the newest sample in the moving averages
+FAILURE_PENALTY = 5.0  # Seconds of latency a failure rate of 100% is worth in the score
+
+
+def display(url):
+    """Proxy URL without credentials, for logs"""
+    parts = urlsplit(url)
+    netloc = (parts.hostname or '') + (f":{parts.port}" if parts.port else '')
+    return urlunsplit((parts.scheme, netloc, parts.path, '', ''))
+
+
+class Proxy:
+    """One egress point with its health score and rate budget"""
+
+    def __init__(self, url):
+        self.url = url
+        self.requests = 0
+        self.failures = 0
+        self.evictions = 0
+        self.admit()
+        self.tokens = PROXY_BURST
+        self.refilled_at = time.monotonic()
+
+    def admit(self):
+        """Start (again) with a clean score"""
+        self.latency = None
+        self.failure_rate = 0.0
+        self.samples = 0
+        self.evicted_until = None
+
+    def available(self, now):
+        return self.evicted_until is None or now >= self.evicted_until
+
+    def score(self):
+        """Lower is better; untried proxies score best so each gets a chance"""
+        return (self.latency or 0.0) + FAILURE_PENALTY * self.failure_rate
+
+    def refill(self, now):
+        self.tokens = min(PROXY_BURST, self.tokens + (now - self.refilled_at) * PROXY_RATE)
+        self.refilled_at = now
+
+    def record(self, ok, seconds):
+        self.requests += 1
+        self.failures += not ok
+        self.samples += 1
+        failed = 0.0 if ok else 1.0
+        self.failure_rate += SCORE_WEIGHT * (failed - self.failure_rate)
+        if ok:
+            self.latency = seconds if self.latency is None else self.latency + SCORE_WEIGHT * (seconds - self.latency)
+
+
+class Pool:
+    """Proxies shared by every session, with sticky per-host assignment"""
+
+    def __init__(self, urls):
+        self.proxies = [Proxy(url) for url in urls]
+        self.sticky = {}  # host -> Proxy
+        self.cond = threading.Condition()
+
+    def _candidates(self, now):
+        for proxy in self.proxies:
+            if proxy.evicted_until is not None and now >= proxy.evicted_until:
+                proxy.admit()
+                print(f"🌐 Proxy {display(proxy.url)} re-admitted on probation")
+        healthy = [proxy for proxy in self.proxies if proxy.available(now)]
+        # With everything evicted, the proxy due back first beats no traffic at all
+        return healthy or [min(self.proxies, key=lambda proxy: proxy.evicted_until)]
+
+    def _take(self, host):
+        """Spend a token on the host's sticky proxy, or the best one with budget; None if none has any"""
+        now = time.monotonic()
+        candidates = self._candidates(now)
+        for proxy in candidates:
+            proxy.refill(now)
+
+        sticky = self.sticky.get(host)
+        if sticky not in candidates:
+            sticky = self.sticky[host] = min(candidates, key=Proxy.score)
+        ready = [proxy for proxy in candidates if proxy.tokens >= 1]
+        if not ready:
+            return None
+        proxy = sticky if sticky in ready else min(ready, key=Proxy.score)
+        proxy.tokens -= 1
+        return proxy
+
+    def acquire(self, host):
+        """The proxy to use for one request to host, waiting for rate budget if needed"""
+        with self.cond:
+            proxy = self._take(host)
+            if proxy:
+                return proxy
+            with tracing.span(f"proxy budget {host}", 'throttle'):
+                while proxy is None:
+                    self.cond.wait(timeout=max(1 / PROXY_RATE, 0.01))
+                    proxy = self._take(host)
+            return proxy
+
+    def report(self, proxy, ok, seconds):
+        """Score one finished request; evicts the proxy if it keeps failing"""
+        with self.cond:
+            proxy.record(ok, seconds)
+            if not ok:
+                # Hosts on a failing proxy pick the best-scoring one again on their next request
+                for host in [host for host, assigned in self.sticky.items() if assigned is proxy]:
+                    del self.sticky[host]
+            if (proxy.evicted_until is None and proxy.samples >= PROXY_MIN_SAMPLES
+                    and proxy.failure_rate > PROXY_MAX_FAILURE_RATE and len(self.proxies) > 1):
+                proxy.evicted_until = time.monotonic() + PROXY_EVICT_SECONDS
+                proxy.evictions += 1
+                metrics.count('proxy_evictions')
+                print(f"🌐 Proxy {display(proxy.url)} evicted for {PROXY_EVICT_SECONDS:.0f}s "
+                      f"(failure rate {proxy.failure_rate:.0%})")
+            self.cond.notify_all()
+
+    def summary(self):
+        print("🌐 Proxy pool:")
+        for proxy in self.proxies:
+            latency = f"{proxy.latency * 1000:.0f}ms" if proxy.latency is not None else '-'
+            state = 'evicted' if not proxy.available(time.monotonic()) else 'ok'
+            print(f"   {display(proxy.url):<40} {proxy.requests:>6} requests {proxy.failures:>4} failed "
+                  f"{latency:>7} avg  {proxy.evictions} evictions  {state}")
+
+
+def configured_urls():
+    """Proxy URLs from PROXY_POOL, PROXY_POOL_FILE, or USE_PROXY/PROXY_URL"""
+    urls = [url.strip() for url in PROXY_POOL.split(',') if url.strip()]
+    if PROXY_POOL_FILE:
+        with open(PROXY_POOL_FILE, 'r') as f:
+            urls += [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+    if not urls and os.getenv('USE_PROXY', 'false').lower() == 'true' and os.getenv('PROXY_URL'):
+        urls = [os.getenv('PROXY_URL')]
+    return list(dict.fromkeys(urls))
+
+
+def _create_pool():
+    urls = configured_urls()
+    if not urls:
+        return None
+    pool = Pool(urls)
+    print(f"🌐 Proxy pool with {len(urls)} prox{'y' if len(urls) == 1 else 'ies'}")
+    if len(urls) > 1:
+        atexit.register(pool.summary)
+    return pool
+
+
+_pool = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def current():
+    """The configured proxy pool, built on first use; None when no proxies are configured"""
+    global _pool, _loaded
+    with _lock:
+        if not _loaded:
+            _pool = _create_pool()
+            _loaded = True
+        return _pool
@@ -0,0 +1,218 @@
+"""
+HeroRecord: the one shape a hero takes in every pipeline.
+
+The scripts used to pass heroes around as dicts whose keys depended on
+where they came from: search results had date/link, profile scrapes had
+date_of_death/profile_url, and query-fallen's profile details had
+death_location. A HeroRecord has one slot per field, so there is no
+per-instance __dict__. The old names still work as aliases:
+
+    hero = HeroRecord(name='...', date='July 4, 2007', link='/slug/id')
+    hero['date_of_death'] == hero['date'] == hero.date_of_death
+
+Enum-like values (branch, rank, operation/conflict, location) are
+interned, so a crawl holding thousands of heroes keeps one copy of
+"Army" rather than one per hero.
+
+Records also behave like the dicts they replace: [], get(), update(), in,
+keys() and items(). A field that was never set counts as missing, exactly as
+an absent key did. Keys with no slot, such as query-fallen's death_info,
+go into a small `extra` dict. to_dict() and json_default() give plain JSON
+with the canonical names.
+
+Fields that come from a profile page can be deferred. The loader runs the
+first time one of those fields is read, and then never again:
+
+    hero.defer(scraper.fill_profile, ('branch', 'location', 'image_url'))
+    hero['name']        # no fetch
+    hero['image_url']   # fill_profile(hero) runs here, once
+
+Concurrent readers wait for the one load. Iterating over a record
+(to_dict(), json, copy()) resolves it first, so serialized records are
+always complete.
+"""
+
+import sys
+import threading
+
+FIELDS = ('name', 'rank', 'branch', 'age', 'hometown', 'unit', 'date_of_death', 'location',
+          'circumstances', 'operation', 'profile_url', 'image_url', 'year')
+
+ALIASES = {
+    'date': 'date_of_death',
+    'link': 'profile_url',
+    'death_location': 'location',
+    'conflict': 'operation',
+}
+
+INTERNED = frozenset({'branch', 'rank', 'operation', 'location'})
+
+SLOTS = {**{field: field for field in FIELDS}, **ALIASES}  # Any accepted key -> its slot
+
+_MISSING = object()
+
+
+class _Pending:
+    """A deferred loader and the fields it fills"""
+
+    __slots__ = ('loader', 'fields', 'lock', 'running')
+
+    def __init__(self, loader, fields):
+        self.loader = loader
+        self.fields = fields
+        self.lock = threading.RLock()
+        self.running = False
+
+
+class HeroRecord:
+    """One fallen service member; see the module docstring"""
+
+    __slots__ = FIELDS + ('extra', 'pending')
+
+    def __init__(self, data=None, **fields):
+        # Unset slots hold _MISSING rather than staying empty: reading an empty
+        # slot raises AttributeError, and get() on a missing field is common
+        for field in FIELDS:
+            object.__setattr__(self, field, _MISSING)
+        self.extra = None
+        self.pending = None
+        if data:
+            self.update(data)
+        if fields:
+            self.update(fields)
+
+    @classmethod
+    def from_dict(cls, data):
+        """A record from a dict (or record) with any mix of canonical and alias keys"""
+        return data if isinstance(data, cls) else cls(data)
+
+    # --- deferred fields -------------------------------------------------------
+
+    def defer(self, loader, fields):
+        """Call loader(self) the first time one of fields is read"""
+        self.pending = _Pending(loader, frozenset(SLOTS.get(field, field) for field in fields))
+        return self
+
+    def resolve(self):
+        """Run the deferred loader now, if it hasn't run yet"""
+        pending = self.pending
+        if pending is None:
+            return self
+        with pending.lock:
+            # running: the loader itself read a deferred field (e.g. to log it)
+            if self.pending is pending and not pending.running:
+                pending.running = True
+                try:
+                    pending.loader(self)
+                finally:
+                    self.pending = None
+        return self
+
+    # --- dict-style access ----------------------------------------------------
+
+    def __getitem__(self, key):
+        slot = SLOTS.get(key)
+        pending = self.pending
+        if pending is not None and (slot or key) in pending.fields:
+            self.resolve()
+        value = getattr(self, slot) if slot else (self.extra or {}).get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        slot = SLOTS.get(key)
+        if slot:
+            if slot in INTERNED and type(value) is str:
+                value = sys.intern(value)
+            object.__setattr__(self, slot, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        slot = SLOTS.get(key)
+        if slot:
+            object.__setattr__(self, slot, _MISSING)
+        else:
+            del self.extra[key]
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        slot = SLOTS.get(key)
+        pending = self.pending
+        if pending is not None and (slot or key) in pending.fields:
+            self.resolve()
+        if slot:
+            value = getattr(self, slot)
+            return default if value is _MISSING else value
+        return self.extra.get(key, default) if self.extra else default
+
+    def update(self, other=(), **fields):
+        items = other.items() if hasattr(other, 'items') else other
+        for key, value in items:
+            self[key] = value
+        for key, value in fields.items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def keys(self):
+        if self.pending is not None:
+            self.resolve()
+        for field in FIELDS:
+            if getattr(self, field) is not _MISSING:
+                yield field
+        if self.extra:
+            yield from self.extra
+
+    __iter__ = keys
+
+    def items(self):
+        for key in self.keys():
+            yield key, self[key]
+
+    def values(self):
+        for key in self.keys():
+            yield self[key]
+
+    def __len__(self):
+        return sum(1 for _ in self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (HeroRecord, dict)):
+            return self.to_dict() == dict(HeroRecord.from_dict(other).items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def copy(self):
+        return HeroRecord(self)
+
+    def __reduce__(self):
+        # Pickled as its plain fields (the _MISSING sentinel doesn't survive pickling)
+        return HeroRecord, (self.to_dict(),)
+
+    def to_dict(self):
+        """Plain dict with canonical keys, for JSON"""
+        return dict(self.items())
+
+    def __repr__(self):
+        # Without resolving: printing a record shouldn't fetch its profile
+        known = {field: getattr(self, field) for field in FIELDS if getattr(self, field) is not _MISSING}
+        return f"HeroRecord({known!r}{', profile pending' if self.pending else ''})"
+
+
+def json_default(value):
+    """json.dump(..., default=json_default) writes HeroRecords as plain objects"""
+    if isinstance(value, HeroRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,326 @@
+"""
+Local roster of every hero whose profile has been scraped, with an
+inverted index for attribute queries.
+
+Profiles scraped by any of the scripts are recorded here instead of being
+dropped once the caption is built. Over a few weeks of daily runs, themed
+posts can be assembled without touching the site:
+
+    from fallen import roster
+    roster.query(branch='Marines', state='TX', month_day='07-04')
+
+    python -m fallen roster --branch marines --state texas --today
+
+Field values are normalized before they are indexed or queried:
+
+- branch: one of Army, Marines, Navy, Air Force, Coast Guard, Space Force
+- state: a postal code, worked out from the hometown ("Fresno, Calif." -> CA)
+- country: the last part of the place of death
+- operation: from the profile, or inferred from the country and date
+- month_day and year: from the date of death
+
+hometown, unit and location are indexed word by word, so unit='502nd
+Infantry' matches every hero of that regiment. A query intersects the
+smallest posting lists first. The roster lives in the state directory
+(roster.json) and is saved every ROSTER_SAVE_INTERVAL seconds while it
+grows, and when the process exits.
+"""
+
+import atexit
+import json
+import os
+import re
+import string
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from fallen import state
+
+ROSTER_FILE = 'roster.json'
+ROSTER_VERSION = 1
+ROSTER_SAVE_INTERVAL = 30  # Seconds between saves while heroes are being added (and once at exit)
+
+INDEXED_FIELDS = ('branch', 'state', 'country', 'operation', 'month_day', 'year')
+WORD_FIELDS = ('hometown', 'unit', 'location')
+
+BRANCHES = [('marine', 'Marines'), ('army', 'Army'), ('navy', 'Navy'), ('naval', 'Navy'),
+            ('air force', 'Air Force'), ('coast guard', 'Coast Guard'), ('space force', 'Space Force')]
+
+# Postal codes by full name, AP abbreviation and code
+STATES = {
+    'AL': ('alabama', 'ala.'), 'AK': ('alaska',), 'AZ': ('arizona', 'ariz.'), 'AR': ('arkansas', 'ark.'),
+    'CA': ('california', 'calif.'), 'CO': ('colorado', 'colo.'), 'CT': ('connecticut', 'conn.'),
+    'DE': ('delaware', 'del.'), 'DC': ('district of columbia', 'd.c.'), 'FL': ('florida', 'fla.'),
+    'GA': ('georgia', 'ga.'), 'HI': ('hawaii',), 'ID': ('idaho',), 'IL': ('illinois', 'ill.'),
+    'IN': ('indiana', 'ind.'), 'IA': ('iowa',), 'KS': ('kansas', 'kan.'), 'KY': ('kentucky', 'ky.'),
+    'LA': ('louisiana', 'la.'), 'ME': ('maine',), 'MD': ('maryland', 'md.'), 'MA': ('massachusetts', 'mass.'),
+    'MI': ('michigan', 'mich.'), 'MN': ('minnesota', 'minn.'), 'MS': ('mississippi', 'miss.'),
+    'MO': ('missouri', 'mo.'), 'MT': ('montana', 'mont.'), 'NE': ('nebraska', 'neb.'), 'NV': ('nevada', 'nev.'),
+    'NH': ('new hampshire', 'n.h.'), 'NJ': ('new jersey', 'n.j.'), 'NM': ('new mexico', 'n.m.'),
+    'NY': ('new york', 'n.y.'), 'NC': ('north carolina', 'n.c.'), 'ND': ('north dakota', 'n.d.'),
+    'OH': ('ohio',), 'OK': ('oklahoma', 'okla.'), 'OR': ('oregon', 'ore.'), 'PA': ('pennsylvania', 'pa.'),
+    'RI': ('rhode island', 'r.i.'), 'SC': ('south carolina', 's.c.'), 'SD': ('south dakota', 's.d.'),
+    'TN': ('tennessee', 'tenn.'), 'TX': ('texas', 'tex.'), 'UT': ('utah',), 'VT': ('vermont', 'vt.'),
+    'VA': ('virginia', 'va.'), 'WA': ('washington', 'wash.'), 'WV': ('west virginia', 'w.va.'),
+    'WI': ('wisconsin', 'wis.'), 'WY': ('wyoming', 'wyo.'), 'PR': ('puerto rico',), 'GU': ('guam',),
+    'VI': ('virgin islands',), 'AS': ('american samoa',), 'MP': ('northern mariana islands',),
+}
+STATE_CODES = {name: code for code, names in STATES.items() for name in names + (code.lower(),)}
+
+_date_re = re.compile(r'([A-Z][a-z]+\.? \d{1,2}, \d{4}|\d{1,2}/\d{1,2}/\d{4}|\d{4}-\d{2}-\d{2})')
+_operation_re = re.compile(r"Operation ((?:[A-Z][\w']*)(?: [A-Z][\w']*)*)")
+_word_re = re.compile(r"[a-z0-9]+")
+
+
+def normalize_branch(value):
+    value = (value or '').lower()
+    for needle, branch in BRANCHES:
+        if needle in value:
+            return branch
+    return None
+
+
+def normalize_state(value):
+    """Postal code for a state name, abbreviation or 'City, State' string"""
+    value = (value or '').strip().lower()
+    if not value:
+        return None
+    if value in STATE_CODES:
+        return STATE_CODES[value]
+    return STATE_CODES.get(value.rsplit(',', 1)[-1].strip())
+
+
+def normalize_operation(value):
+    match = _operation_re.search(value or '')
+    if match:
+        return f"Operation {match.group(1)}"
+    return string.capwords(value.strip()) if value and value.strip() else None
+
+
+def parse_date(value):
+    match = _date_re.search(value or '')
+    if not match:
+        return None
+    text = match.group(1).replace('.', '')
+    for fmt in ('%B %d, %Y', '%b %d, %Y', '%m/%d/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def infer_operation(country, date):
+    """The named operation a death in country on date most likely belongs to"""
+    if not country or not date:
+        return None
+    day = date.strftime('%Y-%m-%d')
+    if country == 'Iraq':
+        if day < '2010-09-01':
+            return 'Operation Iraqi Freedom'
+        if day <= '2011-12-15':
+            return 'Operation New Dawn'
+        return 'Operation Inherent Resolve' if day >= '2014-06-15' else None
+    if country == 'Syria':
+        return 'Operation Inherent Resolve'
+    if country in ('Afghanistan', 'Pakistan'):
+        return 'Operation Enduring Freedom' if day <= '2014-12-31' else "Operation Freedom's Sentinel"
+    return None
+
+
+def words(value):
+    return set(_word_re.findall((value or '').lower()))
+
+
+def normalize(hero):
+    """
+    Roster record for a hero dict from any of the scripts (their field names
+    differ: date/date_of_death/formatted_date, link/profile_url). Returns
+    None when there is no profile link to key it on.
+    """
+    link = hero.get('profile_url') or hero.get('link')
+    if not link:
+        return None
+    date = parse_date(hero.get('date_of_death') or hero.get('date') or hero.get('formatted_date'))
+    location = hero.get('location') or ''
+    country = location.rsplit(',', 1)[-1].strip() or None
+    operation = normalize_operation(hero.get('operation')) or infer_operation(country, date)
+    return {
+        'id': urlsplit(link).path,
+        'name': hero.get('name', ''),
+        'rank': hero.get('rank', ''),
+        'branch': normalize_branch(hero.get('branch')),
+        'age': str(hero.get('age') or ''),
+        'hometown': hero.get('hometown', ''),
+        'state': normalize_state(hero.get('hometown')),
+        'unit': hero.get('unit', ''),
+        'location': location,
+        'country': country,
+        'operation': operation,
+        'date': date.strftime('%Y-%m-%d') if date else None,
+        'month_day': date.strftime('%m-%d') if date else None,
+        'year': str(date.year) if date else None,
+        'profile_url': link,
+        'image_url': hero.get('image_url')
+    }
+
+
+def query_value(field, value):
+    """Normalize a query value the same way as the indexed field"""
+    value = str(value).strip()
+    if field == 'branch':
+        return normalize_branch(value) or value
+    if field == 'state':
+        return normalize_state(value) or value.upper()
+    if field == 'country':
+        return string.capwords(value)
+    if field == 'operation':
+        return normalize_operation(string.capwords(value if value.lower().startswith('operation') else f"operation {value}"))
+    return value
+
+
+class Roster:
+    """Hero records keyed by profile path, with an inverted index over their attributes"""
+
+    def __init__(self, filename=ROSTER_FILE):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.records = {}
+        self.index = {field: {} for field in INDEXED_FIELDS + WORD_FIELDS}
+        self.dirty = False
+        self.saved_at = time.monotonic()
+
+    def load(self):
+        path = os.path.join(state.STATE_DIR, self.filename)
+        if not os.path.exists(path):
+            return self
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not read roster: {e}")
+            return self
+        if data.get('version') == ROSTER_VERSION:
+            for record in data['heroes']:
+                self._insert(record)
+        return self
+
+    def save(self):
+        if not self.dirty:
+            return
+        path = state.state_path(self.filename)
+        with self.lock:
+            heroes = sorted(self.records.values(), key=lambda record: (record['date'] or '', record['id']))
+            self.dirty = False
+            self.saved_at = time.monotonic()
+        try:
+            state.write_json(path, {'version': ROSTER_VERSION, 'heroes': heroes}, separators=(',', ':'))
+        except OSError as e:
+            print(f"⚠️ Could not save roster: {e}")
+
+    def _postings(self, record):
+        for field in INDEXED_FIELDS:
+            if record.get(field):
+                yield field, record[field]
+        for field in WORD_FIELDS:
+            for word in words(record.get(field)):
+                yield field, word
+
+    def _insert(self, record):
+        old = self.records.get(record['id'])
+        if old:
+            for field, value in self._postings(old):
+                self.index[field][value].discard(old['id'])
+        self.records[record['id']] = record
+        for field, value in self._postings(record):
+            self.index[field].setdefault(value, set()).add(record['id'])
+
+    def _merge(self, record):
+        """Insert or update one normalized record; False if it changed nothing. Holds self.lock."""
+        old = self.records.get(record['id'])
+        if old:
+            # Keep what earlier scrapes found when this one came back with less
+            record = {**old, **{key: value for key, value in record.items() if value}}
+            if record == old:
+                return False
+        self._insert(record)
+        self.dirty = True
+        return True
+
+    def add(self, hero):
+        """Record (or update) a scraped hero"""
+        record = normalize(hero)
+        if record is None:
+            return
+        with self.lock:
+            if not self._merge(record):
+                return
+            due = time.monotonic() - self.saved_at > ROSTER_SAVE_INTERVAL
+        if due:
+            self.save()  # A killed run keeps most of what it scraped
+
+    def merge(self, records):
+        """Fold in roster records from elsewhere (e.g. crawl shards). Returns how many were new or changed."""
+        with self.lock:
+            return sum(self._merge(record) for record in records)
+
+    def query(self, **filters):
+        """
+        Records matching every filter, ordered by date. Keys are the indexed
+        fields (branch, state, country, operation, month_day, year) and the
+        word fields (hometown, unit, location: every word must match).
+        """
+        postings = []
+        with self.lock:
+            for field, value in filters.items():
+                if value is None:
+                    continue
+                if field in WORD_FIELDS:
+                    terms = words(value)
+                elif field in INDEXED_FIELDS:
+                    terms = [query_value(field, value)]
+                else:
+                    raise ValueError(f"Unknown roster field {field!r}")
+                postings += [self.index[field].get(term, set()) for term in terms]
+
+            if not postings:
+                ids = set(self.records)
+            else:
+                postings.sort(key=len)
+                ids = set(postings[0])
+                for posting in postings[1:]:
+                    if not ids:
+                        break
+                    ids &= posting
+            found = [self.records[hero_id] for hero_id in ids]
+        return sorted(found, key=lambda record: (record['date'] or '', record['name']))
+
+    def facets(self, field):
+        """value -> number of heroes, for an indexed field"""
+        with self.lock:
+            return {value: len(ids) for value, ids in sorted(self.index[field].items()) if ids}
+
+
+_roster = None
+_roster_lock = threading.Lock()
+
+
+def load():
+    """The process-wide roster, read from the state directory on first use"""
+    global _roster
+    with _roster_lock:
+        if _roster is None:
+            _roster = Roster().load()
+            atexit.register(_roster.save)
+        return _roster
+
+
+def record(hero):
+    """Add a scraped hero to the roster"""
+    load().add(hero)
+
+
+def query(**filters):
+    return load().query(**filters)
@@ -0,0 +1,175 @@
+"""
+Bulk scheduling of memorial posts via the Graph API.
+
+Instead of one job run per post, --schedule builds posts for a range of
+dates and submits them as unpublished posts with scheduled_publish_time.
+Each date gets a fixed publish slot; a post already scheduled in that slot
+with the same message counts as done, which makes per-day retries and
+re-runs safe.
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+
+from fallen import metrics, transport
+
+# Time of day (UTC) scheduled posts go live - matches the workflows' cron
+PUBLISH_TIME_UTC = os.getenv('PUBLISH_TIME_UTC', '12:00')
+SCHEDULE_RETRIES = int(os.getenv('SCHEDULE_RETRIES', '3'))
+SCHEDULE_RETRY_DELAY = int(os.getenv('SCHEDULE_RETRY_DELAY', '30'))
+
+# Graph only accepts scheduled times between 10 minutes and 75 days ahead
+MIN_LEAD_SECONDS = 10 * 60
+MAX_LEAD_SECONDS = 75 * 24 * 3600
+
+# Multi-post days are spaced a minute apart so they go live in order
+SHARD_SPACING_SECONDS = 60
+
+
+def publish_slot(date):
+    """Unix timestamp at which the post for `date` should go live"""
+    hour, minute = (int(part) for part in PUBLISH_TIME_UTC.split(':'))
+    slot = datetime(date.year, date.month, date.day, hour, minute, tzinfo=timezone.utc)
+    return int(slot.timestamp())
+
+
+def check_slot(timestamp):
+    """Return an error message if Graph would reject this scheduled time"""
+    lead = timestamp - time.time()
+    if lead < MIN_LEAD_SECONDS:
+        return "less than 10 minutes ahead"
+    if lead > MAX_LEAD_SECONDS:
+        return "more than 75 days ahead"
+    return None
+
+
+def get_scheduled_posts(poster):
+    """Map scheduled_publish_time -> [(post ID, message)] for the page's scheduled posts"""
+    url = f"{poster.base_url}/{poster.page_id}/scheduled_posts"
+    params = {
+        'fields': 'id,message,scheduled_publish_time',
+        'limit': 100,
+        'access_token': poster.access_token
+    }
+    slots = {}
+
+    while url:
+        response = transport.get(url, params=params, timeout=30)
+        if response.status_code != 200:
+            print(f"⚠️ Could not list scheduled posts: {response.text}")
+            break
+
+        result = response.json()
+        for post in result.get('data', []):
+            if post.get('scheduled_publish_time') is not None:
+                slot = int(float(post['scheduled_publish_time']))
+                slots.setdefault(slot, []).append((post.get('id'), post.get('message', '')))
+
+        # The "next" URL already carries every query parameter
+        url = result.get('paging', {}).get('next')
+        params = None
+
+    return slots
+
+
+def find_scheduled_post(scheduled_posts, timestamp, message):
+    """
+    ID of an already scheduled post with this slot and message, if any.
+
+    Both posters share a page (and possibly a slot), so the message is what
+    tells an earlier attempt's post apart from the other script's.
+    """
+    for post_id, existing_message in scheduled_posts.get(timestamp, []):
+        if existing_message.strip() == message.strip():
+            return post_id
+    return None
+
+
+def attached_count(post):
+    """Number of photos attached to a post, from its `attachments` field"""
+    count = 0
+    for attachment in post.get('attachments', {}).get('data', []):
+        subattachments = attachment.get('subattachments', {}).get('data')
+        count += len(subattachments) if subattachments is not None else 1
+    return count
+
+
+def verify_scheduled_post(poster, post_id, timestamp, media_count=None):
+    """
+    Confirm a post exists, is unpublished and is scheduled for `timestamp`,
+    and, with media_count, that all of its attached photos are still there.
+    """
+    url = f"{poster.base_url}/{post_id}"
+    fields = 'is_published,scheduled_publish_time'
+    if media_count:
+        fields += ',attachments{subattachments}'
+    try:
+        response = transport.get(
+            url,
+            params={'fields': fields, 'access_token': poster.access_token},
+            timeout=30
+        )
+        if response.status_code != 200:
+            print(f"  ⚠️ Could not verify post {post_id}: {response.text}")
+            return False
+
+        result = response.json()
+        scheduled = result.get('scheduled_publish_time')
+        if result.get('is_published') or scheduled is None or int(float(scheduled)) != timestamp:
+            print(f"  ⚠️ Post {post_id} is not scheduled as expected: {result}")
+            return False
+        if media_count and attached_count(result) < media_count:
+            print(f"  ⚠️ Post {post_id} has {attached_count(result)} of its {media_count} photos attached")
+            return False
+
+        print(f"  ✅ Verified post {post_id} scheduled for {format_slot(timestamp)}")
+        return True
+
+    except Exception as e:
+        print(f"  ⚠️ Error verifying post {post_id}: {e}")
+        return False
+
+
+def format_slot(timestamp):
+    """Human-readable UTC time for a publish slot"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
+
+
+def schedule_days(dates, schedule_day):
+    """
+    Call schedule_day(date) for every date, retrying failed days.
+
+    schedule_day returns True once everything for that date is scheduled and
+    verified. Failed days are retried up to SCHEDULE_RETRIES times in total.
+    Returns the list of dates that still failed.
+    """
+    pending = list(dates)
+
+    for attempt in range(1, SCHEDULE_RETRIES + 1):
+        if attempt > 1:
+            print(f"\n🔁 Retry {attempt - 1}/{SCHEDULE_RETRIES - 1} for {len(pending)} day(s) "
+                  f"in {SCHEDULE_RETRY_DELAY}s...")
+            time.sleep(SCHEDULE_RETRY_DELAY)
+            metrics.count('schedule_day_retries', len(pending))
+
+        failed = []
+        for date in pending:
+            print(f"\n{'=' * 60}\n🗓️ Scheduling {date.strftime('%Y-%m-%d')}")
+            try:
+                ok = schedule_day(date)
+            except Exception as e:
+                print(f"❌ Error scheduling {date.strftime('%Y-%m-%d')}: {e}")
+                ok = False
+            if not ok:
+                failed.append(date)
+
+        pending = failed
+        if not pending:
+            break
+
+    scheduled = len(dates) - len(pending)
+    print(f"\n📊 Scheduled {scheduled}/{len(dates)} day(s)")
+    for date in pending:
+        print(f"  ❌ {date.strftime('%Y-%m-%d')} could not be scheduled")
+    return pending
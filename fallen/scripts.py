@@ -0,0 +1,38 @@
+"""
+Load the top-level scripts as modules.
+
+The scripts have hyphenated file names (soldier-fb.py, ...) so they cannot
+be imported normally. load_script() imports one by path, once per process,
+without running its main().
+"""
+
+import importlib.util
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPTS = ('query-fallen', 'soldier-fb', 'service-all-fb')
+
+
+def load_script(name):
+    """Import query-fallen, soldier-fb or service-all-fb and return the module"""
+    if name not in SCRIPTS:
+        raise ValueError(f"Unknown script {name!r}; expected one of {', '.join(SCRIPTS)}")
+
+    module_name = name.replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+    except Exception:
+        del sys.modules[module_name]
+        raise
+    return module
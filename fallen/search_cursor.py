@@ -0,0 +1,168 @@
+"""
+Cursor over every page of a Military Times search.
+
+The site splits long result lists into pages ("Showing 1 - 25 of 212
+results"). Reading only the first page, as the scripts used to, dropped
+everything after it without a word. A SearchCursor follows the pages and
+parses each one as it arrives:
+
+    cursor = SearchCursor(query_url, session.get, parse, first_page=response.text)
+    cursor.total          # from the first page's results header, before the rest is fetched
+    cursor.nth(17)        # fetches only the pages up to the 18th entry
+    heroes = list(cursor) # every page
+
+The next page is the page's rel="next" link when there is one. Otherwise,
+when the header shows results past this page, it is the same URL with
+page=N+1. A page that fails or comes back blocked ends the walk early, and
+`complete` stays False, so callers can tell a short result apart from a
+truncated one.
+"""
+
+import html
+import os
+import re
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from fallen import metrics, throttle
+
+MAX_SEARCH_PAGES = int(os.getenv('MAX_SEARCH_PAGES', '100'))  # Pages followed for one search, at most
+
+_results_re = re.compile(r'Showing\s+([\d,]+)\s*-\s*([\d,]+)\s+of\s+([\d,]+)', re.IGNORECASE)
+_next_tag_re = re.compile(r'<(?:a|link)\b[^>]*\brel=["\']?next\b[^>]*>', re.IGNORECASE)
+_href_re = re.compile(r'\bhref=["\']([^"\']+)["\']', re.IGNORECASE)
+
+
+def results_range(page):
+    """(first, last, total) from a page's "Showing 1 - 25 of 212" header, or None"""
+    match = _results_re.search(page)
+    if not match:
+        return None
+    return tuple(int(group.replace(',', '')) for group in match.groups())
+
+
+def with_page(url, number):
+    """url with its page= parameter set to number"""
+    parts = urlsplit(url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != 'page']
+    query.append(('page', str(number)))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def next_page_url(page, url, number):
+    """URL of the page after page number `number` (1-based), or None on the last page"""
+    tag = _next_tag_re.search(page)
+    href = _href_re.search(tag.group(0)) if tag else None
+    if href:
+        return urljoin(url, html.unescape(href.group(1)))
+    shown = results_range(page)
+    if shown and shown[1] < shown[2]:
+        return with_page(url, number + 1)
+    return None
+
+
+class SearchCursor:
+    """Entries of one search, fetched and parsed a page at a time"""
+
+    def __init__(self, url, get, parse=None, first_page=None):
+        self.url = url
+        self.get = get
+        self.parse = parse
+        self.page_htmls = []
+        self.entries = []
+        self.complete = False
+        self.total = None
+        self._next_url = url
+        self._number = 0
+        if first_page is not None:
+            self._add_page(url, first_page)
+
+    @classmethod
+    def from_entries(cls, entries):
+        """A finished cursor over entries that are already known (e.g. from a month bucket)"""
+        cursor = cls(None, None)
+        cursor.entries = list(entries)
+        cursor.total = len(cursor.entries)
+        cursor.complete = True
+        cursor._next_url = None
+        return cursor
+
+    @classmethod
+    def failed(cls):
+        """An empty cursor for a search whose first page failed or was blocked; `complete` stays False"""
+        cursor = cls(None, None)
+        cursor._next_url = None
+        return cursor
+
+    def _add_page(self, url, page):
+        self._number += 1
+        if self.parse:
+            self.entries.extend(self.parse(page))
+        else:
+            self.page_htmls.append(page)
+        shown = results_range(page)
+        if self.total is None and shown:
+            self.total = shown[2]
+        next_url = next_page_url(page, url, self._number)
+        if next_url is None:
+            self.complete = True
+            self._next_url = None
+        elif self._number >= MAX_SEARCH_PAGES or next_url == url:
+            print(f"  ⚠️ Stopped following search pages after page {self._number}")
+            self._next_url = None
+        else:
+            self._next_url = next_url
+
+    def _fetch_next(self):
+        """Fetch one more page. Returns False when there are no more."""
+        url = self._next_url
+        if url is None:
+            return False
+        self._next_url = None  # Cleared until the page succeeds, so a failure ends the walk
+        try:
+            response = self.get(url, timeout=30)
+        except Exception as e:
+            print(f"  ⚠️ Search page {self._number + 1} failed: {e}")
+            return False
+        reason = throttle.block_reason(response) or (f"HTTP {response.status_code}" if response.status_code != 200 else None)
+        if reason:
+            print(f"  ⚠️ Search page {self._number + 1} unavailable ({reason})")
+            return False
+        if self._number:
+            metrics.count('search_pages_followed')
+        self._add_page(url, response.text)
+        return True
+
+    def count(self):
+        """Number of entries: the header's total if there is one, otherwise every page is walked"""
+        if not self._number and self._next_url:
+            self._fetch_next()
+        if self.total is not None:
+            return self.total
+        return len(self.fetch_all())
+
+    def nth(self, index):
+        """Entry number index (0-based), fetching only the pages needed; None if there is none"""
+        while index >= len(self.entries) and self._fetch_next():
+            pass
+        return self.entries[index] if index < len(self.entries) else None
+
+    def pages(self):
+        """Raw HTML of every page, following the pagination (cursors without a parse function)"""
+        while self._fetch_next():
+            pass
+        return list(self.page_htmls)
+
+    def fetch_all(self):
+        """Every entry, following the pagination"""
+        while self._fetch_next():
+            pass
+        return list(self.entries)
+
+    def __iter__(self):
+        index = 0
+        while True:
+            while index >= len(self.entries):
+                if not self._fetch_next():
+                    return
+            yield self.entries[index]
+            index += 1
@@ -0,0 +1,122 @@
+"""
+Sharded historical crawls with mergeable partial rosters.
+
+A full backfill (2003-03-20 to today) is one search per day, over 7,000
+of them, and `fallen crawl` runs it as one process. Sharding splits the
+date range into disjoint windows, so several processes or CI runners can
+each take a share:
+
+    python -m fallen crawl --shard 0/4 -o part0.json    # on four runners
+    python -m fallen crawl --shard 1/4 -o part1.json    # ...
+    python -m fallen roster --merge part*.json          # then, anywhere
+
+The windows are calendar months, dealt round-robin by absolute month
+number, so shard k of n always owns the same months whatever --from and
+--to are. The early war years, which have the most heroes per day, are
+spread across every shard. With MONTH_PREFETCH each month bucket is
+fetched by exactly one shard.
+
+A shard writes a partial roster: the roster's own records (see
+fallen/roster.py), plus a `shard` header that records which slice of which
+range it covers. Merging folds the records into the main roster and
+dedupes by profile path, the roster's key. It warns when the files don't
+add up to a whole run, for example when a shard is missing or the files
+come from different ranges.
+"""
+
+import json
+import os
+
+from fallen import clock, roster
+
+PARTIAL_KIND = 'roster-shard'
+
+
+def month_number(date):
+    return date.year * 12 + date.month - 1
+
+
+def in_shard(date, index, count):
+    """True if date's month belongs to shard index of count"""
+    return month_number(date) % count == index
+
+
+def shard_days(days, index, count):
+    """The days (datetimes) that shard index of count searches"""
+    return [day for day in days if in_shard(day, index, count)]
+
+
+def default_path(index, count):
+    return f"roster-shard-{index}-of-{count}.json"
+
+
+def write_partial(path, heroes, index, count, start, end, days):
+    """Save a shard's heroes as roster records with a header describing the shard"""
+    found = (roster.normalize(hero) for hero in heroes)
+    records = sorted((record for record in found if record),
+                     key=lambda record: (record['date'] or '', record['id']))
+    records = list({record['id']: record for record in records}.values())
+    data = {
+        'version': roster.ROSTER_VERSION,
+        'kind': PARTIAL_KIND,
+        'shard': {
+            'index': index,
+            'count': count,
+            'start': start.strftime('%Y-%m-%d'),
+            'end': end.strftime('%Y-%m-%d'),
+            'days': days,
+        },
+        'created_at': clock.now().isoformat(timespec='seconds'),
+        'heroes': records,
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    print(f"💾 Saved shard {index}/{count}: {len(records)} heroes from {days} days to {path}")
+
+
+def read_partial(path):
+    """A partial roster written by write_partial; raises ValueError if path isn't one"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    if data.get('kind') != PARTIAL_KIND or data.get('version') != roster.ROSTER_VERSION:
+        raise ValueError(f"{path} is not a version {roster.ROSTER_VERSION} roster shard")
+    return data
+
+
+def missing_shards(headers):
+    """Warnings for shards that don't add up to one whole run"""
+    runs = {}
+    for header in headers:
+        run = (header['count'], header['start'], header['end'])
+        runs.setdefault(run, set()).add(header['index'])
+    warnings = []
+    if len(runs) > 1:
+        warnings.append(f"shards come from {len(runs)} different runs")
+    for (count, start, end), indexes in sorted(runs.items()):
+        missing = sorted(set(range(count)) - indexes)
+        if missing:
+            warnings.append(f"{start} to {end} is missing shard(s) {', '.join(map(str, missing))} of {count}")
+    return warnings
+
+
+def merge(paths, index=None):
+    """
+    Merge partial rosters into the roster (the process-wide one by default)
+    and save it. Returns the number of records that were new or changed.
+    """
+    index = index or roster.load()
+    headers = []
+    changed = 0
+    for path in paths:
+        data = read_partial(path)
+        headers.append(data['shard'])
+        changed += index.merge(data['heroes'])
+        shard = data['shard']
+        print(f"  📥 {path}: shard {shard['index']}/{shard['count']}, {len(data['heroes'])} heroes")
+    for warning in missing_shards(headers):
+        print(f"⚠️ Incomplete merge: {warning}")
+    index.save()
+    print(f"✅ Merged {len(paths)} shard(s): {changed} new or updated, {len(index.records)} heroes in the roster")
+    return changed
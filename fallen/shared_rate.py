@@ -0,0 +1,170 @@
+"""
+Request rate shared by every process on the machine.
+
+fallen/throttle.py paces one process. soldier-fb, service-all-fb, a manual
+query-fallen run and crawl shards (fallen/shards.py) each have their own
+controllers, so several running side by side can jointly hit Military
+Times much harder than any one of them would. With SHARED_RATE set, every
+process takes its requests to a throttled host from one token bucket per
+host, kept in a file:
+
+    SHARED_RATE=4 python soldier-fb.py &
+    SHARED_RATE=4 python -m fallen crawl --shard 0/2 &
+    SHARED_RATE=4 python -m fallen crawl --shard 1/2 &
+
+Those three jobs send at most 4 requests a second to each host between
+them (bursts up to SHARED_BURST). Each one runs at full speed when it is
+alone.
+
+The bucket for a host is SHARED_RATE_DIR/<host>.lock. A process holds an
+exclusive flock on that file just long enough to read the bucket, refill
+it, take a token and write it back. When the bucket is empty it reserves
+the next token, releases the lock and sleeps until that token is due, so
+waiting processes queue in order without polling. A pause set by one
+process after a 429 or block page (Retry-After, backoff) is written to
+the same file, and the other processes wait it out too.
+
+Only critical requests (fallen/priority.py) reserve tokens ahead of time.
+Prefetch and backfill requests take a token only when one is free, so a
+crawl shard can't queue up reservations ahead of another process's post.
+
+The fixed courtesy sleeps before profile and image fetches are skipped
+while the shared limiter is on, since it already paces those requests.
+The limiter coordinates processes on one machine only. GitHub-hosted
+workflow runs are separate machines and are not covered. It needs fcntl,
+so on Windows SHARED_RATE is ignored with a warning.
+"""
+
+import os
+import random
+import struct
+import tempfile
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from fallen import metrics, priority, tracing
+
+SHARED_RATE = float(os.getenv('SHARED_RATE', '0'))  # Requests per second per host, across all processes; 0 = off
+SHARED_BURST = float(os.getenv('SHARED_BURST', '4'))
+SHARED_RATE_DIR = os.getenv('SHARED_RATE_DIR', os.path.join(tempfile.gettempdir(), 'fallen-rate'))
+
+_BUCKET = struct.Struct('<ddd')  # tokens, refilled_at, paused_until (wall clock: shared between processes)
+
+
+def enabled():
+    return SHARED_RATE > 0 and fcntl is not None
+
+
+if SHARED_RATE > 0 and fcntl is None:
+    print("⚠️ SHARED_RATE needs fcntl file locks; pacing each process on its own")
+
+
+class Bucket:
+    """One host's token bucket, in a file every process locks before using it"""
+
+    def __init__(self, host, rate=None, burst=None, directory=None):
+        self.rate = rate or SHARED_RATE
+        self.burst = max(1.0, burst or SHARED_BURST)
+        directory = directory or SHARED_RATE_DIR
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{host.replace(':', '_')}.lock")
+
+    def _update(self, change):
+        """Apply change(tokens, refilled_at, paused_until, now) -> (state, result) under the file lock"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            data = os.pread(fd, _BUCKET.size, 0)
+            now = time.time()
+            if len(data) == _BUCKET.size:
+                tokens, refilled_at, paused_until = _BUCKET.unpack(data)
+            else:
+                tokens, refilled_at, paused_until = self.burst, now, 0.0
+            state, result = change(tokens, refilled_at, paused_until, now)
+            os.pwrite(fd, _BUCKET.pack(*state), 0)
+            return result
+        finally:
+            os.close(fd)  # Releases the lock
+
+    def reserve(self, borrow=True):
+        """
+        Take the next token. Returns (taken, seconds to wait). With borrow,
+        the token is always taken, possibly ahead of time, and the wait is
+        until it is due. Without, a token is only taken if one is free now,
+        and otherwise the wait is a hint for when to try again.
+        """
+        def take(tokens, refilled_at, paused_until, now):
+            start = max(now, paused_until)
+            # Tokens accrue from the later of the last refill and the end of any pause
+            tokens = min(self.burst, tokens + max(0.0, start - max(refilled_at, paused_until)) * self.rate)
+            if not borrow and (start > now or tokens < 1):
+                return (tokens, start, paused_until), (False, start - now + (1 - tokens) / self.rate)
+            tokens -= 1
+            wait = start - now + (-tokens / self.rate if tokens < 0 else 0.0)
+            return (tokens, start, paused_until), (True, wait)
+        return self._update(take)
+
+    def pause(self, seconds):
+        """Hold every process's requests to this host for seconds"""
+        def extend(tokens, refilled_at, paused_until, now):
+            return (min(tokens, 0.0), refilled_at, max(paused_until, now + seconds)), None
+        self._update(extend)
+
+
+_buckets = {}
+
+
+def bucket(host):
+    if host not in _buckets:
+        _buckets[host] = Bucket(host)
+    return _buckets[host]
+
+
+def wait(host):
+    """
+    Block until this process may send its next request to host. Only
+    critical requests (fallen/priority.py) reserve tokens ahead; the other
+    classes wait for a free one.
+    """
+    if not enabled():
+        return
+    borrow = priority.current() == priority.CRITICAL
+    while True:
+        try:
+            taken, seconds = bucket(host).reserve(borrow)
+        except OSError as e:
+            print(f"⚠️ Shared rate limiter unavailable ({e}); pacing this process on its own")
+            _disable()
+            return
+        if seconds > 0:
+            metrics.count('shared_rate_waits')
+            # Retries are jittered so background processes don't all wake for the same token
+            tracing.sleep(seconds if taken else seconds * random.uniform(1.0, 1.5), f"shared rate {host}")
+        if taken:
+            return
+
+
+def pause(host, seconds):
+    """Tell the other processes that host pushed back"""
+    if not enabled():
+        return
+    try:
+        bucket(host).pause(seconds)
+    except OSError:
+        pass
+
+
+def courtesy_sleep(seconds):
+    """A scraper's fixed delay before a fetch; not needed while the shared limiter paces the host"""
+    if enabled():
+        return
+    tracing.sleep(seconds)
+
+
+def _disable():
+    global SHARED_RATE
+    SHARED_RATE = 0
@@ -0,0 +1,118 @@
+"""
+Single-flight request coalescing.
+
+The same page can be wanted more than once in a run. Comprehensive ranges
+overlap, a search-result image can be the same file as the profile image,
+and the concurrent searches (fallen/throttle.py gather) can ask for the same
+profile at the same moment. A Group makes those callers share the work:
+
+    profiles = singleflight.Group('profile')
+    details = profiles.do(url, lambda: scrape(url))
+
+The first caller for a key runs the function. Callers that arrive while it
+is running wait for it and get the same result (or the same exception).
+Later callers get the kept result without running anything. Results are
+kept in a bounded LRU, and only when keep(result) is true, so a failed
+fetch is tried again next time.
+
+fallen.transport uses a Group for GET responses from Military Times and
+S3. coalesce() does the same for a scraper function's parsed result.
+"""
+
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from fallen import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class Group:
+    """Calls deduplicated by key, with the results of finished calls kept in an LRU"""
+
+    def __init__(self, name, maxsize=1024, max_weight=None, weigh=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 0)
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.results = OrderedDict()  # key -> (value, weight)
+        self.weight = 0
+
+    def do(self, key, func, keep=bool):
+        """func()'s result for key, running func at most once at a time per key"""
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                metrics.cache_hit(self.name)
+                return self.results[key][0]
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+                metrics.cache_miss(self.name)
+
+        if not leader:
+            metrics.count(f"{self.name}_coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+                if call.error is None and keep(call.value):
+                    self._keep(key, call.value)
+            call.done.set()
+        return call.value
+
+    def _keep(self, key, value):
+        weight = self.weigh(value)
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+        self.results[key] = (value, weight)
+        self.weight += weight
+        while self.results and (len(self.results) > self.maxsize or
+                                (self.max_weight is not None and self.weight > self.max_weight)):
+            _, (_, dropped) = self.results.popitem(last=False)
+            self.weight -= dropped
+
+    def forget(self, key):
+        with self.lock:
+            entry = self.results.pop(key, None)
+            if entry:
+                self.weight -= entry[1]
+
+
+def coalesce(name, maxsize=4096, keep=bool, method=False):
+    """
+    Decorator: calls with the same arguments share one run and one result.
+    For a method, pass method=True so the instance is left out of the key
+    and every scraper shares the results. Each caller gets its own copy of a
+    dict-like result, so updating it can't leak into another caller's. The
+    undecorated function is func.__wrapped__ (e.g. to benchmark it).
+    """
+    def decorate(func):
+        group = Group(name, maxsize)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args[1:] if method else args, tuple(sorted(kwargs.items())))
+            value = group.do(key, lambda: func(*args, **kwargs), keep)
+            return value.copy() if hasattr(value, 'copy') else value
+        wrapper.group = group
+        return wrapper
+    return decorate
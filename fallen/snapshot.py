@@ -0,0 +1,238 @@
+"""
+Portable snapshots of everything the scripts keep between runs.
+
+CI runners start empty, so the state directory (fallen.state), the
+precomputed bundles and the posted-heroes ledger are exported after each
+run and restored before the next one:
+
+    python -m fallen snapshot export    # after the run
+    python -m fallen snapshot import    # before the run (also automatic at startup)
+    python -m fallen snapshot verify
+
+A snapshot is a directory (SNAPSHOT_DIR, default .fallen-snapshot):
+
+    manifest.json           version, creation time and {path: sha256/size/mtime}
+    objects/ab/abcdef....gz one gzip-compressed blob per distinct file content
+
+Objects are content-addressed, so an export only compresses files that
+changed since the last one (unchanged size and mtime skip even the hashing)
+and a restore only writes files that are missing or older locally. Every
+restored file is checked against its sha256 first; a damaged object is
+skipped, never written.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+from fallen import bundles, metrics, state
+
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', '.fallen-snapshot')
+SNAPSHOT_VERSION = 1
+SNAPSHOT_AUTO_RESTORE = os.getenv('SNAPSHOT_AUTO_RESTORE', 'true').lower() == 'true'
+
+_restored = False
+
+
+def roots():
+    """Name -> local path of everything that goes into a snapshot"""
+    return {
+        'state': state.STATE_DIR,
+        'bundles': bundles.BUNDLE_DIR,
+        'ledger': state.POSTED_LEDGER
+    }
+
+
+def manifest_path(snapshot_dir):
+    return os.path.join(snapshot_dir, 'manifest.json')
+
+
+def object_path(snapshot_dir, digest):
+    return os.path.join(snapshot_dir, 'objects', digest[:2], f"{digest}.gz")
+
+
+def local_path(key):
+    """Local path for a manifest key like 'bundles/soldier-fb/2025-07-04/bundle.json'"""
+    root, _, rel = key.partition('/')
+    base = roots().get(root)
+    parts = rel.split('/') if rel else []
+    if base is None or any(part in ('', '.', '..') for part in parts) or os.path.isabs(rel):
+        raise ValueError(f"Invalid snapshot path {key!r}")
+    return os.path.join(base, *parts)
+
+
+def tracked_files():
+    """(manifest key, local path) for every file currently in the tracked roots"""
+    for root, base in roots().items():
+        if os.path.isfile(base):
+            yield root, base
+        elif os.path.isdir(base):
+            for dirpath, _, filenames in os.walk(base):
+                for filename in sorted(filenames):
+                    if filename.endswith(('.tmp', '.lock')):
+                        continue  # In-progress writes and lock files never travel
+                    path = os.path.join(dirpath, filename)
+                    rel = os.path.relpath(path, base).replace(os.sep, '/')
+                    yield f"{root}/{rel}", path
+
+
+def read_manifest(snapshot_dir):
+    """The snapshot's manifest, or None if there is no usable snapshot"""
+    path = manifest_path(snapshot_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ Could not read snapshot manifest: {e}")
+        return None
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        print(f"⚠️ Ignoring snapshot: version {manifest.get('version')}, expected {SNAPSHOT_VERSION}")
+        return None
+    return manifest
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def export(snapshot_dir=SNAPSHOT_DIR):
+    """Write the current state to snapshot_dir. Returns the new manifest."""
+    start = time.perf_counter()
+    previous = (read_manifest(snapshot_dir) or {}).get('files', {})
+    files = {}
+    new_objects = new_bytes = 0
+
+    for key, path in tracked_files():
+        stat = os.stat(path)
+        old = previous.get(key)
+        if (old and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime
+                and os.path.exists(object_path(snapshot_dir, old['sha256']))):
+            files[key] = old
+            continue
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        files[key] = {'sha256': digest, 'size': len(data), 'mtime': stat.st_mtime}
+
+        target = object_path(snapshot_dir, digest)
+        if not os.path.exists(target):
+            compressed = gzip.compress(data, compresslevel=6, mtime=0)
+            _write_atomic(target, compressed)
+            new_objects += 1
+            new_bytes += len(compressed)
+
+    manifest = {
+        'version': SNAPSHOT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'files': files
+    }
+    _write_atomic(manifest_path(snapshot_dir), json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+    pruned = prune(snapshot_dir, {entry['sha256'] for entry in files.values()})
+
+    print(f"📦 Snapshot exported to {snapshot_dir}: {len(files)} files, {new_objects} new objects "
+          f"({new_bytes / 1024:.1f} KiB), {pruned} pruned, in {time.perf_counter() - start:.2f}s")
+    return manifest
+
+
+def prune(snapshot_dir, keep):
+    """Delete objects no longer referenced by the manifest"""
+    removed = 0
+    objects_dir = os.path.join(snapshot_dir, 'objects')
+    for dirpath, _, filenames in os.walk(objects_dir):
+        for filename in filenames:
+            if filename[:-len('.gz')] not in keep:
+                os.remove(os.path.join(dirpath, filename))
+                removed += 1
+    return removed
+
+
+def load_object(snapshot_dir, entry):
+    """Decompressed, sha256-checked content of a manifest entry, or None"""
+    try:
+        with open(object_path(snapshot_dir, entry['sha256']), 'rb') as f:
+            data = gzip.decompress(f.read())
+    except (OSError, EOFError, gzip.BadGzipFile):
+        return None
+    if hashlib.sha256(data).hexdigest() != entry['sha256']:
+        return None
+    return data
+
+
+def restore(snapshot_dir=SNAPSHOT_DIR):
+    """
+    Bring local state up to date from snapshot_dir.
+
+    A file is written when it is missing locally or the snapshot's copy is
+    newer; local files that are newer are kept. Returns the number of files
+    restored (0 if there is no snapshot).
+    """
+    start = time.perf_counter()
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        print(f"ℹ️ No state snapshot in {snapshot_dir}; starting cold")
+        return 0
+
+    restored = current = damaged = 0
+    for key, entry in manifest['files'].items():
+        try:
+            path = local_path(key)
+        except ValueError as e:
+            print(f"⚠️ {e}")
+            damaged += 1
+            continue
+
+        if os.path.exists(path):
+            stat = os.stat(path)
+            if stat.st_mtime >= entry['mtime']:
+                current += 1
+                continue
+
+        data = load_object(snapshot_dir, entry)
+        if data is None:
+            print(f"⚠️ Snapshot object for {key} is missing or damaged; skipping")
+            damaged += 1
+            continue
+
+        _write_atomic(path, data)
+        os.utime(path, (entry['mtime'], entry['mtime']))
+        restored += 1
+
+    metrics.count('snapshot_files_restored', restored)
+    metrics.count('snapshot_files_damaged', damaged)
+    print(f"📦 Restored {restored} file(s) from snapshot {manifest['created_at']} "
+          f"({current} already current, {damaged} skipped) in {time.perf_counter() - start:.2f}s")
+    return restored
+
+
+def restore_at_startup():
+    """restore() once per process, if a snapshot exists and SNAPSHOT_AUTO_RESTORE is on"""
+    global _restored
+    if _restored or not SNAPSHOT_AUTO_RESTORE or not os.path.exists(manifest_path(SNAPSHOT_DIR)):
+        return
+    _restored = True
+    restore(SNAPSHOT_DIR)
+
+
+def verify(snapshot_dir=SNAPSHOT_DIR):
+    """Check every object the manifest references. Returns True if all are intact."""
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        print(f"❌ No usable snapshot in {snapshot_dir}")
+        return False
+
+    bad = [key for key, entry in manifest['files'].items() if load_object(snapshot_dir, entry) is None]
+    for key in bad:
+        print(f"❌ {key}: object missing or damaged")
+    total = len(manifest['files'])
+    print(f"{'✅' if not bad else '❌'} Snapshot {manifest['created_at']}: {total - len(bad)}/{total} files intact")
+    return not bad
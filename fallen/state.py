@@ -0,0 +1,39 @@
+"""
+Where the scripts keep state that should survive between runs.
+
+Anything that makes the next run faster or more correct (indexes, caches,
+learned settings) goes under STATE_DIR, so fallen.snapshot can carry it
+from one CI runner to the next. The posted-heroes ledger predates the state
+directory and keeps its own location.
+"""
+
+import json
+import os
+import tempfile
+
+STATE_DIR = os.getenv('FALLEN_STATE_DIR', '.fallen-state')
+POSTED_LEDGER = os.getenv('POSTED_HEROES_FILE', 'posted_heroes.json')  # query-fallen's posted hero IDs
+
+
+def state_path(name):
+    """Path of a file in the state directory, creating the directory if needed"""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, name)
+
+
+def write_json(path, data, **options):
+    """
+    Write data to path as JSON, atomically. Each writer gets its own temporary
+    file next to path, so processes saving the same file (crawl shards, the
+    posting scripts) never write into each other's; the last to finish wins.
+    """
+    directory, name = os.path.split(path)
+    f = tempfile.NamedTemporaryFile('w', dir=directory or '.', prefix=f"{name}.", suffix='.tmp', delete=False)
+    try:
+        with f:
+            json.dump(data, f, **options)
+        os.chmod(f.name, 0o644)  # Temporary files are private; keep the state file's usual mode
+        os.replace(f.name, path)
+    except BaseException:
+        os.remove(f.name)
+        raise
@@ -0,0 +1,191 @@
+"""
+Adaptive concurrency for Military Times and S3 traffic.
+
+Every request to those hosts passes through a per-host AIMD controller in
+fallen.transport:
+
+- Each clean response raises the host's concurrency limit by 1/limit, so
+  the limit grows by about one per round of requests.
+- A 429, a 503 or a block page (Access Denied, CAPTCHA, Cloudflare
+  security check) halves the limit and pauses the host. The pause lasts for
+  the response's Retry-After, or THROTTLE_BACKOFF seconds doubled per
+  consecutive block.
+- A blocked GET is re-queued: it gives up its slot, waits out the pause
+  with every other request to that host and is sent again, up to
+  THROTTLE_RETRIES times.
+
+Requests already in flight when the limit is cut don't cut it again, so a
+burst of 429s counts as one congestion event. gather() runs a batch of
+searches on a thread pool so there is concurrency for the controllers to
+manage. Free slots go to the highest waiting priority class first
+(fallen/priority.py).
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from fallen import endpoints, metrics, priority, shared_rate, tracing
+
+THROTTLE_START = float(os.getenv('THROTTLE_START', '2'))  # Concurrent requests per host at startup
+THROTTLE_MAX = int(os.getenv('THROTTLE_MAX', '8'))  # Ceiling for the additive increase, and gather()'s pool size
+THROTTLE_MIN = 1
+THROTTLE_DECREASE = 0.5  # Multiplicative decrease on a block
+THROTTLE_BACKOFF = float(os.getenv('THROTTLE_BACKOFF', '5'))  # Pause after a block without Retry-After (seconds)
+THROTTLE_BACKOFF_MAX = 120.0
+THROTTLE_RETRIES = int(os.getenv('THROTTLE_RETRIES', '4'))  # Times a blocked GET is re-queued
+
+BLOCK_STATUSES = {429, 503}
+BLOCK_MARKERS = ('access denied', 'captcha', 'cloudflare', 'security check')
+
+
+class Controller:
+    """AIMD concurrency limit and block cooldown for one host"""
+
+    def __init__(self, host):
+        self.host = host
+        self.limit = max(THROTTLE_MIN, min(THROTTLE_START, THROTTLE_MAX))
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_cut = 0.0
+        self.strikes = 0
+        self.waiting = [0] * len(priority.NAMES)  # Waiting requests per priority class
+        self.reserved_until = 0.0  # Until then, the last PRIORITY_RESERVE slots are kept for critical requests
+        self.cond = threading.Condition()
+
+    def _ready(self, level):
+        now = time.monotonic()
+        if now < self.paused_until or any(self.waiting[:level]):
+            return False
+        slots = int(self.limit)
+        if level != priority.CRITICAL and now < self.reserved_until:
+            slots = max(0, slots - priority.PRIORITY_RESERVE)
+        return self.in_flight < slots
+
+    def acquire(self, level=None):
+        """Wait for a free slot outside any pause. Returns the start time to pass to release()."""
+        level = priority.current() if level is None else level
+        with self.cond:
+            if level == priority.CRITICAL:
+                self.reserved_until = time.monotonic() + priority.PRIORITY_RESERVE_HOLD
+            if not self._ready(level):
+                if any(self.waiting[:level]):
+                    metrics.count(f"throttle_preempted_{priority.name(level)}")
+                self.waiting[level] += 1
+                try:
+                    with tracing.span(f"throttle {self.host}", 'throttle', limit=int(self.limit),
+                                      priority=priority.name(level)):
+                        while not self._ready(level):
+                            # Recheck when the pause ends, and when the reserve lapses for a lower class
+                            until = self.paused_until if level == priority.CRITICAL else max(self.paused_until, self.reserved_until)
+                            pause = until - time.monotonic()
+                            self.cond.wait(timeout=pause if pause > 0 else None)
+                finally:
+                    self.waiting[level] -= 1
+                    self.cond.notify_all()  # Lower classes may have been held back for this one
+            self.in_flight += 1
+            return time.monotonic()
+
+    def release(self, started, blocked=None, retry_after=None):
+        """
+        Free a slot and adjust the limit. blocked is None for requests that
+        never got a response, so connection errors neither grow nor cut it.
+        """
+        with self.cond:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if blocked:
+                if started >= self.last_cut:
+                    self.limit = max(THROTTLE_MIN, self.limit * THROTTLE_DECREASE)
+                    self.last_cut = now
+                    self.strikes += 1
+                    metrics.count('throttle_backoffs')
+                    print(f"🐢 {self.host} pushed back ({blocked}); concurrency limit now {int(self.limit)}")
+                pause = retry_after if retry_after is not None else \
+                    min(THROTTLE_BACKOFF * 2 ** (self.strikes - 1), THROTTLE_BACKOFF_MAX)
+                self.paused_until = max(self.paused_until, now + pause)
+                shared_rate.pause(self.host, pause)
+            elif blocked is not None:
+                self.strikes = 0
+                self.limit = min(THROTTLE_MAX, self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+
+_controllers = {}
+_lock = threading.Lock()
+
+
+def throttled_hosts():
+    return {urlsplit(endpoints.MILITARY_TIMES_URL).netloc, urlsplit(endpoints.S3_URL).netloc}
+
+
+def controller(host):
+    """The host's controller, or None for hosts that aren't throttled (Graph API)"""
+    with _lock:
+        if host not in _controllers:
+            _controllers[host] = Controller(host) if host in throttled_hosts() else None
+        return _controllers[host]
+
+
+def block_reason(response, stream=False):
+    """Why a response counts as pushback from the site, or None if it is clean"""
+    if response.status_code in BLOCK_STATUSES:
+        return f"HTTP {response.status_code}"
+    if stream or 'text/html' not in response.headers.get('Content-Type', ''):
+        return None
+    text = response.text.lower()
+    for marker in BLOCK_MARKERS:
+        if marker in text:
+            return f"{marker} page"
+    return None
+
+
+def retry_after(response):
+    """Seconds from the Retry-After header (delta or HTTP date), or None"""
+    value = (response.headers.get('Retry-After') or '').strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return min(float(value), THROTTLE_BACKOFF_MAX)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    delta = (when - datetime.now(timezone.utc)).total_seconds()
+    return max(0.0, min(delta, THROTTLE_BACKOFF_MAX))
+
+
+def gather(func, items):
+    """func(item) for each item, run concurrently up to THROTTLE_MAX at once. Results keep the input order."""
+    items = list(items)
+    if len(items) <= 1 or THROTTLE_MAX <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(THROTTLE_MAX, len(items)), thread_name_prefix='search') as pool:
+        return list(pool.map(priority.bind(func), items))
+
+
+@contextmanager
+def ahead(func, items):
+    """
+    Run func(item) for each item in the background, up to THROTTLE_MAX at
+    once, while the with-block works through the same items in order.
+    Work not yet started is cancelled when the block exits.
+    """
+    items = list(items)
+    if len(items) <= 1 or THROTTLE_MAX <= 1:
+        yield
+        return
+    pool = ThreadPoolExecutor(max_workers=min(THROTTLE_MAX, len(items)), thread_name_prefix='ahead')
+    func = priority.bind(func)
+    futures = [pool.submit(func, item) for item in items]
+    try:
+        yield
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=True)
@@ -0,0 +1,100 @@
+"""
+Optional timeline tracing in the Chrome trace-event format.
+
+    TRACE_FILE=trace.json python service-all-fb.py
+
+records a span for every HTTP request, stage (search, profile, download,
+render, upload, publish), rate-limit pause and the larger tasks around them,
+tagged with the thread that ran it. Open the file in chrome://tracing or
+https://ui.perfetto.dev to see where the concurrent uploads overlap and where
+the run just sits waiting.
+
+Without TRACE_FILE nothing is recorded and span() costs a function call.
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+TRACE_FILE = os.getenv('TRACE_FILE')
+
+enabled = bool(TRACE_FILE)
+
+_events = []
+_threads = set()
+_lock = threading.Lock()
+_origin = time.perf_counter_ns()
+_pid = os.getpid()
+
+
+def _timestamp():
+    """Microseconds since the process started tracing"""
+    return (time.perf_counter_ns() - _origin) / 1000
+
+
+def _thread_id():
+    thread = threading.current_thread()
+    tid = thread.native_id
+    if tid not in _threads:
+        with _lock:
+            _threads.add(tid)
+            _events.append({'ph': 'M', 'name': 'thread_name', 'pid': _pid, 'tid': tid,
+                            'args': {'name': thread.name}})
+    return tid
+
+
+@contextmanager
+def span(name, category, **args):
+    """
+    Record the enclosed block as one span. Yields the span's args dict so
+    the block can attach results (status codes, sizes) before it closes.
+    """
+    if not enabled:
+        yield args
+        return
+
+    tid = _thread_id()
+    start = _timestamp()
+    try:
+        yield args
+    finally:
+        _events.append({'ph': 'X', 'name': name, 'cat': category, 'pid': _pid, 'tid': tid,
+                        'ts': start, 'dur': _timestamp() - start, 'args': args})
+
+
+def traced(category='task'):
+    """Decorator recording every call of a function as a span named after it"""
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(func.__qualname__, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def sleep(seconds, reason='rate limit'):
+    """time.sleep() that shows up on the timeline as a wait"""
+    with span(reason, 'wait', seconds=seconds):
+        time.sleep(seconds)
+
+
+def write_trace():
+    """Write the recorded events as trace-event JSON"""
+    script = os.path.splitext(os.path.basename(sys.argv[0]))[0] or 'python'
+    events = [{'ph': 'M', 'name': 'process_name', 'pid': _pid, 'args': {'name': script}}] + _events
+    try:
+        with open(TRACE_FILE, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f"🧵 Wrote {len(_events)} trace events to {TRACE_FILE}")
+    except OSError as e:
+        print(f"⚠️  Could not write trace file: {e}")
+
+
+if enabled:
+    atexit.register(write_trace)
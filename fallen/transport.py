@@ -0,0 +1,372 @@
+"""
+Shared HTTP transport for every request the scripts make.
+
+All sessions are passed through wrap_session(), which wraps their adapters
+in a TransportAdapter, and one-off calls go through get()/post() here
+instead of requests.get()/requests.post(). That gives one place to record
+and replay traffic, and to pace Military Times and S3 requests
+(fallen/throttle.py) and spread them over a proxy pool (fallen/proxies.py).
+
+GETs to Military Times and S3 are also single-flight (fallen/singleflight.py).
+Concurrent requests for the same URL and headers share one fetch. A clean
+200 is kept (up to HTTP_DEDUP_CACHE_MB) and handed out again, so a page or
+image is never downloaded twice in one run. HTTP_DEDUP=false turns this off.
+
+Record/replay ("cassettes"):
+
+    HTTP_CASSETTE=run.cassette.gz HTTP_CASSETTE_MODE=record python service-all-fb.py
+    HTTP_CASSETTE=run.cassette.gz HTTP_CASSETTE_MODE=replay HTTP_REPLAY_LATENCY=zero python service-all-fb.py
+
+A cassette is a gzipped JSON-lines file: a header (format version, random
+seed, recording date), then one line per response body (stored once per
+distinct body) and one per request/response pair. Requests are matched on
+method and URL, in recorded order. Secrets (SECRET_PARAMS: access tokens,
+fb_exchange_token, client_secret, appsecret_proof) are stripped before
+anything is written, from URL queries and from JSON and form-encoded bodies
+(the Graph API returns page tokens in response bodies); replay hands back a
+placeholder instead. Replaying also re-seeds `random` and pins fallen.clock
+to the recording date, so a run's choices and searches repeat exactly.
+"""
+
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from fallen import clock, metrics, proxies, shared_rate, singleflight, throttle, tracing
+
+CASSETTE_PATH = os.getenv('HTTP_CASSETTE')
+CASSETTE_MODE = os.getenv('HTTP_CASSETTE_MODE', 'replay' if CASSETTE_PATH else 'off')  # record, replay or off
+REPLAY_LATENCY = os.getenv('HTTP_REPLAY_LATENCY', 'recorded')  # recorded or zero
+CASSETTE_VERSION = 1
+HTTP_DEDUP = os.getenv('HTTP_DEDUP', 'true').lower() == 'true'
+HTTP_DEDUP_CACHE_MB = float(os.getenv('HTTP_DEDUP_CACHE_MB', '32'))  # Bodies of finished GETs kept for reuse
+
+SECRET_PARAMS = {'access_token', 'fb_exchange_token', 'client_secret', 'appsecret_proof'}
+REDACTED = 'REDACTED'
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """Raised in replay mode for a request that was never recorded"""
+
+
+def redact_url(url):
+    """URL with secret query parameters removed, used as the cassette key"""
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in SECRET_PARAMS]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+
+
+def _redact_json(value):
+    if isinstance(value, dict):
+        return {k: REDACTED if k in SECRET_PARAMS else _redact_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_redact_json(item) for item in value]
+    if isinstance(value, str) and any(f"{param}=" in value for param in SECRET_PARAMS):
+        # URLs in the body, such as Graph's paging links, carry the token in their query
+        parts = urlsplit(value)
+        query = [(k, REDACTED if k in SECRET_PARAMS else v)
+                 for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), parts.fragment))
+    return value
+
+
+def _redact_form(body):
+    """A form-encoded body (name=value&...) with secret values replaced; anything else unchanged"""
+    try:
+        fields = parse_qsl(body.decode('utf-8'), keep_blank_values=True, strict_parsing=True)
+    except ValueError:  # Also UnicodeDecodeError: HTML, images
+        return body
+    if not any(k in SECRET_PARAMS for k, v in fields):
+        return body
+    return urlencode([(k, REDACTED if k in SECRET_PARAMS else v) for k, v in fields]).encode('utf-8')
+
+
+def redact_body(body):
+    """A JSON or form-encoded response body with every secret value replaced; other bodies unchanged"""
+    if not any(param.encode() in body for param in SECRET_PARAMS):
+        return body
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return _redact_form(body)  # Token endpoints can answer access_token=...&expires=...
+    return json.dumps(_redact_json(data), separators=(',', ':')).encode('utf-8')
+
+
+class Cassette:
+    """Recorded request/response pairs for one run"""
+
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.blobs = {}
+        self.interactions = defaultdict(deque)
+
+        if mode == 'record':
+            seed = random.randrange(2 ** 32)
+            random.seed(seed)
+            self.file = gzip.open(path, 'wt', encoding='utf-8')
+            atexit.register(self.file.close)
+            self.write({'cassette': CASSETTE_VERSION, 'seed': seed,
+                        'recorded_on': clock.now().strftime('%Y-%m-%d')})
+            print(f"📼 Recording HTTP traffic to {path}")
+        else:
+            self.load()
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        self.file.flush()
+
+    def load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('cassette') != CASSETTE_VERSION:
+                raise ValueError(f"{self.path} is not a version {CASSETTE_VERSION} cassette")
+
+            for line in self.read_lines(f):
+                entry = json.loads(line)
+                if 'blob' in entry:
+                    self.blobs[entry['blob']] = base64.b64decode(entry['data'])
+                else:
+                    self.interactions[(entry['method'], entry['url'])].append(entry)
+
+        random.seed(header['seed'])
+        clock.frozen = header['recorded_on']
+        count = sum(len(queue) for queue in self.interactions.values())
+        print(f"📼 Replaying {count} recorded responses from {self.path} (recorded {header['recorded_on']})")
+
+    def read_lines(self, f):
+        # A run killed mid-recording leaves the gzip stream unterminated; keep what was written
+        try:
+            for line in f:
+                if line.endswith('\n'):
+                    yield line
+        except EOFError:
+            print(f"⚠️  {self.path} was not closed cleanly; replaying the complete entries only")
+
+    def record(self, request, response):
+        body = redact_body(response.content)  # Also buffers streamed bodies so callers can still read them
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        entry = {
+            'method': request.method,
+            'url': redact_url(request.url),
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() != 'set-cookie'},
+            'body': digest,
+            'elapsed': round(response.elapsed.total_seconds(), 4)
+        }
+        with self.lock:
+            if digest not in self.blobs:
+                self.blobs[digest] = True
+                self.write({'blob': digest, 'data': base64.b64encode(body).decode('ascii')})
+            self.write(entry)
+
+    def replay(self, request):
+        key = (request.method, redact_url(request.url))
+        with self.lock:
+            queue = self.interactions.get(key)
+            if not queue:
+                raise CassetteMiss(f"No recorded response for {key[0]} {key[1]}", request=request)
+            # Repeat the last response if a request is made more often than recorded
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+
+        if REPLAY_LATENCY == 'recorded':
+            time.sleep(entry['elapsed'])
+
+        response = requests.models.Response()
+        response.status_code = entry['status']
+        response.reason = entry['reason']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.blobs[entry['body']]
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=entry['elapsed'])
+        return response
+
+
+cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE) if CASSETTE_MODE in ('record', 'replay') and CASSETTE_PATH else None
+
+
+class TransportAdapter(BaseAdapter):
+    """Wraps a session's real adapter with record/replay and adaptive throttling"""
+
+    def __init__(self, inner):
+        super().__init__()
+        self.inner = inner
+
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).netloc
+        controller = throttle.controller(host)
+        if controller is None:
+            return self.send_once(host, request, **kwargs)
+        if request.method != 'GET' or not HTTP_DEDUP:
+            return self.send_paced(host, controller, request, **kwargs)
+
+        def fetch():
+            response = self.send_paced(host, controller, request, **kwargs)
+            response.content  # Buffer streamed bodies so every caller can read them
+            return response
+
+        return copy_response(responses.do(dedup_key(request), fetch, reusable), request)
+
+    def send_paced(self, host, controller, request, **kwargs):
+        """Send through the host's throttle controller (and proxy pool), re-queueing blocked GETs"""
+        for attempt in range(throttle.THROTTLE_RETRIES + 1):
+            started = controller.acquire()
+            if not (cassette and cassette.mode == 'replay'):
+                shared_rate.wait(host)  # Other processes' requests to host count too
+            proxy = self.choose_proxy(host, kwargs)
+            sent = time.monotonic()
+            try:
+                response = self.send_once(host, request, **kwargs)
+            except requests.exceptions.RequestException as e:
+                controller.release(started)
+                if not proxy:
+                    raise
+                proxies.current().report(proxy, False, time.monotonic() - sent)
+                # A dead proxy says nothing about the site; try the request through another one
+                if not isinstance(e, requests.exceptions.ConnectionError) or attempt == throttle.THROTTLE_RETRIES:
+                    raise
+                metrics.count('proxy_retries')
+                continue
+            reason = throttle.block_reason(response, kwargs.get('stream'))
+            controller.release(started, reason or False, throttle.retry_after(response) if reason else None)
+            if proxy:
+                proxies.current().report(proxy, not reason and response.status_code < 500, time.monotonic() - sent)
+            if not reason or request.method not in ('GET', 'HEAD'):
+                return response
+            if attempt < throttle.THROTTLE_RETRIES:
+                metrics.count('throttle_requeues')
+                response.close()
+
+        print(f"⚠️  {host} still blocking after {throttle.THROTTLE_RETRIES} retries: {redact_url(request.url)}")
+        metrics.count('throttle_gave_up')
+        return response
+
+    def choose_proxy(self, host, kwargs):
+        """Route this attempt through the proxy pool, if there is one. Returns the proxy used."""
+        if (cassette and cassette.mode == 'replay') or proxies.current() is None:
+            return None
+        proxy = proxies.current().acquire(host)
+        kwargs['proxies'] = {'http': proxy.url, 'https': proxy.url}
+        return proxy
+
+    def send_once(self, host, request, **kwargs):
+        with tracing.span(f"{request.method} {host}", 'http', url=redact_url(request.url)) as span:
+            start = time.perf_counter()
+            try:
+                if cassette and cassette.mode == 'replay':
+                    response = cassette.replay(request)
+                else:
+                    response = self.inner.send(request, **kwargs)
+                    if cassette:
+                        cassette.record(request, response)
+            except requests.exceptions.RequestException as e:
+                span['error'] = type(e).__name__
+                metrics.request_finished(host, None, 0, time.perf_counter() - start)
+                raise
+
+            size = response_size(response, kwargs.get('stream'))
+            span.update(status=response.status_code, bytes=size)
+            metrics.request_finished(host, response.status_code, size,
+                                     time.perf_counter() - start, retries=retry_count(response))
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+def dedup_key(request):
+    """Requests with the same URL and headers (cookies aside) get the same response"""
+    headers = tuple(sorted((k.lower(), v) for k, v in request.headers.items() if k.lower() != 'cookie'))
+    return request.url, headers
+
+
+def reusable(response):
+    return response.status_code == 200 and not throttle.block_reason(response)
+
+
+def copy_response(response, request):
+    """A caller's own Response sharing the (already read) body of a coalesced one"""
+    copy = requests.models.Response()
+    copy.status_code = response.status_code
+    copy.reason = response.reason
+    copy.headers = CaseInsensitiveDict(response.headers)
+    copy.encoding = response.encoding
+    copy._content = response.content
+    copy._content_consumed = True
+    copy.url = request.url
+    copy.request = request
+    copy.elapsed = response.elapsed
+    return copy
+
+
+responses = singleflight.Group('http', maxsize=100000, max_weight=HTTP_DEDUP_CACHE_MB * 1024 * 1024,
+                               weigh=lambda response: len(response.content or b''))
+
+
+def response_size(response, stream):
+    """Body size without forcing a streamed body to be read"""
+    length = response.headers.get('Content-Length')
+    if length and length.isdigit():
+        return int(length)
+    if not stream or response._content_consumed:
+        return len(response.content or b'')
+    return 0
+
+
+def retry_count(response):
+    """Retries urllib3 made before this response (HTTPAdapter max_retries)"""
+    retries = getattr(response.raw, 'retries', None)
+    return len(getattr(retries, 'history', ()) or ())
+
+
+def wrap_session(session):
+    """Route a session's traffic through the shared transport. Returns the session."""
+    for prefix, adapter in list(session.adapters.items()):
+        if not isinstance(adapter, TransportAdapter):
+            session.adapters[prefix] = TransportAdapter(adapter)
+    return session
+
+
+def new_session():
+    """A fresh requests.Session routed through the shared transport"""
+    return wrap_session(requests.Session())
+
+
+_local = threading.local()
+
+
+def _shared_session():
+    # One keep-alive session per thread; requests.Session is not thread-safe
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = new_session()
+    return session
+
+
+def get(url, **kwargs):
+    """Drop-in replacement for requests.get()"""
+    return _shared_session().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    """Drop-in replacement for requests.post()"""
+    return _shared_session().post(url, **kwargs)
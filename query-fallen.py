@@ -5,29 +5,36 @@ Queries fallen service members from militarytimes.com and posts detailed memoria
 Enhanced with album posting - creates single post with multiple photos
 """
 
-import requests
-from bs4 import BeautifulSoup
 from datetime import datetime, timedelta
 import os
 import time
 import re
 import random
 from urllib.parse import urljoin, urlparse
-from PIL import Image, ImageDraw, ImageFont
 import io
 import json
 import hashlib
+import argparse
+from fallen import clock, endpoints, header_strategies, lazy, metrics
+from fallen import parse_pool, profiling, proxies, records, roster, search_cursor
+from fallen import singleflight, snapshot, state, throttle, tracing
+
+# Heavy dependencies load on first use (see fallen/lazy.py)
+Image = lazy.module('PIL.Image')
+bs4 = lazy.module('bs4')
+# requests and the fallen modules built on it load with the first HTTP call
+requests = lazy.module('requests')
+month_buckets = lazy.module('fallen.month_buckets')
+transport = lazy.module('fallen.transport')
 
 # Environment variables
 ACCESS_TOKEN = os.getenv("FB_ACCESS_TOKEN")
 PAGE_ID = os.getenv("FB_PAGE_ID")
-USE_PROXY = os.getenv("USE_PROXY", "false").lower() == "true"
-PROXY = os.getenv("PROXY_URL")
 SEARCH_MODE = os.getenv("SEARCH_MODE", "daily")  # daily, comprehensive, or date_range
 
 def load_posted_heroes():
     """Load the list of previously posted heroes from file"""
-    posted_file = "posted_heroes.json"
+    posted_file = state.POSTED_LEDGER
     if os.path.exists(posted_file):
         try:
             with open(posted_file, 'r') as f:
@@ -39,7 +46,7 @@ def load_posted_heroes():
 
 def save_posted_heroes(posted_heroes):
     """Save the list of posted heroes to file"""
-    posted_file = "posted_heroes.json"
+    posted_file = state.POSTED_LEDGER
     try:
         data = {'posted_heroes': list(posted_heroes)}
         with open(posted_file, 'w') as f:
@@ -71,6 +78,7 @@ def select_unposted_hero(service_members):
             unposted_heroes.append(hero)
         else:
             print(f"[*] Skipping already posted hero: {hero['name']}")
+            metrics.count('heroes_skipped_already_posted')
     
     print(f"[*] Found {len(unposted_heroes)} unposted heroes out of {len(service_members)} total")
     
@@ -93,19 +101,27 @@ def select_unposted_hero(service_members):
     print(f"[*] Selected unposted hero: {selected_hero['name']} - {selected_hero['date']}")
     return selected_hero
 
+@metrics.timed('search')
 def get_fallen_service_members(date):
     """Query fallen service members for a specific date"""
-    base_url = "https://thefallen.militarytimes.com/search"
-    formatted_date = date.strftime("%m%%2F%d%%2F%Y")
-    query_url = f"{base_url}?year=&year_month=&first_name=&last_name=&start_date={formatted_date}&end_date={formatted_date}&conflict=&home_state=&home_town="
-
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
-    proxies = {"http": PROXY, "https": PROXY} if USE_PROXY and PROXY else None
-    
+
+    def get(url, **kwargs):
+        return transport.get(url, headers=headers, **kwargs)
+
+    # With MONTH_PREFETCH the date's month bucket answers without a search of its own
+    bucketed = month_buckets.search(date, parse_search_results, get)
+    if bucketed is not None:
+        return bucketed
+
+    base_url = f"{endpoints.MILITARY_TIMES_URL}/search"
+    formatted_date = date.strftime("%m%%2F%d%%2F%Y")
+    query_url = f"{base_url}?year=&year_month=&first_name=&last_name=&start_date={formatted_date}&end_date={formatted_date}&conflict=&home_state=&home_town="
+
     try:
-        response = requests.get(query_url, headers=headers, proxies=proxies, timeout=30)
+        response = get(query_url, timeout=30)
     except requests.RequestException as e:
         print(f"[!] Network error fetching {query_url}: {e}")
         return []
@@ -114,7 +130,13 @@ def get_fallen_service_members(date):
         print(f"[!] Failed or blocked when fetching {query_url} (Status: {response.status_code})")
         return []
 
-    soup = BeautifulSoup(response.text, "html.parser")
+    # Long result lists are paginated; the cursor fetches the rest
+    return search_cursor.SearchCursor(query_url, get, parse_search_results, first_page=response.text).fetch_all()
+
+@parse_pool.offload('query-fallen')
+def parse_search_results(html):
+    """Service members listed on a search results page"""
+    soup = bs4.BeautifulSoup(html, "html.parser")
     fallen_list = []
 
     entries = soup.select(".data-box")
@@ -135,40 +157,43 @@ def get_fallen_service_members(date):
         
         # Check for S3 bucket URLs or make sure image URL is absolute
         if image_url:
-            if image_url.startswith("https://s3.amazonaws.com/"):
+            if image_url.startswith(endpoints.S3_URL):
                 # S3 URL is already absolute, use as-is
                 pass
             elif image_url.startswith("/"):
-                image_url = f"https://thefallen.militarytimes.com{image_url}"
+                image_url = f"{endpoints.MILITARY_TIMES_URL}{image_url}"
         
         # Also check for record-image div for higher quality S3 images
         record_image_div = entry.select_one(".record-image")
-        if record_image_div and not image_url.startswith("https://s3.amazonaws.com/"):
+        if record_image_div and not image_url.startswith(endpoints.S3_URL):
             record_img = record_image_div.select_one("img")
             if record_img and record_img.get("src"):
                 potential_s3_url = record_img["src"]
-                if potential_s3_url.startswith("https://s3.amazonaws.com/"):
+                if potential_s3_url.startswith(endpoints.S3_URL):
                     image_url = potential_s3_url  # Prefer S3 URLs for better quality
 
-        fallen_list.append({
-            "name": name,
-            "date": date_of_death,
-            "link": profile_link,
-            "image_url": image_url
-        })
+        fallen_list.append(records.HeroRecord(
+            name=name,
+            date=date_of_death,
+            link=profile_link,
+            image_url=image_url
+        ))
 
     return fallen_list
 
+@tracing.traced()
 def search_comprehensive_range(start_date, end_date):
     """Search for all fallen service members in a date range"""
     print(f"[*] Comprehensive search from {start_date.strftime('%m/%d/%Y')} to {end_date.strftime('%m/%d/%Y')}")
-    
+    return search_days([start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)])
+
+def search_days(days):
+    """Service members with photos for each of days (e.g. one crawl shard's share of a range)"""
     all_service_members = []
-    current_date = start_date
     
-    while current_date <= end_date:
+    # Days are searched concurrently; fallen.throttle sets the pace
+    for current_date, fallen in zip(days, throttle.gather(get_fallen_service_members, days)):
         print(f"[*] Searching {current_date.strftime('%m/%d/%Y')}...")
-        fallen = get_fallen_service_members(current_date)
         
         if fallen:
             print(f"    Found {len(fallen)} service members")
@@ -176,12 +201,11 @@ def search_comprehensive_range(start_date, end_date):
                 if person["image_url"]:
                     all_service_members.append(person)
                     print(f"    ✅ {person['name']} - {person['date']} (has photo)")
-        
-        current_date += timedelta(days=1)
-        time.sleep(1)  # Rate limiting for comprehensive search
     
     return all_service_members
 
+@singleflight.coalesce('profile')
+@metrics.timed('profile')
 def get_detailed_service_member_info(profile_link):
     """Get detailed information from the service member's profile page"""
     if not profile_link:
@@ -189,12 +213,13 @@ def get_detailed_service_member_info(profile_link):
     
     # Clean the profile link and construct a safe absolute URL
     profile_link = profile_link.rstrip(':').rstrip()
-    base = "https://thefallen.militarytimes.com"
+    base = endpoints.MILITARY_TIMES_URL
     full_url = urljoin(base, profile_link)
 
     # Reject URLs that escaped to a different host
     parsed = urlparse(full_url)
-    if parsed.netloc != "thefallen.militarytimes.com" or parsed.scheme != "https":
+    expected = urlparse(base)
+    if parsed.netloc != expected.netloc or parsed.scheme != expected.scheme:
         print(f"[!] Rejected suspicious profile URL: {full_url}")
         return {}
 
@@ -203,219 +228,221 @@ def get_detailed_service_member_info(profile_link):
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
-    proxies = {"http": PROXY, "https": PROXY} if USE_PROXY and PROXY else None
-    
     try:
-        response = requests.get(full_url, headers=headers, proxies=proxies, timeout=30)
+        response = transport.get(full_url, headers=headers, timeout=30)
         if response.status_code != 200:
             print(f"[!] Failed to fetch profile: {full_url} (Status: {response.status_code})")
             return {}
-        
-        soup = BeautifulSoup(response.text, "html.parser")
-        details = {}
-        
-        # Extract structured information from record-txt div
-        record_txt = soup.select_one(".record-txt")
-        if record_txt:
-            # Get rank, branch, and name from h1
-            h1_tag = record_txt.select_one("h1.h1-size")
-            if h1_tag:
-                full_name_rank = h1_tag.get_text().strip()
-                details["full_name_with_rank"] = full_name_rank
-                print(f"    → Found name with rank: {full_name_rank}")
+        return parse_profile_page(response.content)
+    except Exception as e:
+        print(f"[!] Error getting details for {profile_link}: {e}")
+        return {}
+
+@parse_pool.offload('query-fallen')
+def parse_profile_page(html):
+    """Details from a service member's profile page (raw bytes or text)"""
+    soup = bs4.BeautifulSoup(html, "html.parser")
+    details = records.HeroRecord()
+    
+    # Extract structured information from record-txt div
+    record_txt = soup.select_one(".record-txt")
+    if record_txt:
+        # Get rank, branch, and name from h1
+        h1_tag = record_txt.select_one("h1.h1-size")
+        if h1_tag:
+            full_name_rank = h1_tag.get_text().strip()
+            details["full_name_with_rank"] = full_name_rank
+            print(f"    → Found name with rank: {full_name_rank}")
+        
+        # Get operation and date from h2
+        h2_tag = record_txt.select_one("h2")
+        if h2_tag:
+            h2_text = h2_tag.get_text().strip()
+            details["death_info"] = h2_text
+            print(f"    → Found death info: {h2_text}")
             
-            # Get operation and date from h2
-            h2_tag = record_txt.select_one("h2")
-            if h2_tag:
-                h2_text = h2_tag.get_text().strip()
-                details["death_info"] = h2_text
-                print(f"    → Found death info: {h2_text}")
-                
-                # Extract date from h2 text
-                date_match = re.search(r'Died ([^S]+) Serving', h2_text)
-                if date_match:
-                    details["formatted_date"] = date_match.group(1).strip()
-                
-                # Extract operation
-                if "Operation" in h2_text:
-                    operation_match = re.search(r'Operation ([^"]+)', h2_text)
-                    if operation_match:
-                        details["operation"] = f"Operation {operation_match.group(1).strip()}"
+            # Extract date from h2 text
+            date_match = re.search(r'Died ([^S]+) Serving', h2_text)
+            if date_match:
+                details["formatted_date"] = date_match.group(1).strip()
             
-            # Get branch from hidden input
-            branch_input = record_txt.select_one('input[name="dimension2"]')
-            if branch_input:
-                details["branch"] = branch_input.get("value", "").strip()
-                print(f"    → Found branch: {details['branch']}")
-        
-        # Get age, hometown, unit, and circumstances from content between <hr> tags
-        if record_txt:
-            # Find the content between <hr> tags or after the first <hr>
-            hr_tags = record_txt.find_all("hr")
-            if hr_tags:
-                # Get text content after first <hr> and before second <hr> (if exists)
-                content_after_hr = ""
-                if len(hr_tags) >= 1:
-                    # Get all text between the <hr> tags or after the first one
-                    parts = []
-                    current = hr_tags[0].next_sibling
-                    while current and (len(hr_tags) < 2 or current != hr_tags[1]):
-                        if hasattr(current, 'get_text'):
-                            parts.append(current.get_text())
-                        elif isinstance(current, str):
-                            parts.append(current)
-                        current = current.next_sibling
-                    content_after_hr = ''.join(parts)
-                
-                if content_after_hr:
-                    content_text = content_after_hr.strip()
-                    print(f"    → Found detailed content: {content_text}")
-                    
-                    # Parse the structured content
-                    # Format: "29, of Morgantown, Ky.; assigned to the 617th Military Police Company..."
-                    
-                    # Extract age and hometown (before first semicolon)
-                    parts = content_text.split(';')
-                    if parts:
-                        age_hometown_part = parts[0].strip()
-                        
-                        # Extract age (number at start)
-                        age_match = re.match(r'^(\d+)', age_hometown_part)
-                        if age_match:
-                            details["age"] = age_match.group(1)
-                            print(f"    → Found age: {details['age']}")
-                        
-                        # Extract hometown (after "of")
-                        hometown_match = re.search(r'of\s+([^;]+)', age_hometown_part)
-                        if hometown_match:
-                            hometown = hometown_match.group(1).strip().rstrip('.')
-                            details["hometown"] = hometown
-                            print(f"    → Found hometown: {hometown}")
-                    
-                    # Extract unit assignment (after "assigned to")
-                    # Look for pattern: "assigned to [unit]" which comes after city, state
-                    unit_match = re.search(r'assigned to (?:the\s+)?([^;,]+(?:Company|Battalion|Regiment|Brigade|Division|Squadron|Wing|Group)[^;]*)', content_text, re.IGNORECASE)
-                    if unit_match:
-                        unit = unit_match.group(1).strip()
-                        
-                        # Completely ignore anything with Sightline Media Group
-                        if "Sightline Media Group" not in unit:
-                            details["unit"] = unit
-                            print(f"    → Found unit: {unit}")
-                        else:
-                            print(f"    → Ignored Sightline Media Group reference")
-                    
-                    # Alternative pattern: look for military unit keywords after location
-                    if not details.get("unit"):
-                        # Look for units that come after city/state pattern
-                        alt_unit_patterns = [
-                            r'(?:assigned to|with|of) (?:the\s+)?(\d+(?:st|nd|rd|th)?\s+[^;,]*(?:Company|Battalion|Regiment|Brigade|Division|Squadron|Wing|Group)[^;,]*)',
-                            r'(?:assigned to|with|of) (?:the\s+)?([A-Z][^;,]*(?:Company|Battalion|Regiment|Brigade|Division|Squadron|Wing|Group)[^;,]*)'
-                        ]
-                        
-                        for pattern in alt_unit_patterns:
-                            alt_match = re.search(pattern, content_text, re.IGNORECASE)
-                            if alt_match:
-                                alt_unit = alt_match.group(1).strip()
-                                # Still filter out Sightline
-                                if "Sightline Media Group" not in alt_unit and len(alt_unit) > 5:
-                                    details["unit"] = alt_unit
-                                    print(f"    → Found unit (alt pattern): {alt_unit}")
-                                    break
-                    
-                    # Extract circumstances of death (usually after the last semicolon)
-                    if len(parts) > 1:
-                        circumstances_part = parts[-1].strip()
-                        if len(circumstances_part) > 20:  # Only if substantial content
-                            # Clean up the circumstances and capitalize first letter
-                            circumstances = circumstances_part.rstrip('.')
-                            if circumstances:
-                                circumstances = circumstances[0].upper() + circumstances[1:] if len(circumstances) > 1 else circumstances.upper()
-                                if not circumstances.endswith('.'):
-                                    circumstances += '.'
-                                details["circumstances"] = circumstances
-                                print(f"    → Found circumstances: {circumstances}")
+            # Extract operation
+            if "Operation" in h2_text:
+                operation_match = re.search(r'Operation ([^"]+)', h2_text)
+                if operation_match:
+                    details["operation"] = f"Operation {operation_match.group(1).strip()}"
+        
+        # Get branch from hidden input
+        branch_input = record_txt.select_one('input[name="dimension2"]')
+        if branch_input:
+            details["branch"] = branch_input.get("value", "").strip()
+            print(f"    → Found branch: {details['branch']}")
+    
+    # Get age, hometown, unit, and circumstances from content between <hr> tags
+    if record_txt:
+        # Find the content between <hr> tags or after the first <hr>
+        hr_tags = record_txt.find_all("hr")
+        if hr_tags:
+            # Get text content after first <hr> and before second <hr> (if exists)
+            content_after_hr = ""
+            if len(hr_tags) >= 1:
+                # Get all text between the <hr> tags or after the first one
+                parts = []
+                current = hr_tags[0].next_sibling
+                while current and (len(hr_tags) < 2 or current != hr_tags[1]):
+                    if hasattr(current, 'get_text'):
+                        parts.append(current.get_text())
+                    elif isinstance(current, str):
+                        parts.append(current)
+                    current = current.next_sibling
+                content_after_hr = ''.join(parts)
             
-            # Fallback: try to find the first <p> after record-txt if no <hr> content
-            if not details.get("age"):
-                next_p = record_txt.find_next_sibling("p")
-                if next_p:
-                    p_text = next_p.get_text().strip()
-                    print(f"    → Fallback paragraph: {p_text}")
+            if content_after_hr:
+                content_text = content_after_hr.strip()
+                print(f"    → Found detailed content: {content_text}")
+                
+                # Parse the structured content
+                # Format: "29, of Morgantown, Ky.; assigned to the 617th Military Police Company..."
+                
+                # Extract age and hometown (before first semicolon)
+                parts = content_text.split(';')
+                if parts:
+                    age_hometown_part = parts[0].strip()
                     
-                    # Extract age (number at start of paragraph)
-                    age_match = re.match(r'^(\d+)', p_text)
+                    # Extract age (number at start)
+                    age_match = re.match(r'^(\d+)', age_hometown_part)
                     if age_match:
                         details["age"] = age_match.group(1)
-                        print(f"    → Found age (fallback): {details['age']}")
+                        print(f"    → Found age: {details['age']}")
                     
-                    # Extract hometown (everything after "of ")
-                    hometown_match = re.search(r'of (.+)', p_text)
+                    # Extract hometown (after "of")
+                    hometown_match = re.search(r'of\s+([^;]+)', age_hometown_part)
                     if hometown_match:
                         hometown = hometown_match.group(1).strip().rstrip('.')
                         details["hometown"] = hometown
-                        print(f"    → Found hometown (fallback): {hometown}")
-        
-        # Also check if there's a better quality S3 image URL in the profile
-        profile_image_div = soup.select_one(".record-image")
-        if profile_image_div:
-            profile_img = profile_image_div.select_one("img")
-            if profile_img and profile_img.get("src"):
-                s3_image_url = profile_img["src"]
-                if s3_image_url.startswith("https://s3.amazonaws.com/"):
-                    details["high_quality_image_url"] = s3_image_url
-                    print(f"    → Found S3 image: {s3_image_url}")
-        
-        # Get all text content for additional parsing if needed
-        content = soup.get_text()
-        
-        # Extract location of death/incident (where they died)
-        death_location_patterns = [
-            r'killed in ([^,\n.]+(?:, [A-Za-z]+)?)',
-            r'died in ([^,\n.]+(?:, [A-Za-z]+)?)',
-            r'in ([A-Za-z\s]+(?:, Iraq|, Afghanistan|, Syria))',
-            r'(Iraq|Afghanistan|Syria|Kuwait|Pakistan|Jordan|Somalia|Yemen)',
-            r'province of ([A-Za-z\s]+)',
-            r'near ([A-Za-z\s]+(?:, Iraq|, Afghanistan))'
-        ]
-        
-        for pattern in death_location_patterns:
-            death_location_match = re.search(pattern, content, re.IGNORECASE)
-            if death_location_match:
-                death_location = death_location_match.group(1).strip()
-                if len(death_location) > 2 and not death_location.lower().startswith(('the', 'was', 'and', 'who', 'a ')):
-                    details["death_location"] = death_location
-                    break
-        
-        # Get unit information - look for common unit patterns
-        unit_patterns = [
-            r'(\d+(?:st|nd|rd|th)?\s+[^,\n]{10,50}(?:Battalion|Regiment|Brigade|Division|Squadron|Wing|Group))',
-            r'([A-Z][\w\s]*(Battalion|Regiment|Brigade|Division|Squadron|Wing|Group)[^,\n]{0,30})'
-        ]
-        for pattern in unit_patterns:
-            unit_match = re.search(pattern, content, re.IGNORECASE)
-            if unit_match:
-                details["unit"] = unit_match.group(1).strip()
+                        print(f"    → Found hometown: {hometown}")
+                
+                # Extract unit assignment (after "assigned to")
+                # Look for pattern: "assigned to [unit]" which comes after city, state
+                unit_match = re.search(r'assigned to (?:the\s+)?([^;,]+(?:Company|Battalion|Regiment|Brigade|Division|Squadron|Wing|Group)[^;]*)', content_text, re.IGNORECASE)
+                if unit_match:
+                    unit = unit_match.group(1).strip()
+                    
+                    # Completely ignore anything with Sightline Media Group
+                    if "Sightline Media Group" not in unit:
+                        details["unit"] = unit
+                        print(f"    → Found unit: {unit}")
+                    else:
+                        print(f"    → Ignored Sightline Media Group reference")
+                
+                # Alternative pattern: look for military unit keywords after location
+                if not details.get("unit"):
+                    # Look for units that come after city/state pattern
+                    alt_unit_patterns = [
+                        r'(?:assigned to|with|of) (?:the\s+)?(\d+(?:st|nd|rd|th)?\s+[^;,]*(?:Company|Battalion|Regiment|Brigade|Division|Squadron|Wing|Group)[^;,]*)',
+                        r'(?:assigned to|with|of) (?:the\s+)?([A-Z][^;,]*(?:Company|Battalion|Regiment|Brigade|Division|Squadron|Wing|Group)[^;,]*)'
+                    ]
+                    
+                    for pattern in alt_unit_patterns:
+                        alt_match = re.search(pattern, content_text, re.IGNORECASE)
+                        if alt_match:
+                            alt_unit = alt_match.group(1).strip()
+                            # Still filter out Sightline
+                            if "Sightline Media Group" not in alt_unit and len(alt_unit) > 5:
+                                details["unit"] = alt_unit
+                                print(f"    → Found unit (alt pattern): {alt_unit}")
+                                break
+                
+                # Extract circumstances of death (usually after the last semicolon)
+                if len(parts) > 1:
+                    circumstances_part = parts[-1].strip()
+                    if len(circumstances_part) > 20:  # Only if substantial content
+                        # Clean up the circumstances and capitalize first letter
+                        circumstances = circumstances_part.rstrip('.')
+                        if circumstances:
+                            circumstances = circumstances[0].upper() + circumstances[1:] if len(circumstances) > 1 else circumstances.upper()
+                            if not circumstances.endswith('.'):
+                                circumstances += '.'
+                            details["circumstances"] = circumstances
+                            print(f"    → Found circumstances: {circumstances}")
+        
+        # Fallback: try to find the first <p> after record-txt if no <hr> content
+        if not details.get("age"):
+            next_p = record_txt.find_next_sibling("p")
+            if next_p:
+                p_text = next_p.get_text().strip()
+                print(f"    → Fallback paragraph: {p_text}")
+                
+                # Extract age (number at start of paragraph)
+                age_match = re.match(r'^(\d+)', p_text)
+                if age_match:
+                    details["age"] = age_match.group(1)
+                    print(f"    → Found age (fallback): {details['age']}")
+                
+                # Extract hometown (everything after "of ")
+                hometown_match = re.search(r'of (.+)', p_text)
+                if hometown_match:
+                    hometown = hometown_match.group(1).strip().rstrip('.')
+                    details["hometown"] = hometown
+                    print(f"    → Found hometown (fallback): {hometown}")
+    
+    # Also check if there's a better quality S3 image URL in the profile
+    profile_image_div = soup.select_one(".record-image")
+    if profile_image_div:
+        profile_img = profile_image_div.select_one("img")
+        if profile_img and profile_img.get("src"):
+            s3_image_url = profile_img["src"]
+            if s3_image_url.startswith(endpoints.S3_URL):
+                details["high_quality_image_url"] = s3_image_url
+                print(f"    → Found S3 image: {s3_image_url}")
+    
+    # Get all text content for additional parsing if needed
+    content = soup.get_text()
+    
+    # Extract location of death/incident (where they died)
+    death_location_patterns = [
+        r'killed in ([^,\n.]+(?:, [A-Za-z]+)?)',
+        r'died in ([^,\n.]+(?:, [A-Za-z]+)?)',
+        r'in ([A-Za-z\s]+(?:, Iraq|, Afghanistan|, Syria))',
+        r'(Iraq|Afghanistan|Syria|Kuwait|Pakistan|Jordan|Somalia|Yemen)',
+        r'province of ([A-Za-z\s]+)',
+        r'near ([A-Za-z\s]+(?:, Iraq|, Afghanistan))'
+    ]
+    
+    for pattern in death_location_patterns:
+        death_location_match = re.search(pattern, content, re.IGNORECASE)
+        if death_location_match:
+            death_location = death_location_match.group(1).strip()
+            if len(death_location) > 2 and not death_location.lower().startswith(('the', 'was', 'and', 'who', 'a ')):
+                details["death_location"] = death_location
                 break
-        
-        # Extract circumstances/incident details
-        incident_section = soup.select_one('.incident-details, .profile-details, .bio')
-        if incident_section:
-            incident_text = incident_section.get_text().strip()
-            if len(incident_text) > 50:
-                # Truncate to first sentence or 200 characters
-                sentences = incident_text.split('.')
-                if sentences and len(sentences[0]) < 200:
-                    details["circumstances"] = sentences[0] + "."
-                else:
-                    details["circumstances"] = incident_text[:200] + "..."
-        
-        return details
-        
-    except Exception as e:
-        print(f"[!] Error getting details for {profile_link}: {e}")
-        return {}
+    
+    # Get unit information - look for common unit patterns
+    unit_patterns = [
+        r'(\d+(?:st|nd|rd|th)?\s+[^,\n]{10,50}(?:Battalion|Regiment|Brigade|Division|Squadron|Wing|Group))',
+        r'([A-Z][\w\s]*(Battalion|Regiment|Brigade|Division|Squadron|Wing|Group)[^,\n]{0,30})'
+    ]
+    for pattern in unit_patterns:
+        unit_match = re.search(pattern, content, re.IGNORECASE)
+        if unit_match:
+            details["unit"] = unit_match.group(1).strip()
+            break
+    
+    # Extract circumstances/incident details
+    incident_section = soup.select_one('.incident-details, .profile-details, .bio')
+    if incident_section:
+        incident_text = incident_section.get_text().strip()
+        if len(incident_text) > 50:
+            # Truncate to first sentence or 200 characters
+            sentences = incident_text.split('.')
+            if sentences and len(sentences[0]) < 200:
+                details["circumstances"] = sentences[0] + "."
+            else:
+                details["circumstances"] = incident_text[:200] + "..."
+    
+    return details
 
+@metrics.timed('render')
 def process_image_original_size(image_data):
     """Process image maintaining exact original dimensions - no modifications at all"""
     try:
@@ -437,6 +464,7 @@ def process_image_original_size(image_data):
         # Save with maximum quality and original dimensions
         output = io.BytesIO()
         image.save(output, format='JPEG', quality=100, optimize=False)
+        metrics.image_encoded('photo', output.tell())
         
         print(f"    → Preserved exact dimensions: {original_width}x{original_height}")
         return output.getvalue()
@@ -454,9 +482,9 @@ def test_facebook_credentials():
         print("❌ Missing ACCESS_TOKEN or PAGE_ID")
         return False
 
-    test_url = f"https://graph.facebook.com/v18.0/{PAGE_ID}"
+    test_url = f"{endpoints.GRAPH_API_URL}/{PAGE_ID}"
     try:
-        response = requests.get(
+        response = transport.get(
             test_url,
             headers={"Authorization": f"Bearer {ACCESS_TOKEN}"},
             timeout=30
@@ -474,7 +502,7 @@ def test_facebook_credentials():
 
 def create_individual_hero_caption(person, details, hero_number, total_heroes):
     """Create a caption for an individual hero post"""
-    today = datetime.today()
+    today = clock.now()
     caption_parts = []
     
     # Header
@@ -539,6 +567,51 @@ def create_individual_hero_caption(person, details, hero_number, total_heroes):
     
     return "\n".join(caption_parts)
 
+# Header profiles for image downloads, in the order tried when nothing has been learned yet
+IMAGE_HEADER_PROFILES = ['browser', 'minimal', 'referer']
+
+def fetch_image(image_url, headers, profile):
+    """One download attempt using a header profile"""
+    if profile == 'browser':
+        return transport.get(image_url, headers=headers, timeout=30)
+    
+    if profile == 'minimal':
+        # Without some headers that might trigger blocking
+        simple_headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+        }
+        return transport.get(image_url, headers=simple_headers, timeout=30)
+    
+    # 'referer': a fresh session with a referer
+    session = transport.new_session()
+    session.headers.update({
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+        "Referer": f"{endpoints.MILITARY_TIMES_URL}/"
+    })
+    return session.get(image_url, timeout=30)
+
+@metrics.timed('download')
+def download_image(image_url, headers):
+    """
+    Download a hero image, falling back to plainer requests when the host answers 403.
+    The profile that gets through is remembered per host and path (fallen/header_strategies.py)
+    and tried first next time.
+    """
+    profiles = header_strategies.registry.order(image_url, IMAGE_HEADER_PROFILES)
+    
+    for attempt, profile in enumerate(profiles):
+        if attempt:
+            print(f"    ⚠️  403 Forbidden - retrying with '{profile}' headers...")
+            metrics.count('image_403_retries')
+        image_response = fetch_image(image_url, headers, profile)
+        if image_response.status_code != 403:
+            break
+    
+    if image_response.status_code == 200:
+        header_strategies.registry.succeeded(image_url, profile)
+    return image_response
+
+@tracing.traced()
 def post_individual_heroes(service_members):
     """Post individual photos with captions for each service member using modern Facebook API"""
     print(f"[*] Creating individual posts for {len(service_members)} heroes...")
@@ -555,6 +628,8 @@ def post_individual_heroes(service_members):
         # Get detailed information
         print(f"    → Fetching profile details...")
         details = get_detailed_service_member_info(person["link"])
+        if details:
+            roster.record(records.HeroRecord(person, **details))
         
         # Use high-quality S3 image if available from profile, otherwise use original
         image_url_to_use = details.get("high_quality_image_url", person["image_url"])
@@ -566,7 +641,6 @@ def post_individual_heroes(service_members):
         try:
             # Download the image (prefer S3 URL if available)
             print(f"    → Downloading image from source...")
-            proxies = {"http": PROXY, "https": PROXY} if USE_PROXY and PROXY else None
             
             # Use proper headers to avoid 403 blocking
             image_headers = {
@@ -580,28 +654,7 @@ def post_individual_heroes(service_members):
             }
             
             # Try downloading with proper headers
-            image_response = requests.get(image_url_to_use, headers=image_headers, proxies=proxies, timeout=30)
-            
-            if image_response.status_code == 403:
-                print(f"    ⚠️  403 Forbidden - trying alternative approach...")
-                
-                # Try without some headers that might trigger blocking
-                simple_headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-                }
-                image_response = requests.get(image_url_to_use, headers=simple_headers, proxies=proxies, timeout=30)
-                
-                if image_response.status_code == 403:
-                    print(f"    ⚠️  Still 403 - trying with session and referer...")
-                    
-                    # Create a session and add referer
-                    session = requests.Session()
-                    session.headers.update({
-                        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-                        "Referer": "https://thefallen.militarytimes.com/"
-                    })
-                    
-                    image_response = session.get(image_url_to_use, proxies=proxies, timeout=30)
+            image_response = download_image(image_url_to_use, image_headers)
             
             if image_response.status_code != 200:
                 print(f"    ❌ Failed to download image (Status: {image_response.status_code})")
@@ -611,7 +664,9 @@ def post_individual_heroes(service_members):
                 # Try to find alternative image URL from the profile page
                 if details.get("high_quality_image_url") and image_url_to_use != person["image_url"]:
                     print(f"    → Trying fallback to original image URL...")
-                    fallback_response = requests.get(person["image_url"], headers=image_headers, proxies=proxies, timeout=30)
+                    metrics.count('image_url_fallbacks')
+                    with metrics.stage('download'):
+                        fallback_response = transport.get(person["image_url"], headers=image_headers, timeout=30)
                     if fallback_response.status_code == 200:
                         image_response = fallback_response
                         print(f"    ✅ Fallback image downloaded successfully")
@@ -667,14 +722,15 @@ def post_individual_heroes(service_members):
             print(f"    → Posting to Facebook using feed API...")
             
             # First upload the photo without publishing
-            upload_url = f"https://graph.facebook.com/v18.0/{PAGE_ID}/photos"
+            upload_url = f"{endpoints.GRAPH_API_URL}/{PAGE_ID}/photos"
             files = {'source': (unique_filename, processed_image_data, 'image/jpeg')}
             upload_data = {
                 "access_token": ACCESS_TOKEN,
                 "published": "false"  # Don't publish yet
             }
             
-            upload_response = requests.post(upload_url, data=upload_data, files=files, timeout=60)
+            with metrics.stage('upload'):
+                upload_response = transport.post(upload_url, data=upload_data, files=files, timeout=60)
             
             if upload_response.status_code == 200:
                 upload_result = upload_response.json()
@@ -684,14 +740,15 @@ def post_individual_heroes(service_members):
                     print(f"    ✅ Photo uploaded (ID: {photo_id})")
                     
                     # Now create a feed post with the photo
-                    feed_url = f"https://graph.facebook.com/v18.0/{PAGE_ID}/feed"
+                    feed_url = f"{endpoints.GRAPH_API_URL}/{PAGE_ID}/feed"
                     feed_data = {
                         "message": caption,
                         "attached_media": json.dumps([{"media_fbid": photo_id}]),
                         "access_token": ACCESS_TOKEN
                     }
                     
-                    feed_response = requests.post(feed_url, data=feed_data, timeout=60)
+                    with metrics.stage('publish'):
+                        feed_response = transport.post(feed_url, data=feed_data, timeout=60)
                     
                     if feed_response.status_code == 200:
                         result = feed_response.json()
@@ -709,7 +766,8 @@ def post_individual_heroes(service_members):
                             "access_token": ACCESS_TOKEN
                         }
                         
-                        text_response = requests.post(feed_url, data=text_data, timeout=60)
+                        with metrics.stage('publish'):
+                            text_response = transport.post(feed_url, data=text_data, timeout=60)
                         if text_response.status_code == 200:
                             result = text_response.json()
                             post_id = result.get("id", "unknown")
@@ -725,13 +783,14 @@ def post_individual_heroes(service_members):
                 
                 # Method 3: Try direct text post with image URL
                 print(f"    → Trying direct text post with image URL...")
-                feed_url = f"https://graph.facebook.com/v18.0/{PAGE_ID}/feed"
+                feed_url = f"{endpoints.GRAPH_API_URL}/{PAGE_ID}/feed"
                 direct_data = {
                     "message": f"{caption}\n\n🖼️ Hero Photo: {image_url_to_use}",
                     "access_token": ACCESS_TOKEN
                 }
                 
-                direct_response = requests.post(feed_url, data=direct_data, timeout=60)
+                with metrics.stage('publish'):
+                    direct_response = transport.post(feed_url, data=direct_data, timeout=60)
                 if direct_response.status_code == 200:
                     result = direct_response.json()
                     post_id = result.get("id", "unknown")
@@ -744,7 +803,7 @@ def post_individual_heroes(service_members):
             # Add delay between posts
             if i < total_heroes:
                 print(f"    → Waiting 10 seconds before next hero...")
-                time.sleep(10)
+                tracing.sleep(10)
                 
         except Exception as e:
             print(f"    ❌ Error processing {person['name']}: {e}")
@@ -780,6 +839,14 @@ def post_images_to_facebook(service_members):
 
 def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description="Post a memorial for one fallen hero")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile each stage with cProfile and tracemalloc (written to reports/)")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable()
+
     print("=" * 60)
     print("🇺🇸 FALLEN HEROES MEMORIAL FACEBOOK POSTING SCRIPT 🇺🇸")
     print("=" * 60)
@@ -787,7 +854,8 @@ def main():
     # Debug environment variables (don't print actual values for security)
     print(f"ACCESS_TOKEN: {'✅ Set (' + str(len(ACCESS_TOKEN)) + ' chars)' if ACCESS_TOKEN else '❌ NOT SET'}")
     print(f"PAGE_ID: {'✅ Set (' + PAGE_ID + ')' if PAGE_ID else '❌ NOT SET'}")
-    print(f"USE_PROXY: {USE_PROXY}")
+    proxy_pool = proxies.current()
+    print(f"PROXY_POOL: {'✅ ' + str(len(proxy_pool.proxies)) + ' configured' if proxy_pool else 'off (direct)'}")
     print(f"SEARCH_MODE: {SEARCH_MODE}")
     
     if not ACCESS_TOKEN or not PAGE_ID:
@@ -802,7 +870,7 @@ def main():
     
     print(f"\n✅ Credentials configured - proceeding with memorial search...")
     
-    today = datetime.today()
+    today = clock.now()
     all_service_members = []
     
     if SEARCH_MODE == "comprehensive":
@@ -819,34 +887,32 @@ def main():
         
     else:
         # Default: search today across multiple years
-        search_years = list(range(2003, datetime.now().year + 1))
+        search_years = list(range(2003, clock.now().year + 1))
         print(f"\n[*] 🔍 DAILY SEARCH: Searching for fallen service members on {today.strftime('%B %d')} across multiple years...")
         
+        search_dates = []
         for year in search_years:
             try:
-                search_date = today.replace(year=year)
-                print(f"\n[*] Checking {search_date.strftime('%B %d, %Y')}...")
-                
-                fallen = get_fallen_service_members(search_date)
-                
-                if fallen:
-                    print(f"    Found {len(fallen)} service members")
-                    # Only add those with images
-                    for person in fallen:
-                        if person["image_url"]:
-                            all_service_members.append(person)
-                            print(f"    ✅ {person['name']} - {person['date']} (has photo)")
-                        else:
-                            print(f"    ⚠️  {person['name']} - {person['date']} (no photo)")
-                else:
-                    print(f"    No service members found")
-                    
-                time.sleep(1)  # Rate limiting
-                
+                search_dates.append(today.replace(year=year))
             except ValueError:
                 # Handle leap year issues (Feb 29)
                 print(f"    Skipping {year} (date doesn't exist)")
-                continue
+        
+        # Years are searched concurrently; fallen.throttle sets the pace
+        for search_date, fallen in zip(search_dates, throttle.gather(get_fallen_service_members, search_dates)):
+            print(f"\n[*] Checking {search_date.strftime('%B %d, %Y')}...")
+            
+            if fallen:
+                print(f"    Found {len(fallen)} service members")
+                # Only add those with images
+                for person in fallen:
+                    if person["image_url"]:
+                        all_service_members.append(person)
+                        print(f"    ✅ {person['name']} - {person['date']} (has photo)")
+                    else:
+                        print(f"    ⚠️  {person['name']} - {person['date']} (no photo)")
+            else:
+                print(f"    No service members found")
         
     print(f"\n" + "=" * 60)
     
@@ -874,4 +940,7 @@ def main():
         return 0
 
 if __name__ == "__main__":
-    exit(main())
\ No newline at end of file
+    metrics.start('query-fallen')
+    snapshot.restore_at_startup()
+    with parse_pool.start():  # PARSE_WORKERS processes parse the pages, if set
+        exit(metrics.finish(main()))
\ No newline at end of file
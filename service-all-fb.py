@@ -5,23 +5,52 @@ Creates a single Facebook post with ALL fallen heroes for the day
 Includes multiple images with captions and comprehensive hero information
 """
 
-import requests
 import json
 import time
 import os
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
 import io
-from bs4 import BeautifulSoup
+import math
 import re
 import random
+import argparse
+from fallen import bundles, clock, endpoints, lazy, metrics, parse_pool
+from fallen import priority, profiling, records, roster, search_cursor
+from fallen import shared_rate, singleflight, snapshot, throttle, tracing
+
+# Heavy dependencies load on first use (see fallen/lazy.py)
+Image = lazy.module('PIL.Image')
+ImageDraw = lazy.module('PIL.ImageDraw')
+ImageFont = lazy.module('PIL.ImageFont')
+ImageOps = lazy.module('PIL.ImageOps')
+np = lazy.module('numpy')
+bs4 = lazy.module('bs4')
+# requests and the fallen modules built on it load with the first HTTP call
+requests = lazy.module('requests')
+month_buckets = lazy.module('fallen.month_buckets')
+scheduling = lazy.module('fallen.scheduling')
+transport = lazy.module('fallen.transport')
+
+# Graph API limits for a single /feed post. Days with more heroes than fit in
+# one post are split into several posts ("shards") before any upload starts.
+MAX_PHOTOS_PER_POST = int(os.getenv('MAX_PHOTOS_PER_POST', '30'))
+MAX_MESSAGE_CHARS = int(os.getenv('MAX_MESSAGE_CHARS', '60000'))  # Graph hard limit is 63,206
+
+# RENDER_MODE=collage composites the day's portraits into a few grid images
+# instead of uploading one image per hero.
+RENDER_MODE = os.getenv('RENDER_MODE', 'individual')  # individual or collage
+COLLAGE_MAX_TILES = int(os.getenv('COLLAGE_MAX_TILES', '36'))
+COLLAGE_WIDTH = 1080
+
+# Fields that only a hero's profile page has. Reading one of them is what
+# fetches the profile (see fallen/records.py).
+PROFILE_FIELDS = ('rank', 'age', 'hometown', 'branch', 'unit', 'location', 'circumstances', 'image_url')
 
 class MilitaryTimesScraper:
     def __init__(self):
-        self.base_url = "https://thefallen.militarytimes.com"
-        self.use_proxy = os.getenv('USE_PROXY', 'false').lower() == 'true'
-        self.proxy = os.getenv('PROXY_URL') if self.use_proxy else None
-        self.session = requests.Session()
+        self.base_url = endpoints.MILITARY_TIMES_URL
+        self.search_complete = False  # Whether the last date searched had every year answer cleanly
+        self.session = transport.new_session()
         
         # Use updated Chrome user agent
         self.session.headers.update({
@@ -110,147 +139,180 @@ class MilitaryTimesScraper:
             re.compile(r'(was killed when[^.]*\.)', re.IGNORECASE),
         ]
 
+    @tracing.traced()
     def get_all_heroes_for_date(self, target_date):
         """
         Get ALL fallen heroes for the given date across all years.
-        Returns list of complete hero data with images.
+        Returns list of complete hero data with images. self.search_complete
+        is True only if every year's search finished cleanly, so an empty
+        list can be told apart from failed searches.
         """
         print(f"🔍 Searching for ALL heroes who died on {target_date.strftime('%B %d')} (across all years)")
         
-        all_heroes = []
-        current_year = datetime.now().year
+        current_year = clock.now().year
         
-        # Search all years from 2003 to current year
-        for year in range(2003, current_year + 1):
-            year_date = target_date.replace(year=year)
-            print(f"📅 Checking {year_date.strftime('%B %d, %Y')}")
-            
-            try:
-                fallen_list = self.get_fallen_service_members(year_date)
-                
-                if fallen_list:
-                    print(f"  ✅ Found {len(fallen_list)} hero(s) for {year}")
-                    
-                    # Process each hero from this year
-                    for fallen in fallen_list:
-                        hero_data = self.convert_to_hero_data(fallen)
-                        hero_data['year'] = year
-                        
-                        # Get additional details from profile
-                        if fallen.get('link'):
-                            print(f"    🔍 Getting details for {fallen.get('name', 'Unknown')}")
-                            additional_data = self.scrape_hero_profile(fallen['link'])
-                            if additional_data:
-                                hero_data.update(additional_data)
-                            time.sleep(1)  # Rate limit between profile scrapes
-                        
-                        all_heroes.append(hero_data)
-                
-            except Exception as e:
-                print(f"  ⚠️ Error searching year {year}: {str(e)}")
-                continue
-            
-            time.sleep(1)  # Rate limit between years
+        # Search all years from 2003 to current year; fallen.throttle sets the pace
+        years = list(range(2003, current_year + 1))
+        results = throttle.gather(lambda year: self.search_year(target_date, year), years)
+        
+        fallen_refs = []
+        self.search_complete = all(complete for _, complete in results)
+        for year, (fallen_list, _) in zip(years, results):
+            if fallen_list:
+                print(f"  ✅ Found {len(fallen_list)} hero(s) for {year}")
+                fallen_refs.extend((year, fallen) for fallen in fallen_list)
+        
+        # Profile pages are fetched later, when a profile field is first read
+        all_heroes = [self.build_hero(ref) for ref in fallen_refs]
         
         print(f"\n✅ Found {len(all_heroes)} total heroes for {target_date.strftime('%B %d')}")
         return all_heroes
     
+    def search_year(self, target_date, year):
+        """(heroes listed for target_date in one year, whether every result page was read)"""
+        year_date = target_date.replace(year=year)
+        print(f"📅 Checking {year_date.strftime('%B %d, %Y')}")
+        try:
+            cursor = self.search_date(year_date)
+            return cursor.fetch_all(), cursor.complete
+        except Exception as e:
+            print(f"  ⚠️ Error searching year {year}: {str(e)}")
+            return [], False
+    
+    def build_hero(self, year_and_fallen):
+        """Hero data for one search result; its profile page is read on first use"""
+        year, fallen = year_and_fallen
+        hero_data = self.convert_to_hero_data(fallen)
+        hero_data['year'] = year
+        if fallen.get('link'):
+            hero_data.defer(self.fill_profile, PROFILE_FIELDS)
+        return hero_data
+
+    def fill_profile(self, hero_data):
+        """Add the details from a hero's profile page (the deferred loader set in build_hero)"""
+        print(f"    🔍 Getting details for {hero_data.get('name', 'Unknown')}")
+        additional_data = self.scrape_hero_profile(hero_data['profile_url'])
+        if additional_data:
+            hero_data.update(additional_data)
+            roster.record(hero_data)
+    
     def get_fallen_service_members(self, date):
         """Get fallen service members for a specific date"""
-        base_url = "https://thefallen.militarytimes.com/search"
+        return self.search_date(date).fetch_all()
+
+    @metrics.timed('search')
+    def search_date(self, date):
+        """Cursor over the fallen service members for a date; a failed cursor on errors"""
+        # With MONTH_PREFETCH the date's month bucket answers without a search of its own
+        bucketed = month_buckets.search(date, self.parse_search_page, self.session.get)
+        if bucketed is not None:
+            return search_cursor.SearchCursor.from_entries(bucketed)
+
+        base_url = f"{endpoints.MILITARY_TIMES_URL}/search"
         formatted_date = date.strftime("%m%%2F%d%%2F%Y")
         query_url = f"{base_url}?year=&year_month=&first_name=&last_name=&start_date={formatted_date}&end_date={formatted_date}&conflict=&home_state=&home_town="
         
-        proxies = {"http": self.proxy, "https": self.proxy} if self.use_proxy and self.proxy else None
-        
         try:
-            response = self.session.get(query_url, proxies=proxies, timeout=30)
+            response = self.session.get(query_url, timeout=30)
 
             if response.status_code != 200:
-                return []
+                return search_cursor.SearchCursor.failed()
 
             if "Access Denied" in response.text or "Captcha" in response.text:
                 print("❌ Access blocked or CAPTCHA detected")
-                return []
+                return search_cursor.SearchCursor.failed()
 
             if "cloudflare" in response.text.lower() or "security check" in response.text.lower():
                 print("❌ Cloudflare or security check detected")
-                return []
+                return search_cursor.SearchCursor.failed()
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            fallen_list = []
-            entries = soup.select(".data-box")
-            
-            for entry in entries:
-                try:
-                    name_tag = entry.select_one(".data-box-right h3 a")
-                    name = name_tag.text.strip() if name_tag else "Unknown"
-                    
-                    date_tag = entry.select_one(".data-box-right .blue-bold")
-                    date_of_death = date_tag.text.strip() if date_tag else "Unknown Date"
-                    
-                    profile_link = name_tag["href"] if name_tag and "href" in name_tag.attrs else ""
-                    if profile_link:
-                        profile_link = profile_link.rstrip(':').rstrip()
-                        if profile_link.startswith('/'):
-                            profile_link = f"https://thefallen.militarytimes.com{profile_link}"
-                    
-                    if name and name != "Unknown" and profile_link:
-                        fallen_list.append({
-                            "name": name,
-                            "date": date_of_death,
-                            "link": profile_link
-                        })
-                    
-                except Exception as e:
-                    continue
-            
-            return fallen_list
+            # Long result lists are paginated; the cursor fetches the rest
+            return search_cursor.SearchCursor(query_url, self.session.get, self.parse_search_page,
+                                              first_page=response.text)
             
         except Exception as e:
             print(f"❌ Error fetching data: {str(e)}")
-            return []
+            return search_cursor.SearchCursor.failed()
+    
+    @parse_pool.offload('service-all-fb', 'MilitaryTimesScraper')
+    def parse_search_page(self, html):
+        """Fallen service members listed on a search results page"""
+        soup = bs4.BeautifulSoup(html, "html.parser")
+        fallen_list = []
+        entries = soup.select(".data-box")
+        
+        for entry in entries:
+            try:
+                name_tag = entry.select_one(".data-box-right h3 a")
+                name = name_tag.text.strip() if name_tag else "Unknown"
+                
+                date_tag = entry.select_one(".data-box-right .blue-bold")
+                date_of_death = date_tag.text.strip() if date_tag else "Unknown Date"
+                
+                profile_link = name_tag["href"] if name_tag and "href" in name_tag.attrs else ""
+                if profile_link:
+                    profile_link = profile_link.rstrip(':').rstrip()
+                    if profile_link.startswith('/'):
+                        profile_link = f"{endpoints.MILITARY_TIMES_URL}{profile_link}"
+                
+                if name and name != "Unknown" and profile_link:
+                    fallen_list.append(records.HeroRecord(
+                        name=name,
+                        date=date_of_death,
+                        link=profile_link
+                    ))
+                
+            except Exception as e:
+                continue
+        
+        return fallen_list
     
     def convert_to_hero_data(self, fallen):
         """Convert fallen service member data to hero data format"""
-        return {
-            'name': fallen.get('name', 'Unknown Hero'),
-            'date_of_death': fallen.get('date', ''),
-            'profile_url': fallen.get('link', ''),
-            'rank': '',
-            'age': '',
-            'hometown': '',
-            'branch': '',
-            'unit': '',
-            'location': '',
-            'circumstances': '',
-            'image_url': None
-        }
+        return records.HeroRecord(
+            name=fallen.get('name', 'Unknown Hero'),
+            date_of_death=fallen.get('date', ''),
+            profile_url=fallen.get('link', ''),
+            rank='',
+            age='',
+            hometown='',
+            branch='',
+            unit='',
+            location='',
+            circumstances='',
+            image_url=None
+        )
     
+    @singleflight.coalesce('profile', method=True)
+    @metrics.timed('profile')
     def scrape_hero_profile(self, profile_url):
         """Scrape detailed information from hero's profile page"""
         try:
             response = self.session.get(profile_url, timeout=30)
             if response.status_code != 200:
                 return None
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            text = soup.get_text()  # Extract once, reused by all extract_* methods
-
-            return {
-                'rank': self.extract_rank(text),
-                'age': self.extract_age(text),
-                'hometown': self.extract_hometown(text),
-                'branch': self.extract_branch(text),
-                'unit': self.extract_unit(text),
-                'location': self.extract_location(text),
-                'circumstances': self.extract_circumstances(text),
-                'image_url': self.extract_s3_image_url(soup)  # soup needed for CSS selectors
-            }
+            return self.parse_profile_page(response.content)
             
         except Exception as e:
             print(f"❌ Error scraping profile: {str(e)}")
             return None
+
+    @parse_pool.offload('service-all-fb', 'MilitaryTimesScraper')
+    def parse_profile_page(self, content):
+        """Details from a hero's profile page (the response's raw bytes)"""
+        soup = bs4.BeautifulSoup(content, 'html.parser')
+        text = soup.get_text()  # Extract once, reused by all extract_* methods
+
+        return {
+            'rank': self.extract_rank(text),
+            'age': self.extract_age(text),
+            'hometown': self.extract_hometown(text),
+            'branch': self.extract_branch(text),
+            'unit': self.extract_unit(text),
+            'location': self.extract_location(text),
+            'circumstances': self.extract_circumstances(text),
+            'image_url': self.extract_s3_image_url(soup)  # soup needed for CSS selectors
+        }
     
     def extract_s3_image_url(self, soup):
         """Extract S3 image URL from profile page"""
@@ -262,7 +324,7 @@ class MilitaryTimesScraper:
                 img_tag = record_image_div.select_one("img")
                 if img_tag and img_tag.get("src"):
                     src = img_tag.get("src")
-                    if src.startswith("https://s3.amazonaws.com/static.militarytimes.com/thefallen/"):
+                    if src.startswith(endpoints.S3_FALLEN_PREFIX):
                         return src
         
         # Fallback: look for any record-image div
@@ -271,7 +333,7 @@ class MilitaryTimesScraper:
             img_tag = record_image_div.select_one("img")
             if img_tag and img_tag.get("src"):
                 src = img_tag.get("src")
-                if src.startswith("https://s3.amazonaws.com/static.militarytimes.com/thefallen/"):
+                if src.startswith(endpoints.S3_FALLEN_PREFIX):
                     return src
         
         return None
@@ -338,7 +400,9 @@ class ImageProcessor:
         adapter = requests.adapters.HTTPAdapter(max_retries=3)
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
+        transport.wrap_session(self.session)
 
+    @tracing.traced()
     def process_all_hero_images(self, heroes):
         """
         Process images for all heroes - download S3 images or create placeholders.
@@ -346,38 +410,41 @@ class ImageProcessor:
         """
         image_data = []
         
-        for i, hero in enumerate(heroes):
-            print(f"\n📸 Processing image {i+1}/{len(heroes)}: {hero.get('name', 'Unknown')}")
+        # Profiles load in the background, in the order this loop reads them
+        with throttle.ahead(records.HeroRecord.resolve, heroes):
+            for i, hero in enumerate(heroes):
+                print(f"\n📸 Processing image {i+1}/{len(heroes)}: {hero.get('name', 'Unknown')}")
             
-            # Create filename
-            name = hero.get('name', 'unknown').lower()
-            safe_name = re.sub(r'[^a-z0-9\s]', '', name)
-            safe_name = re.sub(r'\s+', '_', safe_name.strip())
-            filename = f"{safe_name}.jpg"
-            filepath = os.path.join(self.download_dir, filename)
+                # Create filename
+                name = hero.get('name', 'unknown').lower()
+                safe_name = re.sub(r'[^a-z0-9\s]', '', name)
+                safe_name = re.sub(r'\s+', '_', safe_name.strip())
+                filename = f"{safe_name}.jpg"
+                filepath = os.path.join(self.download_dir, filename)
             
-            # Download S3 image or create placeholder
-            success = self.download_or_create_image(hero, filepath)
+                # Download S3 image or create placeholder
+                success = self.download_or_create_image(hero, filepath)
             
-            if success:
-                # Use the name as-is — MilitaryTimes names already include rank/branch prefix
-                caption = hero.get('name', 'Unknown').strip()
-                image_data.append({
-                    'filepath': filepath,
-                    'caption': caption,
-                    'hero': hero
-                })
+                if success:
+                    # Use the name as-is — MilitaryTimes names already include rank/branch prefix
+                    caption = hero.get('name', 'Unknown').strip()
+                    image_data.append({
+                        'filepath': filepath,
+                        'caption': caption,
+                        'hero': hero
+                    })
 
         return image_data
     
+    @metrics.timed('download')
     def download_or_create_image(self, hero_data, filepath):
         """Download S3 image or create placeholder"""
         image_url = hero_data.get('image_url')
         
         # Try to download S3 image first
-        if image_url and image_url.startswith("https://s3.amazonaws.com/static.militarytimes.com/thefallen/"):
+        if image_url and image_url.startswith(endpoints.S3_FALLEN_PREFIX):
             try:
-                time.sleep(1)  # Rate limit before network download only
+                shared_rate.courtesy_sleep(1)  # Rate limit before network download only
                 print(f"📥 Downloading S3 image...")
                 response = self.session.get(image_url, stream=True, timeout=30)
                 
@@ -400,6 +467,7 @@ class ImageProcessor:
         print(f"📷 Creating placeholder image...")
         return self.create_placeholder_image(hero_data, filepath)
     
+    @metrics.timed('render')
     def create_placeholder_image(self, hero_data, filepath):
         """Create placeholder image for hero"""
         try:
@@ -453,6 +521,7 @@ class ImageProcessor:
             
             # Save image
             img.save(filepath, 'JPEG', quality=90)
+            metrics.image_encoded('placeholder', os.path.getsize(filepath))
             print(f"✅ Created placeholder image")
             return True
             
@@ -460,6 +529,7 @@ class ImageProcessor:
             print(f"❌ Error creating placeholder: {str(e)}")
             return False
     
+    @metrics.timed('render')
     def optimize_image(self, filepath):
         """Optimize image for Facebook"""
         try:
@@ -468,15 +538,110 @@ class ImageProcessor:
                     img = img.convert('RGB')
                 img.thumbnail((1080, 1080), Image.Resampling.LANCZOS)
                 img.save(filepath, 'JPEG', quality=90, optimize=True)
+                metrics.image_encoded('photo', os.path.getsize(filepath))
         except Exception as e:
             print(f"⚠️ Could not optimize image: {str(e)}")
 
+    def create_collages(self, image_data):
+        """
+        Composite per-hero images into grid collages with name labels.
+
+        Each collage holds up to COLLAGE_MAX_TILES heroes. Portraits are
+        resized in one pass and tiled into the grid with numpy array
+        operations; only the name labels are drawn per tile. Returns a list
+        in the same shape as process_all_hero_images, with a 'heroes' list
+        naming everyone shown in each collage.
+        """
+        if not image_data:
+            return []
+
+        per_collage = max(1, min(COLLAGE_MAX_TILES, len(image_data)))
+        # Spread heroes evenly so the last collage is not a near-empty grid
+        collage_count = math.ceil(len(image_data) / per_collage)
+        per_collage = math.ceil(len(image_data) / collage_count)
+
+        collages = []
+        for index in range(collage_count):
+            batch = image_data[index * per_collage:(index + 1) * per_collage]
+            filepath = os.path.join(self.download_dir, f"collage_{index + 1}.jpg")
+            print(f"\n🧩 Rendering collage {index + 1}/{collage_count} ({len(batch)} heroes)...")
+
+            if self.render_collage(batch, filepath):
+                heroes = [img['hero'] for img in batch]
+                first = index * per_collage + 1
+                collages.append({
+                    'filepath': filepath,
+                    'caption': f"Fallen heroes {first}–{first + len(batch) - 1}",
+                    'hero': heroes[0],
+                    'heroes': heroes
+                })
+
+        return collages
+
+    @metrics.timed('render')
+    def render_collage(self, batch, filepath):
+        """Render a single grid collage for a batch of hero images"""
+        try:
+            cols = math.ceil(math.sqrt(len(batch)))
+            rows = math.ceil(len(batch) / cols)
+            tile_w = COLLAGE_WIDTH // cols
+            photo_h = tile_w * 4 // 3  # Service portraits are taller than wide
+            label_h = max(24, tile_w // 7)
+            tile_h = photo_h + label_h
+
+            # Batch-resize every portrait to the tile size, then stack into one array
+            background = np.array([26, 71, 42], dtype=np.uint8)  # Military green
+            tiles = np.empty((rows * cols, tile_h, tile_w, 3), dtype=np.uint8)
+            tiles[:] = background
+            for i, img_data in enumerate(batch):
+                with Image.open(img_data['filepath']) as img:
+                    portrait = ImageOps.fit(img.convert('RGB'), (tile_w, photo_h), Image.Resampling.LANCZOS)
+                tiles[i, :photo_h] = np.asarray(portrait)
+
+            # (rows*cols, h, w, 3) -> (rows*h, cols*w, 3) in a single reshape
+            grid = tiles.reshape(rows, cols, tile_h, tile_w, 3).swapaxes(1, 2).reshape(rows * tile_h, cols * tile_w, 3)
+            collage = Image.fromarray(grid)
+
+            draw = ImageDraw.Draw(collage)
+            try:
+                font = ImageFont.truetype("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", max(12, label_h * 3 // 5))
+            except:
+                font = ImageFont.load_default()
+
+            for i, img_data in enumerate(batch):
+                label = self.fit_label(draw, img_data['caption'], font, tile_w - 8)
+                row, col = divmod(i, cols)
+                bbox = draw.textbbox((0, 0), label, font=font)
+                x = col * tile_w + (tile_w - (bbox[2] - bbox[0])) // 2
+                y = row * tile_h + photo_h + (label_h - (bbox[3] - bbox[1])) // 2 - bbox[1]
+                draw.text((x, y), label, fill='#ffffff', font=font)
+
+            collage.save(filepath, 'JPEG', quality=90, optimize=True)
+            metrics.image_encoded('collage', os.path.getsize(filepath))
+            print(f"✅ Created collage {os.path.basename(filepath)} ({collage.width}x{collage.height})")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error creating collage: {str(e)}")
+            return False
+
+    def fit_label(self, draw, text, font, max_width):
+        """Shorten a name label with an ellipsis until it fits the tile width"""
+        text = text.strip()
+        if draw.textlength(text, font=font) <= max_width:
+            return text
+        while text and draw.textlength(text + '…', font=font) > max_width:
+            text = text[:-1]
+        return text.rstrip() + '…'
+
 class FacebookMultiPoster:
-    def __init__(self, access_token, page_id):
+    def __init__(self, access_token, page_id, exchange_token=True):
         self.access_token = access_token
         self.page_id = page_id
-        self.base_url = "https://graph.facebook.com/v18.0"
-        self._ensure_page_token()
+        self.base_url = endpoints.GRAPH_API_URL
+        # Precompute runs only build post text, so they skip the Graph round trip
+        if exchange_token:
+            self._ensure_page_token()
 
     def _ensure_page_token(self):
         """Exchange a User Access Token for a Page Access Token if needed.
@@ -487,7 +652,7 @@ class FacebookMultiPoster:
         """
         url = f"{self.base_url}/{self.page_id}"
         try:
-            resp = requests.get(
+            resp = transport.get(
                 url,
                 params={'fields': 'access_token', 'access_token': self.access_token},
                 timeout=15
@@ -504,34 +669,97 @@ class FacebookMultiPoster:
         except Exception as e:
             print(f"⚠️  Token exchange error: {e}; using original token")
 
-    def create_multi_hero_post(self, heroes, image_data, date):
+    @tracing.traced()
+    def publish_shards(self, shards):
         """
-        Create a single Facebook post with multiple hero images and comprehensive text.
+        Upload and publish planned posts, in shard order.
+
+        Each shard's images are uploaded (unpublished) one at a time, a second
+        apart, and then its post is published. A shard with a
+        'scheduled_time' is scheduled instead of published immediately, and
+        its photos are uploaded as temporary so they last until then.
+        Each shard's 'attached' is set to the number of photos its post carries.
+        Returns the post IDs in shard order (None for posts that failed).
+        """
+        post_ids = []
+        uploads = 0
+        for index, shard in enumerate(shards, 1):
+            photo_ids = []
+            for img in shard['image_data']:
+                if uploads:
+                    tracing.sleep(1)  # Rate limit between uploads
+                uploads += 1
+                photo_ids.append(self.upload_image_with_caption(img['filepath'], img['caption'],
+                                                                bool(shard.get('scheduled_time'))))
+            photo_ids = [photo_id for photo_id in photo_ids if photo_id]
+            shard['attached'] = len(photo_ids)
+
+            if not photo_ids:
+                print(f"❌ No images uploaded successfully for post {index}/{len(shards)}")
+                post_ids.append(None)
+                continue
+
+            print(f"✅ Uploaded {len(photo_ids)} images for post {index}/{len(shards)}")
+            post_ids.append(self.create_post_with_multiple_images(
+                shard['text'], photo_ids, shard.get('scheduled_time')))
+
+        if len(shards) > 1:
+            print(f"📊 Published {sum(1 for post_id in post_ids if post_id)}/{len(shards)} posts")
+        return post_ids
+
+    def plan_post_shards(self, heroes, image_data, date):
+        """
+        Assign heroes to posts so each post stays within Graph API limits.
+
+        Heroes keep their original order. A new post is started whenever adding
+        the next hero would exceed MAX_PHOTOS_PER_POST attached photos or
+        MAX_MESSAGE_CHARS of post text. A collage and every hero it shows go
+        in the same post. Returns a list of dicts with the heroes, image_data
+        and final text for each post.
+        """
+        # Every part's introduction counts the whole day; reserve room for its "Part X of Y" label
+        header_chars = lines_length(self.post_header_lines(len(heroes), date, part=(99, 99)))
+        groups = []
+        current_heroes, current_images = [], []
+        body_chars, branches = 0, set()  # Length of the current post's hero blocks, and its branches
+        for unit_heroes, unit_images in self.shard_units(heroes, image_data):
+            unit_chars = sum(lines_length(self.hero_lines(hero)) for hero in unit_heroes)
+            unit_branches = {self.hero_branch(hero) for hero in unit_heroes}
+            too_many_photos = len(current_images) + len(unit_images) > MAX_PHOTOS_PER_POST
+            too_long = (header_chars + body_chars + unit_chars
+                        + lines_length(self.post_footer_lines(branches | unit_branches)) - 1) > MAX_MESSAGE_CHARS
+
+            if current_heroes and (too_many_photos or too_long):
+                groups.append((current_heroes, current_images))
+                current_heroes, current_images = [], []
+                body_chars, branches = 0, set()
+
+            current_heroes.extend(unit_heroes)
+            current_images.extend(unit_images)
+            body_chars += unit_chars
+            branches |= unit_branches
+
+        if current_heroes:
+            groups.append((current_heroes, current_images))
+
+        total = len(groups)
+        shards = []
+        for index, (shard_heroes, shard_images) in enumerate(groups, 1):
+            part = (index, total) if total > 1 else None
+            shards.append({
+                'heroes': shard_heroes,
+                'image_data': shard_images,
+                'text': self.create_comprehensive_post_text(shard_heroes, date, part=part, total=len(heroes))
+            })
+        return shards
+
+    @metrics.timed('upload')
+    def upload_image_with_caption(self, image_path, caption, temporary=False):
+        """
+        Upload image with caption but don't publish it. Photos for a
+        scheduled post must be temporary, or Graph may drop them before the
+        post goes live.
         """
-        print(f"\n📝 Creating multi-hero Facebook post for {len(heroes)} heroes...")
-        
-        # Step 1: Upload all images (unpublished) and collect photo IDs
-        photo_ids = []
-        for img_data in image_data:
-            photo_id = self.upload_image_with_caption(img_data['filepath'], img_data['caption'])
-            if photo_id:
-                photo_ids.append(photo_id)
-            time.sleep(1)  # Rate limit between uploads
-        
-        if not photo_ids:
-            print("❌ No images uploaded successfully")
-            return False
-        
-        print(f"✅ Uploaded {len(photo_ids)} images")
-        
-        # Step 2: Create comprehensive post text
-        post_text = self.create_comprehensive_post_text(heroes, date)
-        
-        # Step 3: Create the main post with all attached images
-        return self.create_post_with_multiple_images(post_text, photo_ids)
-    
-    def upload_image_with_caption(self, image_path, caption):
-        """Upload image with caption but don't publish it"""
         url = f"{self.base_url}/{self.page_id}/photos"
         
         try:
@@ -542,8 +770,10 @@ class FacebookMultiPoster:
                     'caption': caption,
                     'published': 'false'
                 }
+                if temporary:
+                    data['temporary'] = 'true'
 
-                response = requests.post(url, files=files, data=data)
+                response = transport.post(url, files=files, data=data)
                 
                 if response.status_code == 200:
                     result = response.json()
@@ -558,62 +788,109 @@ class FacebookMultiPoster:
             print(f"  ❌ Error uploading {caption}: {str(e)}")
             return None
     
-    def create_comprehensive_post_text(self, heroes, date):
-        """Create post text listing all fallen heroes for the date."""
-        lines = []
-        n = len(heroes)
+    def shard_units(self, heroes, image_data):
+        """
+        Split heroes into runs that must share a post, each with its images.
+        A hero is its own run unless a collage shows it, in which case the
+        run spans every hero from the collage's first to its last.
+        """
+        images_by_hero = {}
+        for img in image_data:
+            for hero in img.get('heroes') or [img['hero']]:
+                images_by_hero.setdefault(id(hero), []).append(img)
+        position = {id(hero): index for index, hero in enumerate(heroes)}
 
-        lines.append("🇺🇸 HONORING OUR FALLEN HEROES 🇺🇸")
-        lines.append("")
-        lines.append(
+        units = []
+        start = 0
+        while start < len(heroes):
+            end = start
+            index = start
+            while index <= end:
+                for img in images_by_hero.get(id(heroes[index]), []):
+                    for hero in img.get('heroes') or [img['hero']]:
+                        end = max(end, position.get(id(hero), end))
+                index += 1
+            unit_images, seen = [], set()
+            for hero in heroes[start:end + 1]:
+                for img in images_by_hero.get(id(hero), []):
+                    if id(img) not in seen:
+                        seen.add(id(img))
+                        unit_images.append(img)
+            units.append((heroes[start:end + 1], unit_images))
+            start = end + 1
+        return units
+
+    def create_comprehensive_post_text(self, heroes, date, part=None, total=None):
+        """Create post text listing all fallen heroes for the date.
+
+        part is an optional (index, total) tuple used when a day is split
+        across several posts; total is then the day's number of heroes, which
+        the introduction gives instead of the post's own.
+        """
+        lines = self.post_header_lines(total or len(heroes), date, part)
+        for hero in heroes:
+            lines.extend(self.hero_lines(hero))
+        lines.extend(self.post_footer_lines({self.hero_branch(hero) for hero in heroes}))
+        return "\n".join(lines)
+
+    def post_header_lines(self, n, date, part=None):
+        """Title and introduction for a post naming n heroes"""
+        return [
+            f"🇺🇸 HONORING OUR FALLEN HEROES ({part[0]} of {part[1]}) 🇺🇸" if part else "🇺🇸 HONORING OUR FALLEN HEROES 🇺🇸",
+            "",
             f"On this day, {date.strftime('%B %d')}, we remember "
             f"{n} {'service member' if n == 1 else 'service members'} "
-            f"who paid the ultimate price for our freedom:"
-        )
+            f"who paid the ultimate price for our freedom:",
+            "",
+        ]
+
+    def hero_lines(self, hero):
+        """One hero's block in the post text: name, details and a blank line"""
+        # Name from MilitaryTimes already includes rank/branch prefix
+        # (e.g. "Marine Staff Sgt. Jimmy J. Arroyave") — use it as-is
+        lines = [hero.get('name', 'Unknown Hero').strip()]
+
+        detail_parts = []
+        if hero.get('branch'):
+            detail_parts.append(hero['branch'])
+        date_str = hero.get('date_of_death', '').strip()
+        if not date_str or date_str == 'Unknown Date':
+            year = hero.get('year', '')
+            if year:
+                date_str = str(year)
+        if date_str:
+            detail_parts.append(date_str)
+        if hero.get('location'):
+            detail_parts.append(hero['location'])
+        if detail_parts:
+            lines.append("  " + "  |  ".join(detail_parts))
+
         lines.append("")
+        return lines
 
-        for hero in heroes:
-            # Name from MilitaryTimes already includes rank/branch prefix
-            # (e.g. "Marine Staff Sgt. Jimmy J. Arroyave") — use it as-is
-            name = hero.get('name', 'Unknown Hero').strip()
-            lines.append(name)
-
-            detail_parts = []
-            if hero.get('branch'):
-                detail_parts.append(hero['branch'])
-            date_str = hero.get('date_of_death', '').strip()
-            if not date_str or date_str == 'Unknown Date':
-                year = hero.get('year', '')
-                if year:
-                    date_str = str(year)
-            if date_str:
-                detail_parts.append(date_str)
-            if hero.get('location'):
-                detail_parts.append(hero['location'])
-            if detail_parts:
-                lines.append("  " + "  |  ".join(detail_parts))
-
-            lines.append("")
+    def hero_branch(self, hero):
+        """Hashtag key for a hero's branch, or None"""
+        branch = hero.get('branch', '').lower()
+        if 'army' in branch:
+            return 'army'
+        elif 'navy' in branch:
+            return 'navy'
+        elif 'air force' in branch:
+            return 'airforce'
+        elif 'marine' in branch:
+            return 'marines'
+        elif 'coast guard' in branch:
+            return 'coastguard'
+        return None
 
+    def post_footer_lines(self, branches_found):
+        """Closing text and hashtags for a post whose heroes served in branches_found"""
+        lines = []
         lines.append("They answered the call when our nation needed them most. We owe them a debt that can never be repaid. Please share and help keep their memory alive.")
         lines.append("")
 
         hashtags = ["#FallenHeroes", "#NeverForget", "#HonorTheFallen", "#Military", "#Sacrifice", "#RememberThem"]
-        branches_found = set()
-        for hero in heroes:
-            branch = hero.get('branch', '').lower()
-            if 'army' in branch:
-                branches_found.add('army')
-            elif 'navy' in branch:
-                branches_found.add('navy')
-            elif 'air force' in branch:
-                branches_found.add('airforce')
-            elif 'marine' in branch:
-                branches_found.add('marines')
-            elif 'coast guard' in branch:
-                branches_found.add('coastguard')
-
-        for b in sorted(branches_found):
+        for b in sorted(branch for branch in branches_found if branch):
             if b == 'army':
                 hashtags.extend(['#Army', '#USArmy'])
             elif b == 'navy':
@@ -628,11 +905,16 @@ class FacebookMultiPoster:
         lines.append(" ".join(hashtags))
         lines.append("")
         lines.append('🇺🇸 "All gave some, some gave all" 🇺🇸')
-
-        return "\n".join(lines)
+        return lines
     
-    def create_post_with_multiple_images(self, post_text, photo_ids):
-        """Create the final post with multiple attached images"""
+    @metrics.timed('publish')
+    def create_post_with_multiple_images(self, post_text, photo_ids, scheduled_time=None):
+        """
+        Create the final post with multiple attached images.
+
+        With scheduled_time (unix timestamp) the post is created unpublished
+        and scheduled to go live then. Returns the post ID, or None on failure.
+        """
         url = f"{self.base_url}/{self.page_id}/feed"
         
         # Prepare attached media
@@ -646,29 +928,217 @@ class FacebookMultiPoster:
             'published': 'true',
             **attached_media
         }
+        if scheduled_time:
+            data['published'] = 'false'
+            data['scheduled_publish_time'] = str(scheduled_time)
 
         try:
-            response = requests.post(url, data=data)
+            response = transport.post(url, data=data)
             
             if response.status_code == 200:
                 result = response.json()
                 post_id = result.get('id')
-                print(f"✅ Multi-hero post created successfully! Post ID: {post_id}")
-                return True
+                if scheduled_time:
+                    print(f"✅ Multi-hero post scheduled for {scheduling.format_slot(scheduled_time)}! Post ID: {post_id}")
+                else:
+                    print(f"✅ Multi-hero post created successfully! Post ID: {post_id}")
+                return post_id
             else:
                 print(f"❌ Post creation failed: {response.text}")
-                return False
+                return None
                 
         except Exception as e:
             print(f"❌ Error creating post: {str(e)}")
+            return None
+
+BUNDLE_SCRIPT = 'service-all'
+
+def lines_length(lines):
+    """Length of lines once joined with newlines, plus one for the newline that follows them"""
+    return sum(len(line) + 1 for line in lines)
+
+def build_day_posts(scraper, image_processor, poster, date):
+    """
+    Run the full scrape -> images -> text pipeline for one date.
+
+    Returns (heroes, image_data, shards); shards is empty when no heroes or
+    images were found.
+    """
+    print(f"\n🔍 Finding ALL heroes who died on {date.strftime('%B %d')} (any year)")
+
+    heroes = scraper.get_all_heroes_for_date(date)
+
+    if not heroes:
+        print(f"ℹ️ No fallen heroes found for {date.strftime('%B %d')}")
+        return heroes, [], []
+
+    print(f"\n✅ Found {len(heroes)} total heroes for {date.strftime('%B %d')}")
+
+    # Process all hero images
+    print(f"\n📸 Processing images for all {len(heroes)} heroes...")
+    image_data = image_processor.process_all_hero_images(heroes)
+
+    if not image_data:
+        print("❌ No images processed successfully")
+        return heroes, image_data, []
+
+    print(f"✅ Processed {len(image_data)} images")
+
+    if RENDER_MODE == 'collage':
+        collages = image_processor.create_collages(image_data)
+        if collages:
+            print(f"✅ Combined {len(image_data)} images into {len(collages)} collage(s)")
+            image_data = collages
+        else:
+            print("⚠️ Collage rendering failed; falling back to individual images")
+
+    shards = poster.plan_post_shards(heroes, image_data, date)
+    if len(shards) > 1:
+        print(f"📦 Splitting {len(heroes)} heroes into {len(shards)} posts "
+              f"(max {MAX_PHOTOS_PER_POST} photos / {MAX_MESSAGE_CHARS} chars each)")
+    return heroes, image_data, shards
+
+def precompute(days, start=None):
+    """
+    Build ready-to-publish bundles for the next `days` dates.
+
+    The scheduled run then only has to upload; see fallen/bundles.py.
+    """
+    print(f"🗓️ Precomputing {days} day(s) of multi-hero posts")
+
+    scraper = MilitaryTimesScraper()
+    poster = FacebookMultiPoster(os.getenv('FB_ACCESS_TOKEN'), os.getenv('FB_PAGE_ID'), exchange_token=False)
+
+    bundles.prune_bundles(BUNDLE_SCRIPT)
+
+    # Upcoming days yield to requests for a post going out now (fallen/priority.py)
+    with priority.level(priority.PREFETCH):
+        for date in bundles.upcoming_dates(days, start):
+            print(f"\n{'=' * 60}\n📅 {date.strftime('%Y-%m-%d')}")
+            precompute_day(scraper, poster, date)
+
+def precompute_day(scraper, poster, date):
+    """Build and save the bundle for one date. Returns False if it could not be built."""
+    if bundles.scheduled_post_ids(BUNDLE_SCRIPT, date):
+        print(f"🗓️ {date.strftime('%Y-%m-%d')} is already scheduled; keeping its bundle")
+        return True
+    path = bundles.prepare_bundle_dir(BUNDLE_SCRIPT, date)
+    image_processor = ImageProcessor(download_dir=path)
+
+    heroes, image_data, shards = build_day_posts(scraper, image_processor, poster, date)
+    if not scraper.search_complete:
+        # An empty or partial day would otherwise be published as if it were the whole day
+        print(f"⚠️ Skipping bundle for {date.strftime('%Y-%m-%d')}; some searches failed, it will be built live")
+        return False
+    if heroes and not shards:
+        print(f"⚠️ Skipping bundle for {date.strftime('%Y-%m-%d')}; it will be built live")
+        return False
+
+    posts = [{
+        'text': shard['text'],
+        'images': [{'file': os.path.basename(img['filepath']), 'caption': img['caption']}
+                   for img in shard['image_data']]
+    } for shard in shards]
+    files = [img['filepath'] for shard in shards for img in shard['image_data']]
+    bundles.save_bundle(BUNDLE_SCRIPT, date, {'heroes': heroes, 'posts': posts}, files)
+    return True
+
+def schedule(poster, days, start=None):
+    """
+    Build posts for a range of dates and submit them as scheduled posts.
+
+    Uses (or creates) each date's bundle, schedules its post(s) at the
+    date's publish slot and verifies them. Returns the dates that failed.
+    """
+    dates = bundles.upcoming_dates(days, start)
+    print(f"🗓️ Scheduling multi-hero posts for {len(dates)} day(s) at {scheduling.PUBLISH_TIME_UTC} UTC")
+
+    scraper = MilitaryTimesScraper()
+
+    def schedule_day(date):
+        slot = scheduling.publish_slot(date)
+        problem = scheduling.check_slot(slot)
+        if problem:
+            print(f"❌ Cannot schedule {date.strftime('%Y-%m-%d')}: publish time is {problem}")
             return False
 
+        heroes, shards = load_day_posts(date)
+        if heroes is None:
+            if not precompute_day(scraper, poster, date):
+                return False
+            heroes, shards = load_day_posts(date)
+
+        if not shards:
+            print(f"ℹ️ Nothing to schedule for {date.strftime('%Y-%m-%d')}")
+            return True
+
+        # Posts already on the page were scheduled by an earlier attempt
+        existing = scheduling.get_scheduled_posts(poster)
+        pending = []
+        for index, shard in enumerate(shards):
+            shard['scheduled_time'] = slot + index * scheduling.SHARD_SPACING_SECONDS
+            shard['post_id'] = scheduling.find_scheduled_post(existing, shard['scheduled_time'], shard['text'])
+            if shard['post_id']:
+                print(f"  ✅ Post {index + 1}/{len(shards)} already scheduled (Post ID: {shard['post_id']})")
+            else:
+                pending.append(shard)
+
+        if not pending:
+            bundles.mark_scheduled(BUNDLE_SCRIPT, date, [shard['post_id'] for shard in shards])
+            return True
+
+        post_ids = poster.publish_shards(pending)
+        for shard, post_id in zip(pending, post_ids):
+            shard['post_id'] = post_id
+        scheduled_ids = [shard['post_id'] for shard in shards if shard.get('post_id')]
+        if scheduled_ids:
+            bundles.mark_scheduled(BUNDLE_SCRIPT, date, scheduled_ids)
+        verified = [
+            post_id is not None and scheduling.verify_scheduled_post(poster, post_id, shard['scheduled_time'],
+                                                                     shard['attached'])
+            for shard, post_id in zip(pending, post_ids)
+        ]
+        return all(verified)
+
+    return scheduling.schedule_days(dates, schedule_day)
+
+def load_day_posts(date):
+    """Load planned posts for a date from a precomputed bundle, if one is usable"""
+    payload, path = bundles.load_bundle(BUNDLE_SCRIPT, date)
+    if payload is None:
+        return None, None
+
+    shards = [{
+        'text': post['text'],
+        'image_data': [{'filepath': os.path.join(path, img['file']), 'caption': img['caption']}
+                       for img in post['images']]
+    } for post in payload['posts']]
+    return [records.HeroRecord.from_dict(hero) for hero in payload['heroes']], shards
+
 def main():
     """
     Main function: Create a comprehensive daily heroes post
     """
+    parser = argparse.ArgumentParser(description="Post all fallen heroes for today in one memorial post")
+    parser.add_argument('--precompute', type=int, metavar='DAYS',
+                        help="prepare bundles for the next DAYS dates instead of posting")
+    parser.add_argument('--schedule', type=int, metavar='DAYS',
+                        help="schedule posts for the next DAYS dates via scheduled_publish_time")
+    parser.add_argument('--start', type=lambda v: datetime.strptime(v, '%Y-%m-%d'),
+                        help="first date to precompute or schedule (YYYY-MM-DD, default tomorrow)")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile each stage with cProfile and tracemalloc (written to reports/)")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable()
+
     print("🇺🇸 Starting Daily Heroes Multi-Post Script 🇺🇸")
     print(f"Timestamp: {datetime.now()}")
+
+    if args.precompute:
+        precompute(args.precompute, args.start)
+        return
     
     # Get configuration
     access_token = os.getenv('FB_ACCESS_TOKEN')
@@ -679,46 +1149,49 @@ def main():
         return
     
     # Initialize components
-    scraper = MilitaryTimesScraper()
-    image_processor = ImageProcessor()
     poster = FacebookMultiPoster(access_token, page_id)
+
+    if args.schedule:
+        failed = schedule(poster, args.schedule, args.start)
+        return 1 if failed else 0
     
     # Use today's date
-    today = datetime.now()
-    
-    print(f"\n🔍 Finding ALL heroes who died on {today.strftime('%B %d')} (any year)")
-    
-    # Get all heroes for today's date
-    heroes = scraper.get_all_heroes_for_date(today)
-    
-    if not heroes:
-        print(f"ℹ️ No fallen heroes found for {today.strftime('%B %d')}")
+    today = clock.now()
+
+    # A --schedule run already submitted today's posts; Facebook publishes them
+    scheduled_ids = bundles.scheduled_post_ids(BUNDLE_SCRIPT, today)
+    if scheduled_ids:
+        print(f"🗓️ Today's posts were scheduled in advance (Post ID(s): {', '.join(scheduled_ids)}); not publishing again")
         return
-    
-    print(f"\n✅ Found {len(heroes)} total heroes for {today.strftime('%B %d')}")
-    
-    # Process all hero images
-    print(f"\n📸 Processing images for all {len(heroes)} heroes...")
-    image_data = image_processor.process_all_hero_images(heroes)
-    
-    if not image_data:
-        print("❌ No images processed successfully")
+
+    # Publish from a precomputed bundle when available; scrape live otherwise
+    heroes, shards = load_day_posts(today)
+    if heroes is None:
+        scraper = MilitaryTimesScraper()
+        image_processor = ImageProcessor()
+        heroes, image_data, shards = build_day_posts(scraper, image_processor, poster, today)
+
+    if not shards:
         return
-    
-    print(f"✅ Processed {len(image_data)} images")
+
+    image_count = sum(len(shard['image_data']) for shard in shards)
+    print(f"\n📝 Publishing {len(shards)} post(s) for {len(heroes)} heroes...")
     
     # Create comprehensive Facebook post
-    success = poster.create_multi_hero_post(heroes, image_data, today)
+    success = all(poster.publish_shards(shards))
     
     if success:
         print(f"\n🎯 SUCCESS!")
         print(f"✅ Comprehensive memorial post created for {len(heroes)} heroes")
         print(f"📅 Date: {today.strftime('%B %d')}")
         print(f"👥 Heroes honored: {len(heroes)}")
-        print(f"📸 Images included: {len(image_data)}")
+        print(f"📸 Images included: {image_count}")
         print(f"🇺🇸 All heroes honored and remembered 🇺🇸")
     else:
         print(f"\n❌ Failed to create comprehensive memorial post")
 
 if __name__ == "__main__":
-    main()
+    metrics.start('service-all-fb')
+    snapshot.restore_at_startup()
+    with parse_pool.start():  # PARSE_WORKERS processes parse the pages, if set
+        exit(metrics.finish(main()))
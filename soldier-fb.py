@@ -1,22 +1,33 @@
 #!/usr/bin/env python3
 
-import requests
 import json
 import time
 import os
 import random
 from datetime import datetime, timedelta
-from PIL import Image, ImageDraw, ImageFont
 import io
-from bs4 import BeautifulSoup
 import re
 import urllib.parse
+import argparse
+from fallen import bundles, clock, endpoints, lazy, metrics, parse_pool
+from fallen import priority, profiling, records, roster, search_cursor
+from fallen import shared_rate, singleflight, snapshot, throttle, tracing
+
+# Heavy dependencies load on first use (see fallen/lazy.py)
+Image = lazy.module('PIL.Image')
+ImageDraw = lazy.module('PIL.ImageDraw')
+ImageFont = lazy.module('PIL.ImageFont')
+bs4 = lazy.module('bs4')
+# requests and the fallen modules built on it load with the first HTTP call
+requests = lazy.module('requests')
+month_buckets = lazy.module('fallen.month_buckets')
+scheduling = lazy.module('fallen.scheduling')
+transport = lazy.module('fallen.transport')
 
 class MilitaryTimesScraper:
     def __init__(self):
-        self.base_url = "https://thefallen.militarytimes.com"
-        self.use_proxy = os.getenv('USE_PROXY', 'false').lower() == 'true'
-        self.proxy = os.getenv('PROXY_URL') if self.use_proxy else None
+        self.base_url = endpoints.MILITARY_TIMES_URL
+        self.search_complete = False  # Whether the last date searched had every year answer cleanly
         self.session = requests.Session()
         
         # Use a more recent Chrome user agent
@@ -38,12 +49,13 @@ class MilitaryTimesScraper:
         # Configure session with connection pooling and timeouts
         adapter = requests.adapters.HTTPAdapter(
             pool_connections=1,
-            pool_maxsize=1,
+            pool_maxsize=throttle.THROTTLE_MAX,  # One connection per concurrent search
             max_retries=3,
             pool_block=False
         )
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
+        transport.wrap_session(self.session)
 
         # Precompile regex patterns used during extraction (avoids recompiling on every call).
         # Multi-word / more-specific ranks listed first so they match before their substrings.
@@ -133,56 +145,56 @@ class MilitaryTimesScraper:
             print(f"❌ Connection test failed: {str(e)}")
             return False
     
+    @tracing.traced()
     def get_single_hero_for_date(self, target_date):
         """
         Find a RANDOM fallen hero for the given date efficiently.
         Only downloads the photo of the selected hero, not all heroes.
+
+        Returns None when there is no hero. self.search_complete then tells
+        a date with no heroes (every year searched cleanly) apart from
+        one whose searches failed or were blocked.
         """
+        self.search_complete = False
         if not self.test_connection():
             print("❌ Cannot connect to Military Times. Aborting.")
             return None
         
         print(f"🔍 Searching for heroes who died on {target_date.strftime('%B %d')} (any year)")
         
-        # Collect basic info (names, links) from ALL years first - NO image downloads yet
-        all_hero_refs = []  # Just references, not full data
-        current_year = datetime.now().year
+        # Count the heroes in ALL years first - NO image downloads yet
+        current_year = clock.now().year
         
         # Search all years from 2003 to current year
         years = list(range(2003, current_year + 1))
         random.shuffle(years)  # Randomize the order we search years
         
-        for year in years:
-            year_date = target_date.replace(year=year)
-            print(f"📅 Checking {year_date.strftime('%B %d, %Y')}")
-            
-            try:
-                # Get basic hero info WITHOUT downloading images
-                fallen_list = self.get_fallen_service_members_basic(year_date)
-                
-                if fallen_list:
-                    # Add all hero references from this year to our collection
-                    for fallen in fallen_list:
-                        fallen['year'] = year  # Add year info
-                        all_hero_refs.append(fallen)
-                    print(f"  ✅ Found {len(fallen_list)} hero(s) for {year}")
-                
-            except Exception as e:
-                print(f"  ⚠️ Error searching year {year}: {str(e)}")
-                continue
-            
-            # Rate limit between year searches
-            time.sleep(1)
+        # Search the years concurrently; fallen.throttle sets the pace. Each
+        # cursor holds its first page, whose header gives the year's total.
+        cursors = throttle.gather(lambda year: self.search_year(target_date, year), years)
+        counts = []
+        for year, cursor in zip(years, cursors):
+            count = cursor.count()
+            if count:
+                print(f"  ✅ Found {count} hero(s) for {year}")
+            counts.append(count)
         
-        if not all_hero_refs:
-            print("ℹ️ No fallen heroes found for this date across all years")
+        if not sum(counts):
+            self.search_complete = all(cursor.complete for cursor in cursors)
+            if self.search_complete:
+                print("ℹ️ No fallen heroes found for this date across all years")
+            else:
+                print("⚠️ No fallen heroes found, but some years could not be searched")
             return None
         
-        print(f"\n🎲 Found {len(all_hero_refs)} total heroes across all years. Selecting one randomly...")
+        print(f"\n🎲 Found {sum(counts)} total heroes across all years. Selecting one randomly...")
         
-        # Pick a completely random hero from all years
-        selected_fallen = random.choice(all_hero_refs)
-        selected_year = selected_fallen.get('year', 'Unknown')
+        # Pick a completely random hero from all years; only the result page holding it is fetched
+        selected_fallen, selected_year = self.pick_hero(years, cursors, counts)
+        if not selected_fallen:
+            print("ℹ️ No fallen heroes found for this date across all years")
+            return None
+        selected_fallen['year'] = selected_year
         
         print(f"🎯 Randomly selected: {selected_fallen.get('name', 'Unknown')} from {selected_year}")
         print(f"📸 Will download ONLY this hero's photo (not all heroes)")
@@ -193,96 +205,140 @@ class MilitaryTimesScraper:
         # Scrape additional details if profile link is available
         if selected_fallen.get('link'):
             print(f"🔍 Getting additional details for {selected_fallen.get('name', 'Unknown')}")
-            time.sleep(2)  # Rate limit before profile scraping
+            shared_rate.courtesy_sleep(2)  # Rate limit before profile scraping
             additional_data = self.scrape_hero_profile(selected_fallen['link'])
             if additional_data:
                 hero_data.update(additional_data)
+                roster.record(hero_data)
         
         return hero_data
     
+    def pick_hero(self, years, cursors, counts):
+        """A uniformly random (hero, year) given each year's cursor and hero count"""
+        pick = random.randrange(sum(counts))
+        for year, cursor, count in zip(years, cursors, counts):
+            if pick < count:
+                hero = cursor.nth(pick)
+                if hero is not None:
+                    return hero, year
+                break
+            pick -= count
+        
+        # A header total counted entries the parser skipped; choose among the parsed ones
+        refs = [(fallen, year) for year, cursor in zip(years, cursors) for fallen in cursor]
+        return random.choice(refs) if refs else (None, None)
+    
+    def search_year(self, target_date, year):
+        """Cursor over basic hero info for target_date in one year (empty on errors)"""
+        year_date = target_date.replace(year=year)
+        print(f"📅 Checking {year_date.strftime('%B %d, %Y')}")
+        try:
+            # Get basic hero info WITHOUT downloading images
+            return self.basic_search(year_date)
+        except Exception as e:
+            print(f"  ⚠️ Error searching year {year}: {str(e)}")
+            return search_cursor.SearchCursor.failed()
+    
     def get_fallen_service_members_basic(self, date):
         """
         Get basic hero info (name, link) WITHOUT trying to get images from search results.
         Images will be obtained later from individual profile pages.
         """
-        base_url = "https://thefallen.militarytimes.com/search"
+        return self.basic_search(date).fetch_all()
+    
+    @metrics.timed('search')
+    def basic_search(self, date):
+        """
+        Cursor over the basic hero info for a date. Only the first result
+        page is fetched here; later pages are fetched as the cursor is read.
+        """
+        failed = search_cursor.SearchCursor.failed()
+        
+        # With MONTH_PREFETCH the date's month bucket answers without a search of its own
+        bucketed = month_buckets.search(date, self.parse_basic_results, self.session.get)
+        if bucketed is not None:
+            return search_cursor.SearchCursor.from_entries(bucketed)
+
+        base_url = f"{endpoints.MILITARY_TIMES_URL}/search"
         formatted_date = date.strftime("%m%%2F%d%%2F%Y")
         query_url = f"{base_url}?year=&year_month=&first_name=&last_name=&start_date={formatted_date}&end_date={formatted_date}&conflict=&home_state=&home_town="
         
-        proxies = {"http": self.proxy, "https": self.proxy} if self.use_proxy and self.proxy else None
-        
         try:
-            response = self.session.get(query_url, proxies=proxies, timeout=30)
+            response = self.session.get(query_url, timeout=30)
             
             if response.status_code != 200:
                 print(f"❌ HTTP Error {response.status_code}")
-                return []
+                return failed
                 
             if "Access Denied" in response.text or "Captcha" in response.text:
                 print(f"❌ Access blocked or CAPTCHA detected")
-                return []
+                return failed
             
             if "cloudflare" in response.text.lower() or "security check" in response.text.lower():
                 print(f"❌ Cloudflare or security check detected")
-                return []
+                return failed
             
         except requests.exceptions.ConnectionError as e:
             print(f"❌ Connection error: {str(e)}")
-            return []
+            return failed
         except requests.exceptions.Timeout as e:
             print(f"❌ Request timeout: {str(e)}")
-            return []
+            return failed
         except requests.RequestException as e:
             print(f"❌ Request error: {str(e)}")
-            return []
+            return failed
             
         try:
-            soup = BeautifulSoup(response.text, "html.parser")
-            fallen_list = []
-            entries = soup.select(".data-box")
-            
-            for entry in entries:
-                try:
-                    name_tag = entry.select_one(".data-box-right h3 a")
-                    name = name_tag.text.strip() if name_tag else "Unknown"
-                    
-                    date_tag = entry.select_one(".data-box-right .blue-bold")
-                    date_of_death = date_tag.text.strip() if date_tag else "Unknown Date"
-                    
-                    profile_link = name_tag["href"] if name_tag and "href" in name_tag.attrs else ""
-                    if profile_link:
-                        profile_link = profile_link.rstrip(':').rstrip()
-                        if profile_link.startswith('/'):
-                            profile_link = f"https://thefallen.militarytimes.com{profile_link}"
-                    
-                    if name and name != "Unknown" and profile_link:
-                        fallen_list.append({
-                            "name": name,
-                            "date": date_of_death,
-                            "link": profile_link,
-                            "image_url": None  # Will be obtained from profile page
-                        })
-                    
-                except Exception as e:
-                    continue
-                    
+            return search_cursor.SearchCursor(query_url, self.session.get, self.parse_basic_results,
+                                              first_page=response.text)
         except Exception as e:
             print(f"❌ Error parsing HTML: {str(e)}")
-            return []
-            
+            return failed
+    
+    @parse_pool.offload('soldier-fb', 'MilitaryTimesScraper')
+    def parse_basic_results(self, html):
+        """Basic hero info (name, link) for every entry on a search results page"""
+        soup = bs4.BeautifulSoup(html, "html.parser")
+        fallen_list = []
+        entries = soup.select(".data-box")
+        
+        for entry in entries:
+            try:
+                name_tag = entry.select_one(".data-box-right h3 a")
+                name = name_tag.text.strip() if name_tag else "Unknown"
+                
+                date_tag = entry.select_one(".data-box-right .blue-bold")
+                date_of_death = date_tag.text.strip() if date_tag else "Unknown Date"
+                
+                profile_link = name_tag["href"] if name_tag and "href" in name_tag.attrs else ""
+                if profile_link:
+                    profile_link = profile_link.rstrip(':').rstrip()
+                    if profile_link.startswith('/'):
+                        profile_link = f"{endpoints.MILITARY_TIMES_URL}{profile_link}"
+                
+                if name and name != "Unknown" and profile_link:
+                    fallen_list.append(records.HeroRecord(
+                        name=name,
+                        date=date_of_death,
+                        link=profile_link,
+                        image_url=None  # Will be obtained from profile page
+                    ))
+                
+            except Exception as e:
+                continue
+                
         return fallen_list
     
+    @metrics.timed('search')
     def get_fallen_service_members(self, date):
         """Query fallen service members for a specific date using the proven method with better error handling"""
-        base_url = "https://thefallen.militarytimes.com/search"
+        base_url = f"{endpoints.MILITARY_TIMES_URL}/search"
         formatted_date = date.strftime("%m%%2F%d%%2F%Y")
         query_url = f"{base_url}?year=&year_month=&first_name=&last_name=&start_date={formatted_date}&end_date={formatted_date}&conflict=&home_state=&home_town="
         
-        proxies = {"http": self.proxy, "https": self.proxy} if self.use_proxy and self.proxy else None
-        
         try:
             print(f"🌐 Requesting: {query_url}")
-            response = self.session.get(query_url, proxies=proxies, timeout=30)
+            response = self.session.get(query_url, timeout=30)
             
             # Check response status and content
             if response.status_code != 200:
@@ -310,61 +366,9 @@ class MilitaryTimesScraper:
             return []
             
         try:
-            soup = BeautifulSoup(response.text, "html.parser")
-            fallen_list = []
-            entries = soup.select(".data-box")
-            
-            print(f"🔍 Found {len(entries)} potential entries")
-            
-            for i, entry in enumerate(entries):
-                try:
-                    name_tag = entry.select_one(".data-box-right h3 a")
-                    name = name_tag.text.strip() if name_tag else "Unknown"
-                    
-                    date_tag = entry.select_one(".data-box-right .blue-bold")
-                    date_of_death = date_tag.text.strip() if date_tag else "Unknown Date"
-                    
-                    profile_link = name_tag["href"] if name_tag and "href" in name_tag.attrs else ""
-                    # Clean up profile link - remove any trailing colons or extra characters
-                    if profile_link:
-                        profile_link = profile_link.rstrip(':').rstrip()
-                        # Make sure profile link is absolute
-                        if profile_link.startswith('/'):
-                            profile_link = f"https://thefallen.militarytimes.com{profile_link}"
-                    
-                    image_tag = entry.select_one(".data-box-left img, .record-image img")
-                    image_url = image_tag["src"] if image_tag and "src" in image_tag.attrs else ""
-                    
-                    # Check for S3 bucket URLs or make sure image URL is absolute
-                    if image_url:
-                        if image_url.startswith("https://s3.amazonaws.com/"):
-                            # S3 URL is already absolute, use as-is
-                            pass
-                        elif image_url.startswith("/"):
-                            image_url = f"https://thefallen.militarytimes.com{image_url}"
-                    
-                    # Also check for record-image div for higher quality S3 images
-                    record_image_div = entry.select_one(".record-image")
-                    if record_image_div and not image_url.startswith("https://s3.amazonaws.com/"):
-                        record_img = record_image_div.select_one("img")
-                        if record_img and record_img.get("src"):
-                            potential_s3_url = record_img["src"]
-                            if potential_s3_url.startswith("https://s3.amazonaws.com/"):
-                                image_url = potential_s3_url  # Prefer S3 URLs for better quality
-                    
-                    if name and name != "Unknown":
-                        fallen_list.append({
-                            "name": name,
-                            "date": date_of_death,
-                            "link": profile_link,
-                            "image_url": image_url
-                        })
-                        print(f"  ✅ Entry {i+1}: {name}")
-                    
-                except Exception as e:
-                    print(f"  ⚠️ Error processing entry {i+1}: {str(e)}")
-                    continue
-                    
+            # Long result lists are paginated; the cursor fetches the rest
+            fallen_list = search_cursor.SearchCursor(query_url, self.session.get, self.parse_search_results,
+                                                     first_page=response.text).fetch_all()
         except Exception as e:
             print(f"❌ Error parsing HTML: {str(e)}")
             return []
@@ -372,22 +376,84 @@ class MilitaryTimesScraper:
         print(f"✅ Successfully parsed {len(fallen_list)} valid service members")
         return fallen_list
     
+    @parse_pool.offload('soldier-fb', 'MilitaryTimesScraper')
+    def parse_search_results(self, html):
+        """Service members (with search-result images) listed on a search results page"""
+        soup = bs4.BeautifulSoup(html, "html.parser")
+        fallen_list = []
+        entries = soup.select(".data-box")
+        
+        print(f"🔍 Found {len(entries)} potential entries")
+        
+        for i, entry in enumerate(entries):
+            try:
+                name_tag = entry.select_one(".data-box-right h3 a")
+                name = name_tag.text.strip() if name_tag else "Unknown"
+                
+                date_tag = entry.select_one(".data-box-right .blue-bold")
+                date_of_death = date_tag.text.strip() if date_tag else "Unknown Date"
+                
+                profile_link = name_tag["href"] if name_tag and "href" in name_tag.attrs else ""
+                # Clean up profile link - remove any trailing colons or extra characters
+                if profile_link:
+                    profile_link = profile_link.rstrip(':').rstrip()
+                    # Make sure profile link is absolute
+                    if profile_link.startswith('/'):
+                        profile_link = f"{endpoints.MILITARY_TIMES_URL}{profile_link}"
+                
+                image_tag = entry.select_one(".data-box-left img, .record-image img")
+                image_url = image_tag["src"] if image_tag and "src" in image_tag.attrs else ""
+                
+                # Check for S3 bucket URLs or make sure image URL is absolute
+                if image_url:
+                    if image_url.startswith(endpoints.S3_URL):
+                        # S3 URL is already absolute, use as-is
+                        pass
+                    elif image_url.startswith("/"):
+                        image_url = f"{endpoints.MILITARY_TIMES_URL}{image_url}"
+                
+                # Also check for record-image div for higher quality S3 images
+                record_image_div = entry.select_one(".record-image")
+                if record_image_div and not image_url.startswith(endpoints.S3_URL):
+                    record_img = record_image_div.select_one("img")
+                    if record_img and record_img.get("src"):
+                        potential_s3_url = record_img["src"]
+                        if potential_s3_url.startswith(endpoints.S3_URL):
+                            image_url = potential_s3_url  # Prefer S3 URLs for better quality
+                
+                if name and name != "Unknown":
+                    fallen_list.append(records.HeroRecord(
+                        name=name,
+                        date=date_of_death,
+                        link=profile_link,
+                        image_url=image_url
+                    ))
+                    print(f"  ✅ Entry {i+1}: {name}")
+                
+            except Exception as e:
+                print(f"  ⚠️ Error processing entry {i+1}: {str(e)}")
+                continue
+        
+        return fallen_list
+    
     def convert_to_hero_data(self, fallen):
         """Convert the fallen service member data to our hero data format"""
-        return {
-            'name': fallen.get('name', 'Unknown Hero'),
-            'date_of_death': fallen.get('date', ''),
-            'profile_url': fallen.get('link', ''),
-            'image_url': fallen.get('image_url', ''),
-            'rank': '',  # Will be filled by profile scraping
-            'age': '',
-            'hometown': '',
-            'branch': '',
-            'unit': '',
-            'location': '',
-            'circumstances': ''
-        }
+        return records.HeroRecord(
+            name=fallen.get('name', 'Unknown Hero'),
+            date_of_death=fallen.get('date', ''),
+            profile_url=fallen.get('link', ''),
+            image_url=fallen.get('image_url', ''),
+            rank='',  # Will be filled by profile scraping
+            age='',
+            hometown='',
+            branch='',
+            unit='',
+            location='',
+            circumstances=''
+        )
     
+    @singleflight.coalesce('profile', method=True)
+    @metrics.timed('profile')
     def scrape_hero_profile(self, profile_url):
         """
         Scrape detailed information from a hero's profile page.
@@ -399,27 +465,28 @@ class MilitaryTimesScraper:
             if response.status_code != 200:
                 print(f"⚠️ Profile page returned HTTP {response.status_code}")
                 return None
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            text = soup.get_text()  # Extract once, reused by all extract_* methods
-
-            # Extract hero information
-            hero_data = {
-                'rank': self.extract_rank(text),
-                'age': self.extract_age(text),
-                'hometown': self.extract_hometown(text),
-                'branch': self.extract_branch(text),
-                'unit': self.extract_unit(text),
-                'location': self.extract_location(text),
-                'circumstances': self.extract_circumstances(text),
-                'image_url': self.extract_s3_image_url(soup)  # soup needed for CSS selectors
-            }
-            
-            return hero_data
+            return self.parse_profile_page(response.content)
             
         except Exception as e:
             print(f"❌ Error scraping profile {profile_url}: {str(e)}")
             return None
+
+    @parse_pool.offload('soldier-fb', 'MilitaryTimesScraper')
+    def parse_profile_page(self, content):
+        """Hero information from a profile page (the response's raw bytes)"""
+        soup = bs4.BeautifulSoup(content, 'html.parser')
+        text = soup.get_text()  # Extract once, reused by all extract_* methods
+
+        return {
+            'rank': self.extract_rank(text),
+            'age': self.extract_age(text),
+            'hometown': self.extract_hometown(text),
+            'branch': self.extract_branch(text),
+            'unit': self.extract_unit(text),
+            'location': self.extract_location(text),
+            'circumstances': self.extract_circumstances(text),
+            'image_url': self.extract_s3_image_url(soup)  # soup needed for CSS selectors
+        }
     
     def extract_s3_image_url(self, soup):
         """
@@ -436,7 +503,7 @@ class MilitaryTimesScraper:
                 img_tag = record_image_div.select_one("img")
                 if img_tag and img_tag.get("src"):
                     src = img_tag.get("src")
-                    if src.startswith("https://s3.amazonaws.com/static.militarytimes.com/thefallen/"):
+                    if src.startswith(endpoints.S3_FALLEN_PREFIX):
                         print(f"✅ Found S3 image in content-div > record-image: {src}")
                         return src
                     else:
@@ -448,7 +515,7 @@ class MilitaryTimesScraper:
             img_tag = record_image_div.select_one("img")
             if img_tag and img_tag.get("src"):
                 src = img_tag.get("src")
-                if src.startswith("https://s3.amazonaws.com/static.militarytimes.com/thefallen/"):
+                if src.startswith(endpoints.S3_FALLEN_PREFIX):
                     print(f"✅ Found S3 image in record-image (fallback): {src}")
                     return src
                 else:
@@ -458,7 +525,7 @@ class MilitaryTimesScraper:
         all_images = soup.find_all('img')
         for img in all_images:
             src = img.get('src', '')
-            if src.startswith("https://s3.amazonaws.com/static.militarytimes.com/thefallen/"):
+            if src.startswith(endpoints.S3_FALLEN_PREFIX):
                 print(f"✅ Found S3 thefallen image in document: {src}")
                 return src
         
@@ -576,7 +643,9 @@ class ImageDownloader:
         adapter = requests.adapters.HTTPAdapter(max_retries=3)
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
+        transport.wrap_session(self.session)
 
+    @metrics.timed('download')
     def download_hero_image(self, hero_data):
         """
         Download hero's image with S3 URL validation and placeholder fallback.
@@ -591,12 +660,12 @@ class ImageDownloader:
         filepath = os.path.join(self.download_dir, filename)
         
         # Check if we have a valid S3 image URL
-        if image_url and image_url.startswith("https://s3.amazonaws.com/"):
+        if image_url and image_url.startswith(endpoints.S3_URL):
             print(f"📥 Downloading S3 image from: {image_url}")
             
             try:
                 # Add delay before downloading image
-                time.sleep(3)
+                shared_rate.courtesy_sleep(3)
                 
                 response = self.session.get(image_url, stream=True, timeout=30)
                 
@@ -627,6 +696,7 @@ class ImageDownloader:
         print(f"📷 No S3 image available for {name}. Creating placeholder...")
         return self.create_placeholder_image(name, filepath)
     
+    @metrics.timed('render')
     def create_placeholder_image(self, hero_name, filepath):
         """
         Create a placeholder image for heroes without photos.
@@ -683,6 +753,7 @@ class ImageDownloader:
             
             # Save the placeholder image
             img.save(filepath, 'JPEG', quality=90)
+            metrics.image_encoded('placeholder', os.path.getsize(filepath))
             
             filename = os.path.basename(filepath)
             print(f"✅ Created placeholder image: {filename}")
@@ -692,6 +763,7 @@ class ImageDownloader:
             print(f"❌ Error creating placeholder image: {str(e)}")
             return None
     
+    @metrics.timed('render')
     def optimize_image(self, filepath):
         """
         Optimize image for Facebook posting (resize, format, etc.)
@@ -707,16 +779,19 @@ class ImageDownloader:
                 
                 # Save optimized image
                 img.save(filepath, 'JPEG', quality=90, optimize=True)
+                metrics.image_encoded('photo', os.path.getsize(filepath))
                 
         except Exception as e:
             print(f"⚠️ Could not optimize image {filepath}: {str(e)}")
 
 class FacebookPoster:
-    def __init__(self, access_token, page_id):
+    def __init__(self, access_token, page_id, exchange_token=True):
         self.access_token = access_token
         self.page_id = page_id
-        self.base_url = "https://graph.facebook.com/v18.0"
-        self._ensure_page_token()
+        self.base_url = endpoints.GRAPH_API_URL
+        # Precompute runs only build post text, so they skip the Graph round trip
+        if exchange_token:
+            self._ensure_page_token()
 
     def _ensure_page_token(self):
         """Exchange a User Access Token for a Page Access Token if needed.
@@ -727,7 +802,7 @@ class FacebookPoster:
         """
         url = f"{self.base_url}/{self.page_id}"
         try:
-            resp = requests.get(
+            resp = transport.get(
                 url,
                 params={'fields': 'access_token', 'access_token': self.access_token},
                 timeout=15
@@ -744,8 +819,9 @@ class FacebookPoster:
         except Exception as e:
             print(f"⚠️  Token exchange error: {e}; using original token")
 
-    def upload_image_unpublished(self, image_path):
-        """Upload image to Facebook without publishing it."""
+    @metrics.timed('upload')
+    def upload_image_unpublished(self, image_path, temporary=False):
+        """Upload image to Facebook without publishing it (temporary: for a scheduled post)."""
         url = f"{self.base_url}/{self.page_id}/photos"
         
         try:
@@ -755,8 +831,10 @@ class FacebookPoster:
                     'access_token': self.access_token,
                     'published': 'false'
                 }
+                if temporary:
+                    data['temporary'] = 'true'  # Kept until the scheduled post goes live
 
-                response = requests.post(url, files=files, data=data)
+                response = transport.post(url, files=files, data=data)
 
                 if response.status_code == 200:
                     result = response.json()
@@ -835,18 +913,25 @@ class FacebookPoster:
 
         return "\n".join(lines)
     
-    def post_text_with_image(self, hero_data, image_path):
-        """Create a Facebook text post with embedded image."""
+    @metrics.timed('publish')
+    def post_text_with_image(self, hero_data, image_path, memorial_text=None, scheduled_time=None):
+        """Create a Facebook text post with embedded image.
+
+        memorial_text may be passed in from a precomputed bundle; otherwise it
+        is built from hero_data. With scheduled_time (unix timestamp) the post
+        is scheduled instead of published now. Returns the post ID, or None.
+        """
         print(f"📝 Creating memorial post for {hero_data.get('name', 'Unknown Hero')}")
         
         # Upload image without publishing
-        photo_id = self.upload_image_unpublished(image_path)
+        photo_id = self.upload_image_unpublished(image_path, temporary=bool(scheduled_time))
         if not photo_id:
-            return False
+            return None
         
         # Create text post with attached image
         url = f"{self.base_url}/{self.page_id}/feed"
-        memorial_text = self.create_memorial_text(hero_data)
+        if memorial_text is None:
+            memorial_text = self.create_memorial_text(hero_data)
         
         data = {
             'access_token': self.access_token,
@@ -854,30 +939,152 @@ class FacebookPoster:
             'attached_media[0]': json.dumps({'media_fbid': photo_id}),
             'published': 'true'
         }
+        if scheduled_time:
+            data['published'] = 'false'
+            data['scheduled_publish_time'] = str(scheduled_time)
 
         try:
-            response = requests.post(url, data=data)
+            response = transport.post(url, data=data)
             
             if response.status_code == 200:
                 result = response.json()
                 post_id = result.get('id')
-                print(f"✅ Memorial post created! Post ID: {post_id}")
-                return True
+                if scheduled_time:
+                    print(f"✅ Memorial post scheduled for {scheduling.format_slot(scheduled_time)}! Post ID: {post_id}")
+                else:
+                    print(f"✅ Memorial post created! Post ID: {post_id}")
+                return post_id
             else:
                 print(f"❌ Post creation failed: {response.text}")
-                return False
+                return None
                 
         except Exception as e:
             print(f"❌ Error creating post: {str(e)}")
+            return None
+
+BUNDLE_SCRIPT = 'soldier'
+
+def precompute(days, start=None):
+    """
+    Select, download and caption one hero for each of the next `days` dates.
+
+    The scheduled run then only has to upload; see fallen/bundles.py.
+    """
+    print(f"🗓️ Precomputing {days} day(s) of single-hero posts")
+
+    scraper = MilitaryTimesScraper()
+    poster = FacebookPoster(os.getenv('FB_ACCESS_TOKEN'), os.getenv('FB_PAGE_ID'), exchange_token=False)
+
+    bundles.prune_bundles(BUNDLE_SCRIPT)
+
+    # Upcoming days yield to requests for a post going out now (fallen/priority.py)
+    with priority.level(priority.PREFETCH):
+        for date in bundles.upcoming_dates(days, start):
+            print(f"\n{'=' * 60}\n📅 {date.strftime('%Y-%m-%d')}")
+            precompute_day(scraper, poster, date)
+
+def precompute_day(scraper, poster, date):
+    """Build and save the bundle for one date. Returns False if it could not be built."""
+    if bundles.scheduled_post_ids(BUNDLE_SCRIPT, date):
+        print(f"🗓️ {date.strftime('%Y-%m-%d')} is already scheduled; keeping its bundle")
+        return True
+    path = bundles.prepare_bundle_dir(BUNDLE_SCRIPT, date)
+    downloader = ImageDownloader(download_dir=path)
+
+    hero = scraper.get_single_hero_for_date(date)
+    if not hero and not scraper.search_complete:
+        print(f"⚠️ Skipping bundle for {date.strftime('%Y-%m-%d')}; searches failed, it will be built live")
+        return False
+    if not hero:
+        # An empty bundle lets the publish run skip scraping entirely
+        bundles.save_bundle(BUNDLE_SCRIPT, date, {'hero': None}, [])
+        return True
+
+    image_filename = downloader.download_hero_image(hero)
+    if not image_filename:
+        print(f"⚠️ Skipping bundle for {date.strftime('%Y-%m-%d')}; it will be built live")
+        return False
+
+    payload = {
+        'hero': hero,
+        'text': poster.create_memorial_text(hero),
+        'image': image_filename
+    }
+    bundles.save_bundle(BUNDLE_SCRIPT, date, payload, [os.path.join(path, image_filename)])
+    return True
+
+def schedule(poster, days, start=None):
+    """
+    Select one hero per date for a range of dates and schedule their posts.
+
+    Uses (or creates) each date's bundle, schedules the post at the date's
+    publish slot and verifies it. Returns the dates that failed.
+    """
+    dates = bundles.upcoming_dates(days, start)
+    print(f"🗓️ Scheduling single-hero posts for {len(dates)} day(s) at {scheduling.PUBLISH_TIME_UTC} UTC")
+
+    scraper = MilitaryTimesScraper()
+
+    def schedule_day(date):
+        slot = scheduling.publish_slot(date)
+        problem = scheduling.check_slot(slot)
+        if problem:
+            print(f"❌ Cannot schedule {date.strftime('%Y-%m-%d')}: publish time is {problem}")
+            return False
+
+        payload, path = bundles.load_bundle(BUNDLE_SCRIPT, date)
+        if payload is None:
+            if not precompute_day(scraper, poster, date):
+                return False
+            payload, path = bundles.load_bundle(BUNDLE_SCRIPT, date)
+
+        hero = records.HeroRecord.from_dict(payload['hero']) if payload['hero'] else None
+        if not hero:
+            print(f"ℹ️ Nothing to schedule for {date.strftime('%Y-%m-%d')}")
+            return True
+
+        # A matching post already on the page was scheduled by an earlier attempt
+        existing = scheduling.get_scheduled_posts(poster)
+        post_id = scheduling.find_scheduled_post(existing, slot, payload['text'])
+        if post_id:
+            print(f"  ✅ Already scheduled (Post ID: {post_id})")
+            bundles.mark_scheduled(BUNDLE_SCRIPT, date, [post_id])
+            return True
+
+        post_id = poster.post_text_with_image(hero, os.path.join(path, payload['image']),
+                                              payload.get('text'), scheduled_time=slot)
+        if post_id is None:
             return False
+        bundles.mark_scheduled(BUNDLE_SCRIPT, date, [post_id])
+        return scheduling.verify_scheduled_post(poster, post_id, slot, media_count=1)
+
+    return scheduling.schedule_days(dates, schedule_day)
 
 def main():
     """
     Main function - now optimized to find and post just ONE hero to avoid server overload
     """
+    parser = argparse.ArgumentParser(description="Post one fallen hero for today")
+    parser.add_argument('--precompute', type=int, metavar='DAYS',
+                        help="prepare bundles for the next DAYS dates instead of posting")
+    parser.add_argument('--schedule', type=int, metavar='DAYS',
+                        help="schedule posts for the next DAYS dates via scheduled_publish_time")
+    parser.add_argument('--start', type=lambda v: datetime.strptime(v, '%Y-%m-%d'),
+                        help="first date to precompute or schedule (YYYY-MM-DD, default tomorrow)")
+    parser.add_argument('--profile', action='store_true',
+                        help="profile each stage with cProfile and tracemalloc (written to reports/)")
+    args = parser.parse_args()
+
+    if args.profile:
+        profiling.enable()
+
     print("🇺🇸 Starting Fallen Heroes Memorial Script 🇺🇸")
     print(f"Search Mode: {os.getenv('SEARCH_MODE', 'daily')}")
     print(f"Timestamp: {datetime.now()}")
+
+    if args.precompute:
+        precompute(args.precompute, args.start)
+        return
     
     # Get configuration
     access_token = os.getenv('FB_ACCESS_TOKEN')
@@ -888,17 +1095,36 @@ def main():
         return
     
     # Initialize components
-    scraper = MilitaryTimesScraper()
-    downloader = ImageDownloader()
     poster = FacebookPoster(access_token, page_id)
+
+    if args.schedule:
+        failed = schedule(poster, args.schedule, args.start)
+        return 1 if failed else 0
     
     # Use today's date
-    today = datetime.now()
-    
-    print(f"🔍 Searching for ONE hero who died on {today.strftime('%B %d')} (any year since 2003)")
-    
-    # Find just one hero to avoid overloading servers
-    hero = scraper.get_single_hero_for_date(today)
+    today = clock.now()
+
+    # A --schedule run already submitted today's post; Facebook publishes it
+    scheduled_ids = bundles.scheduled_post_ids(BUNDLE_SCRIPT, today)
+    if scheduled_ids:
+        print(f"🗓️ Today's post was scheduled in advance (Post ID: {', '.join(scheduled_ids)}); not publishing again")
+        return
+
+    # Publish from a precomputed bundle when available; scrape live otherwise
+    payload, bundle_path = bundles.load_bundle(BUNDLE_SCRIPT, today)
+    if payload is not None:
+        hero = records.HeroRecord.from_dict(payload['hero']) if payload['hero'] else None
+        memorial_text = payload.get('text')
+        image_path = os.path.join(bundle_path, payload['image']) if hero else None
+    else:
+        memorial_text = None
+        scraper = MilitaryTimesScraper()
+        downloader = ImageDownloader()
+
+        print(f"🔍 Searching for ONE hero who died on {today.strftime('%B %d')} (any year since 2003)")
+        
+        # Find just one hero to avoid overloading servers
+        hero = scraper.get_single_hero_for_date(today)
     
     if not hero:
         print(f"ℹ️ No fallen heroes found for {today.strftime('%B %d')} across all years")
@@ -906,20 +1132,21 @@ def main():
     
     print(f"✅ Selected hero: {hero.get('name', 'Unknown')}")
     print(f"📅 Date of death: {hero.get('date_of_death', 'Unknown')}")
-    
-    # Download hero image
-    print(f"\n--- Processing: {hero.get('name', 'Unknown')} ---")
-    image_filename = downloader.download_hero_image(hero)
-    
-    if not image_filename:
-        print("❌ Failed to download hero image. Cannot create post.")
-        return
-    
-    image_path = os.path.join(downloader.download_dir, image_filename)
+
+    if payload is None:
+        # Download hero image
+        print(f"\n--- Processing: {hero.get('name', 'Unknown')} ---")
+        image_filename = downloader.download_hero_image(hero)
+        
+        if not image_filename:
+            print("❌ Failed to download hero image. Cannot create post.")
+            return
+        
+        image_path = os.path.join(downloader.download_dir, image_filename)
     
     # Post memorial to Facebook
     print(f"\n📝 Creating Facebook memorial post...")
-    success = poster.post_text_with_image(hero, image_path)
+    success = poster.post_text_with_image(hero, image_path, memorial_text)
     
     if success:
         print(f"\n🎯 SUCCESS!")
@@ -934,4 +1161,7 @@ def main():
     print(f"📝 Post created: {'Yes' if success else 'No'}")
 
 if __name__ == "__main__":
-    main()
+    metrics.start('soldier-fb')
+    snapshot.restore_at_startup()
+    with parse_pool.start():  # PARSE_WORKERS processes parse the pages, if set
+        exit(metrics.finish(main()))
@@ -0,0 +1,22 @@
+"""
+Shared setup for the unit tests.
+
+    python -m pytest            # from the repository root
+"""
+
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    """A fresh FALLEN_STATE_DIR, so tests never touch the real roster or caches"""
+    from fallen import state
+    monkeypatch.setattr(state, 'STATE_DIR', str(tmp_path / 'state'))
+    return state.STATE_DIR
@@ -0,0 +1,41 @@
+import pytest
+
+from fallen import parse_pool
+from fallen.scripts import load_script
+
+SEARCH_PAGE = ('<div class="data-box"><div class="data-box-right">'
+               '<h3><a href="/sgt-a/1">Army Sgt. A</a></h3><span class="blue-bold">July 4, 2007</span>'
+               '</div></div>')
+PROFILE_PAGE = (b'<div class="content-div"><div class="record-image">'
+                b'<img src="https://s3.amazonaws.com/static.militarytimes.com/thefallen/a_lg.jpg"></div></div>'
+                b'<p>Army Sgt. A, 22, of Austin, Texas</p>')
+
+
+@pytest.fixture(scope='module')
+def scraper():
+    return load_script('soldier-fb').MilitaryTimesScraper()
+
+
+@pytest.fixture(scope='module')
+def pool():
+    with parse_pool.start(1) as pool:
+        yield pool
+
+
+def test_without_a_pool_methods_parse_inline(scraper, monkeypatch):
+    monkeypatch.setattr(parse_pool, '_parse_in_worker', None)  # Never reached
+    [hero] = scraper.parse_basic_results(SEARCH_PAGE)
+    assert hero['link'].endswith('/sgt-a/1')
+
+
+def test_pooled_methods_match_inline(scraper, pool):
+    inline = (scraper.parse_basic_results.__wrapped__(scraper, SEARCH_PAGE),
+              scraper.parse_profile_page.__wrapped__(scraper, PROFILE_PAGE))
+    pooled = (scraper.parse_basic_results(SEARCH_PAGE), scraper.parse_profile_page(PROFILE_PAGE))
+    assert pooled == inline
+    assert pooled[1]['image_url'].endswith('/a_lg.jpg')
+
+
+def test_pooled_functions_match_inline(pool):
+    module = load_script('query-fallen')
+    assert module.parse_profile_page(PROFILE_PAGE) == module.parse_profile_page.__wrapped__(PROFILE_PAGE)
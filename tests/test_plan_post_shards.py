@@ -0,0 +1,169 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from fallen.scripts import load_script
+
+DATE = datetime(2024, 7, 4)
+BRANCHES = ['U.S. Army', 'Navy', 'Air Force', 'Marine Corps', 'Coast Guard', '', 'Army National Guard']
+
+
+@pytest.fixture(scope='module')
+def service_all():
+    return load_script('service-all-fb')
+
+
+@pytest.fixture
+def poster(service_all):
+    return service_all.FacebookMultiPoster('token', '123', exchange_token=False)
+
+
+@pytest.fixture
+def limits(service_all, monkeypatch):
+    def set_limits(photos=30, chars=60000):
+        monkeypatch.setattr(service_all, 'MAX_PHOTOS_PER_POST', photos)
+        monkeypatch.setattr(service_all, 'MAX_MESSAGE_CHARS', chars)
+    return set_limits
+
+
+def make_heroes(count, seed=0):
+    rng = random.Random(seed)
+    return [{'name': f"Sgt. {'X' * rng.randint(1, 40)} {index}",
+             'branch': rng.choice(BRANCHES),
+             'date_of_death': rng.choice(['', 'Unknown Date', 'July 4, 2005']),
+             'year': rng.choice(['', 2006]),
+             'location': rng.choice(['', 'Iraq', 'Kandahar, Afghanistan'])} for index in range(count)]
+
+
+def portraits(heroes, every=1):
+    return [{'hero': hero, 'filepath': f"{index}.jpg"} for index, hero in enumerate(heroes) if index % every == 0]
+
+
+def greedy_by_rendering(poster, service_all, heroes, images):
+    """The planner's rule, applied by rendering each candidate post in full"""
+    groups, current, current_images = [], [], []
+    for hero in heroes:
+        hero_images = [img for img in images if img['hero'] is hero]
+        text = poster.create_comprehensive_post_text(current + [hero], DATE, part=(99, 99), total=len(heroes))
+        if current and (len(current_images) + len(hero_images) > service_all.MAX_PHOTOS_PER_POST
+                        or len(text) > service_all.MAX_MESSAGE_CHARS):
+            groups.append(current)
+            current, current_images = [], []
+        current.append(hero)
+        current_images.extend(hero_images)
+    return groups + [current] if current else groups
+
+
+def test_small_day_is_one_post(poster, limits):
+    limits()
+    heroes = make_heroes(5)
+    shards = poster.plan_post_shards(heroes, portraits(heroes), DATE)
+    assert len(shards) == 1
+    assert shards[0]['text'] == poster.create_comprehensive_post_text(heroes, DATE)
+    assert '(1 of' not in shards[0]['text']
+
+
+def test_photo_limit(poster, limits):
+    limits(photos=4)
+    heroes = make_heroes(10)
+    shards = poster.plan_post_shards(heroes, portraits(heroes), DATE)
+    assert [len(shard['image_data']) for shard in shards] == [4, 4, 2]
+    assert [hero for shard in shards for hero in shard['heroes']] == heroes
+    assert [shard['text'].splitlines()[0] for shard in shards] == [
+        f"🇺🇸 HONORING OUR FALLEN HEROES ({index} of 3) 🇺🇸" for index in (1, 2, 3)]
+    assert all('we remember 10 service members' in shard['text'] for shard in shards)  # The day, not the part
+
+
+def test_heroes_without_photos_still_count_against_the_text(poster, limits):
+    limits(photos=2, chars=900)
+    heroes = make_heroes(12)
+    shards = poster.plan_post_shards(heroes, portraits(heroes, every=3), DATE)
+    assert all(len(shard['text']) <= 900 for shard in shards)
+    assert all(len(shard['image_data']) <= 2 for shard in shards)
+    assert [hero for shard in shards for hero in shard['heroes']] == heroes
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_rendering_every_candidate(poster, service_all, limits, seed):
+    rng = random.Random(seed)
+    limits(photos=rng.randint(1, 10), chars=rng.randint(400, 3000))
+    heroes = make_heroes(rng.randint(1, 60), seed)
+    images = portraits(heroes, every=rng.randint(1, 3))
+    shards = poster.plan_post_shards(heroes, images, DATE)
+    assert [shard['heroes'] for shard in shards] == greedy_by_rendering(poster, service_all, heroes, images)
+    for shard in shards:
+        assert shard['text'] == poster.create_comprehensive_post_text(
+            shard['heroes'], DATE, part=(shards.index(shard) + 1, len(shards)) if len(shards) > 1 else None,
+            total=len(heroes))
+
+
+def test_oversized_hero_gets_a_post_of_its_own(poster, limits):
+    limits(chars=700)
+    heroes = make_heroes(3)
+    heroes[1]['location'] = 'Somewhere ' * 80
+    shards = poster.plan_post_shards(heroes, [], DATE)
+    assert [shard['heroes'] for shard in shards] == [[heroes[0]], [heroes[1]], [heroes[2]]]
+
+
+def test_hashtags_follow_each_posts_branches(poster, limits):
+    limits(photos=1)
+    heroes = [{'name': 'Sgt. A', 'branch': 'Army'}, {'name': 'Cpl. B', 'branch': 'Marine Corps'}]
+    first, second = poster.plan_post_shards(heroes, portraits(heroes), DATE)
+    assert '#USArmy' in first['text'] and '#USMC' not in first['text']
+    assert '#USMC' in second['text'] and '#USArmy' not in second['text']
+
+
+def collages(heroes, tiles):
+    """Collages as ImageProcessor.create_collages returns them, one per run of tiles heroes"""
+    return [{'hero': heroes[start], 'heroes': heroes[start:start + tiles], 'filepath': f"collage_{start}.jpg"}
+            for start in range(0, len(heroes), tiles)]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_collages_stay_with_all_their_heroes(poster, service_all, limits, seed):
+    rng = random.Random(seed)
+    limits(photos=rng.randint(1, 3), chars=rng.randint(400, 3000))
+    heroes = make_heroes(rng.randint(1, 60), seed)
+    pictured = [hero for hero in heroes if rng.random() < 0.7]
+    images = collages(pictured, rng.randint(2, 9))
+    shards = poster.plan_post_shards(heroes, images, DATE)
+
+    assert [hero for shard in shards for hero in shard['heroes']] == heroes
+    assert sorted(img['filepath'] for shard in shards for img in shard['image_data']) == \
+        sorted(img['filepath'] for img in images)
+    pictured_ids = {id(hero) for hero in pictured}
+    for shard in shards:
+        in_post = {id(hero) for hero in shard['heroes']}
+        for img in shard['image_data']:
+            assert {id(hero) for hero in img['heroes']} <= in_post
+        if in_post & pictured_ids:
+            assert shard['image_data']
+        assert len(shard['image_data']) <= service_all.MAX_PHOTOS_PER_POST
+
+
+def test_collage_spans_heroes_without_photos(poster, limits):
+    limits(photos=1)
+    heroes = make_heroes(6)
+    images = [{'hero': heroes[0], 'heroes': [heroes[0], heroes[2]], 'filepath': 'collage_1.jpg'},
+              {'hero': heroes[3], 'heroes': [heroes[3], heroes[4]], 'filepath': 'collage_2.jpg'}]
+    shards = poster.plan_post_shards(heroes, images, DATE)
+    assert [shard['heroes'] for shard in shards] == [heroes[0:3], heroes[3:6]]
+    assert [[img['filepath'] for img in shard['image_data']] for shard in shards] == \
+        [['collage_1.jpg'], ['collage_2.jpg']]
+
+
+def test_uploads_are_paced_one_at_a_time(poster, service_all, limits, monkeypatch):
+    limits(photos=2)
+    heroes = make_heroes(5)
+    shards = poster.plan_post_shards(heroes, [dict(img, caption=str(index)) for index, img in
+                                              enumerate(portraits(heroes))], DATE)
+    calls = []
+    monkeypatch.setattr(service_all.tracing, 'sleep', lambda seconds, reason='rate limit': calls.append('pause'))
+    monkeypatch.setattr(poster, 'upload_image_with_caption',
+                        lambda path, caption, temporary=False: calls.append(caption) or f"photo_{caption}")
+    monkeypatch.setattr(poster, 'create_post_with_multiple_images',
+                        lambda text, photo_ids, scheduled_time=None: calls.append(photo_ids) or 'post')
+    assert poster.publish_shards(shards) == ['post'] * 3
+    assert calls == ['0', 'pause', '1', ['photo_0', 'photo_1'], 'pause', '2', 'pause', '3',
+                     ['photo_2', 'photo_3'], 'pause', '4', ['photo_4']]
@@ -0,0 +1,34 @@
+import pytest
+
+from fallen import proxies
+
+
+@pytest.fixture
+def unloaded(monkeypatch):
+    """A pool that hasn't been built yet, configured only by the test"""
+    monkeypatch.setattr(proxies, '_loaded', False)
+    monkeypatch.setattr(proxies, '_pool', None)
+    monkeypatch.setattr(proxies, 'PROXY_POOL', '')
+    monkeypatch.setattr(proxies, 'PROXY_POOL_FILE', None)
+    monkeypatch.delenv('USE_PROXY', raising=False)
+    monkeypatch.setattr(proxies.atexit, 'register', lambda func: None)  # No summary after the tests
+
+
+def test_pool_file_is_read_on_first_use(unloaded, monkeypatch, tmp_path):
+    path = tmp_path / 'proxies.txt'
+    monkeypatch.setattr(proxies, 'PROXY_POOL_FILE', str(path))
+    path.write_text('# office\nhttp://user:secret@a:3128\nhttp://b:3128\n')
+    pool = proxies.current()
+    assert [proxy.url for proxy in pool.proxies] == ['http://user:secret@a:3128', 'http://b:3128']
+    assert proxies.current() is pool
+    assert proxies.display(pool.proxies[0].url) == 'http://a:3128'
+
+
+def test_no_proxies_configured(unloaded):
+    assert proxies.current() is None
+
+
+def test_use_proxy_is_a_pool_of_one(unloaded, monkeypatch):
+    monkeypatch.setenv('USE_PROXY', 'true')
+    monkeypatch.setenv('PROXY_URL', 'http://c:8080')
+    assert [proxy.url for proxy in proxies.current().proxies] == ['http://c:8080']
@@ -0,0 +1,133 @@
+import json
+import pickle
+import threading
+
+import pytest
+
+from fallen.records import HeroRecord, json_default
+
+
+def test_aliases_share_a_slot():
+    hero = HeroRecord(name='Sgt. A', date='July 4, 2007', link='/sgt-a/1', death_location='Iraq')
+    assert hero['date_of_death'] == hero['date'] == hero.date_of_death == 'July 4, 2007'
+    assert hero['profile_url'] == hero['link'] == '/sgt-a/1'
+    assert hero.get('location') == 'Iraq'
+    hero['conflict'] = 'Operation Iraqi Freedom'
+    assert hero['operation'] == 'Operation Iraqi Freedom'
+
+
+def test_to_dict_uses_canonical_names():
+    hero = HeroRecord({'date': 'July 4, 2007', 'link': '/sgt-a/1', 'death_info': 'Died July 4'})
+    assert hero.to_dict() == {'date_of_death': 'July 4, 2007', 'profile_url': '/sgt-a/1',
+                              'death_info': 'Died July 4'}
+    assert json.loads(json.dumps([hero], default=json_default)) == [hero.to_dict()]
+
+
+def test_unset_fields_count_as_missing():
+    hero = HeroRecord(name='Sgt. A')
+    assert 'branch' not in hero
+    assert hero.get('branch', 'none') == 'none'
+    with pytest.raises(KeyError):
+        hero['branch']
+    hero['branch'] = 'Army'
+    del hero['branch']
+    assert 'branch' not in hero
+    assert list(hero.keys()) == ['name']
+
+
+def test_enum_like_values_are_interned():
+    first = HeroRecord(branch=''.join(['Ar', 'my']))
+    second = HeroRecord(branch=''.join(['A', 'rmy']))
+    assert first['branch'] is second['branch']
+
+
+def test_equality_with_dicts():
+    hero = HeroRecord(name='Sgt. A', link='/sgt-a/1')
+    assert hero == {'name': 'Sgt. A', 'profile_url': '/sgt-a/1'}
+    assert hero == HeroRecord(name='Sgt. A', profile_url='/sgt-a/1')
+    assert hero != {'name': 'Sgt. B'}
+
+
+def test_deferred_fields_load_once_on_first_read():
+    calls = []
+
+    def fill(hero):
+        calls.append(hero['name'])
+        hero.update(branch='Army', image_url='http://s3/a.jpg')
+
+    hero = HeroRecord(name='Sgt. A').defer(fill, ('branch', 'image_url'))
+    assert hero['name'] == 'Sgt. A'
+    assert 'profile pending' in repr(hero)
+    assert calls == []
+    assert hero['image_url'] == 'http://s3/a.jpg'
+    assert hero.get('branch') == 'Army'
+    assert calls == ['Sgt. A']
+
+
+def test_iterating_resolves_deferred_fields():
+    hero = HeroRecord(name='Sgt. A').defer(lambda hero: hero.update(unit='1st Bn'), ('unit',))
+    assert hero.to_dict() == {'name': 'Sgt. A', 'unit': '1st Bn'}
+    assert hero.pending is None
+
+
+def test_loader_may_read_its_own_fields():
+    def fill(hero):
+        assert hero.get('branch') is None  # Doesn't recurse into the loader
+        hero['branch'] = 'Navy'
+
+    hero = HeroRecord(name='Sgt. A').defer(fill, ('branch',))
+    assert hero['branch'] == 'Navy'
+
+
+def test_failed_loader_is_not_retried():
+    calls = []
+
+    def fill(hero):
+        calls.append(1)
+        raise RuntimeError('profile unavailable')
+
+    hero = HeroRecord(name='Sgt. A').defer(fill, ('branch',))
+    with pytest.raises(RuntimeError):
+        hero['branch']
+    assert hero.get('branch') is None
+    assert calls == [1]
+
+
+def test_concurrent_readers_share_one_load():
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fill(hero):
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        hero['hometown'] = 'Fresno, Calif.'
+
+    hero = HeroRecord(name='Sgt. A').defer(fill, ('hometown',))
+    results = []
+    readers = [threading.Thread(target=lambda: results.append(hero['hometown'])) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    started.wait(5)
+    release.set()
+    for reader in readers:
+        reader.join(5)
+    assert calls == [1]
+    assert results == ['Fresno, Calif.'] * 4
+
+
+def test_pickles_as_plain_fields():
+    hero = HeroRecord(name='Sgt. A', branch='Army', death_info='Died July 4')
+    copy = pickle.loads(pickle.dumps(hero))
+    assert copy == hero
+    assert copy.get('rank') is None
+    assert copy['death_info'] == 'Died July 4'
+    assert copy['branch'] is hero['branch']  # Interned again on the way in
+
+
+def test_pickling_resolves_deferred_fields():
+    hero = HeroRecord(name='Sgt. A').defer(lambda hero: hero.update(age='22'), ('age',))
+    copy = pickle.loads(pickle.dumps(hero))
+    assert copy.pending is None
+    assert copy['age'] == '22'
@@ -0,0 +1,104 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+from fallen import bundles
+from fallen.scripts import load_script
+
+DAY = datetime(2031, 7, 4)
+HERO = {'name': 'Marine Cpl. A', 'branch': 'Marine Corps', 'profile_url': 'https://thefallen.militarytimes.com/a/1'}
+
+
+class FakePoster:
+    """Records what would have gone to the Graph API"""
+
+    base_url = 'https://graph.example'
+    page_id = '123'
+    access_token = 'token'
+
+    def __init__(self, *args, **kwargs):
+        self.published = []
+        self.scheduled = []
+
+    def publish_shards(self, shards):
+        ids = []
+        for shard in shards:
+            (self.scheduled if shard.get('scheduled_time') else self.published).append(shard['text'])
+            shard['attached'] = len(shard['image_data'])
+            ids.append(f"123_{len(self.published) + len(self.scheduled)}")
+        return ids
+
+    def post_text_with_image(self, hero, image_path, memorial_text=None, scheduled_time=None):
+        (self.scheduled if scheduled_time else self.published).append(memorial_text)
+        return f"123_{len(self.published) + len(self.scheduled)}"
+
+
+@pytest.fixture
+def day(tmp_path, monkeypatch):
+    """Bundles in a temporary directory, the clock on DAY, and scheduling calls stubbed"""
+    monkeypatch.setattr(bundles, 'BUNDLE_DIR', str(tmp_path / 'precomputed'))
+    monkeypatch.setenv('RUN_DATE', DAY.strftime('%Y-%m-%d'))
+    monkeypatch.setenv('FB_ACCESS_TOKEN', 'token')
+    monkeypatch.setenv('FB_PAGE_ID', '123')
+    monkeypatch.setattr(sys, 'argv', ['script'])
+    from fallen import scheduling
+    monkeypatch.setattr(scheduling, 'check_slot', lambda slot: None)
+    monkeypatch.setattr(scheduling, 'get_scheduled_posts', lambda poster: {})
+    monkeypatch.setattr(scheduling, 'verify_scheduled_post', lambda *args, **kwargs: True)
+    return DAY
+
+
+def save(script, payload, image):
+    path = bundles.prepare_bundle_dir(script, DAY)
+    with open(os.path.join(path, image), 'wb') as f:
+        f.write(b'jpeg')
+    bundles.save_bundle(script, DAY, payload, [os.path.join(path, image)])
+
+
+def test_service_all_scheduled_day_is_not_published_again(day, monkeypatch):
+    module = load_script('service-all-fb')
+    save(module.BUNDLE_SCRIPT, {'heroes': [HERO],
+                                'posts': [{'text': 'We remember', 'images': [{'file': 'a.jpg', 'caption': 'A'}]}]},
+         'a.jpg')
+    poster = FakePoster()
+    assert module.schedule(poster, 1, DAY) == []
+    assert poster.scheduled == ['We remember']
+    assert bundles.scheduled_post_ids(module.BUNDLE_SCRIPT, DAY) == ['123_1']
+
+    monkeypatch.setattr(module, 'FacebookMultiPoster', lambda *args, **kwargs: poster)
+    module.main()
+    assert poster.published == []
+
+
+def test_soldier_scheduled_day_is_not_published_again(day, monkeypatch):
+    module = load_script('soldier-fb')
+    save(module.BUNDLE_SCRIPT, {'hero': HERO, 'text': 'We remember', 'image': 'a.jpg'}, 'a.jpg')
+    poster = FakePoster()
+    assert module.schedule(poster, 1, DAY) == []
+    assert poster.scheduled == ['We remember']
+
+    monkeypatch.setattr(module, 'FacebookPoster', lambda *args, **kwargs: poster)
+    module.main()
+    assert poster.published == []
+
+
+def test_scheduled_bundle_survives_precompute_and_staleness(day, monkeypatch):
+    module = load_script('soldier-fb')
+    save(module.BUNDLE_SCRIPT, {'hero': HERO, 'text': 'We remember', 'image': 'a.jpg'}, 'a.jpg')
+    bundles.mark_scheduled(module.BUNDLE_SCRIPT, DAY, ['123_9'])
+
+    assert module.precompute_day(None, None, DAY)  # Doesn't rebuild (no scraper needed)
+    monkeypatch.setattr(bundles, 'BUNDLE_MAX_AGE_DAYS', -1)
+    payload, _ = bundles.load_bundle(module.BUNDLE_SCRIPT, DAY)
+    assert payload['text'] == 'We remember'
+
+
+def test_unscheduled_bundle_is_still_published(day, monkeypatch):
+    module = load_script('soldier-fb')
+    save(module.BUNDLE_SCRIPT, {'hero': HERO, 'text': 'We remember', 'image': 'a.jpg'}, 'a.jpg')
+    poster = FakePoster()
+    monkeypatch.setattr(module, 'FacebookPoster', lambda *args, **kwargs: poster)
+    module.main()
+    assert poster.published == ['We remember']
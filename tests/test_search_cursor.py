@@ -0,0 +1,127 @@
+import re
+
+import pytest
+
+from fallen import search_cursor
+from fallen.search_cursor import SearchCursor, next_page_url, results_range, with_page
+
+SEARCH_URL = 'https://thefallen.militarytimes.com/search?date=2007-07-04'
+
+
+class Page:
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+        self.headers = {'Content-Type': 'text/html; charset=utf-8'}
+
+
+def page(names, first, total, next_href=None):
+    """A search results page listing names, with the site's results header"""
+    last = first + len(names) - 1
+    link = f'<a rel="next" href="{next_href}">Next</a>' if next_href else ''
+    items = ''.join(f'<li>{name}</li>' for name in names)
+    return f'<p>Showing {first} - {last} of {total:,} results</p><ul>{items}</ul>{link}'
+
+
+def parse(html):
+    return re.findall(r'<li>(.*?)</li>', html)
+
+
+class Site:
+    """Serves numbered pages of a five-result search, two results per page"""
+
+    def __init__(self, fail_on=None, status=200):
+        self.requested = []
+        self.fail_on = fail_on
+        self.status = status
+
+    def get(self, url, timeout=None):
+        self.requested.append(url)
+        number = int(dict(part.split('=') for part in url.split('?')[1].split('&')).get('page', 1))
+        if number == self.fail_on:
+            if self.status == 200:
+                raise ConnectionError('reset by peer')
+            return Page('', self.status)
+        names = [f'hero{n}' for n in range(2 * number - 1, min(2 * number, 5) + 1)]
+        return Page(page(names, 2 * number - 1, 5))
+
+
+def test_results_range():
+    assert results_range('Showing 26 - 50 of 1,212 results') == (26, 50, 1212)
+    assert results_range('No results') is None
+
+
+def test_with_page_replaces_existing_page():
+    url = with_page(f'{SEARCH_URL}&page=2', 3)
+    assert url.count('page=') == 1 and url.endswith('page=3')
+
+
+def test_next_page_prefers_rel_next():
+    html = page(['a'], 1, 5, next_href='/search?date=2007-07-04&amp;offset=1')
+    assert next_page_url(html, SEARCH_URL, 1) == 'https://thefallen.militarytimes.com/search?date=2007-07-04&offset=1'
+    assert next_page_url(page(['e'], 5, 5), SEARCH_URL, 3) is None
+
+
+def test_follows_every_page():
+    site = Site()
+    cursor = SearchCursor(SEARCH_URL, site.get, parse)
+    assert cursor.fetch_all() == ['hero1', 'hero2', 'hero3', 'hero4', 'hero5']
+    assert cursor.complete
+    assert cursor.total == 5
+    assert len(site.requested) == 3
+
+
+def test_first_page_is_not_fetched_again():
+    site = Site()
+    cursor = SearchCursor(SEARCH_URL, site.get, parse, first_page=page(['hero1', 'hero2'], 1, 5))
+    assert cursor.count() == 5
+    assert site.requested == []
+    assert list(cursor) == ['hero1', 'hero2', 'hero3', 'hero4', 'hero5']
+    assert len(site.requested) == 2
+
+
+def test_nth_fetches_only_the_pages_it_needs():
+    site = Site()
+    cursor = SearchCursor(SEARCH_URL, site.get, parse)
+    assert cursor.nth(2) == 'hero3'
+    assert len(site.requested) == 2
+    assert not cursor.complete
+    assert cursor.nth(10) is None
+    assert cursor.complete
+
+
+def test_failed_page_ends_the_walk_incomplete():
+    cursor = SearchCursor(SEARCH_URL, Site(fail_on=2).get, parse)
+    assert cursor.fetch_all() == ['hero1', 'hero2']
+    assert not cursor.complete
+
+
+def test_blocked_page_ends_the_walk_incomplete():
+    site = Site(fail_on=3, status=429)
+    cursor = SearchCursor(SEARCH_URL, site.get, parse)
+    assert cursor.fetch_all() == ['hero1', 'hero2', 'hero3', 'hero4']
+    assert not cursor.complete
+    assert cursor.fetch_all() == ['hero1', 'hero2', 'hero3', 'hero4']
+    assert len(site.requested) == 3  # The failed page isn't retried
+
+
+def test_page_cap(monkeypatch):
+    monkeypatch.setattr(search_cursor, 'MAX_SEARCH_PAGES', 2)
+    cursor = SearchCursor(SEARCH_URL, Site().get, parse)
+    assert cursor.fetch_all() == ['hero1', 'hero2', 'hero3', 'hero4']
+    assert not cursor.complete
+
+
+def test_pages_without_parse_function():
+    cursor = SearchCursor(SEARCH_URL, Site().get)
+    assert [parse(html) for html in cursor.pages()] == [['hero1', 'hero2'], ['hero3', 'hero4'], ['hero5']]
+
+
+@pytest.mark.parametrize('cursor, complete', [
+    (SearchCursor.from_entries(['hero1', 'hero2']), True),
+    (SearchCursor.failed(), False),
+])
+def test_finished_cursors(cursor, complete):
+    assert cursor.complete is complete
+    assert cursor.fetch_all() == cursor.entries
+    assert cursor.nth(5) is None
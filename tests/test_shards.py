@@ -0,0 +1,88 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from fallen import roster, shards
+
+START = datetime(2003, 3, 20)
+END = datetime(2004, 6, 30)
+
+
+def hero(slug, date, **fields):
+    return {'name': slug.replace('-', ' ').title(), 'date_of_death': date,
+            'profile_url': f'https://thefallen.militarytimes.com/{slug}/1', **fields}
+
+
+def all_days():
+    return [START + timedelta(days=offset) for offset in range((END - START).days + 1)]
+
+
+def write(tmp_path, index, count, heroes):
+    path = str(tmp_path / shards.default_path(index, count))
+    days = len(shards.shard_days(all_days(), index, count))
+    shards.write_partial(path, heroes, index, count, START, END, days)
+    return path
+
+
+@pytest.mark.parametrize('count', [1, 3, 4])
+def test_every_day_is_in_exactly_one_shard(count):
+    days = all_days()
+    split = [shards.shard_days(days, index, count) for index in range(count)]
+    assert sorted(day for part in split for day in part) == days
+    months = [{shards.month_number(day) for day in part} for part in split]
+    assert sum(len(part) for part in months) == len(set().union(*months))  # Whole months per shard
+
+
+def test_shard_ownership_does_not_depend_on_the_range():
+    day = datetime(2004, 1, 15)
+    owners = [index for index in range(4) if shards.shard_days(all_days(), index, 4).count(day)]
+    assert owners == [index for index in range(4) if shards.shard_days([day], index, 4)]
+    assert len(owners) == 1
+
+
+def test_partial_round_trip(tmp_path):
+    path = write(tmp_path, 0, 2, [hero('sgt-b', 'May 2, 2003'), hero('sgt-a', 'April 1, 2003'),
+                                  hero('sgt-a', 'April 1, 2003'), {'name': 'No link'}])
+    data = shards.read_partial(path)
+    assert data['shard']['index'] == 0 and data['shard']['count'] == 2
+    assert [record['id'] for record in data['heroes']] == ['/sgt-a/1', '/sgt-b/1']
+
+
+def test_read_partial_rejects_other_files(tmp_path):
+    path = tmp_path / 'roster.json'
+    path.write_text(json.dumps({'version': roster.ROSTER_VERSION, 'heroes': []}))
+    with pytest.raises(ValueError):
+        shards.read_partial(str(path))
+
+
+def test_missing_shards():
+    header = {'count': 3, 'start': '2003-03-20', 'end': '2004-06-30'}
+    assert shards.missing_shards([{**header, 'index': index} for index in range(3)]) == []
+    assert shards.missing_shards([{**header, 'index': 0}, {**header, 'index': 2}]) == \
+        ['2003-03-20 to 2004-06-30 is missing shard(s) 1 of 3']
+    other_run = {**header, 'end': '2005-01-01', 'index': 0}
+    assert 'shards come from 2 different runs' in shards.missing_shards([{**header, 'index': 0}, other_run])
+
+
+def test_merge_folds_shards_into_the_roster(tmp_path, state_dir):
+    first = write(tmp_path, 0, 2, [hero('sgt-a', 'April 1, 2003', branch='Army'),
+                                   hero('sgt-c', 'April 9, 2003', hometown='Austin, Texas')])
+    second = write(tmp_path, 1, 2, [hero('sgt-b', 'May 2, 2003', branch='Marine Corps'),
+                                    hero('sgt-c', 'April 9, 2003', branch='Navy')])
+    index = roster.Roster()
+    assert shards.merge([first, second], index) == 4  # Three new heroes, then sgt-c updated
+
+    record = index.records['/sgt-c/1']
+    assert record['branch'] == 'Navy' and record['state'] == 'TX'  # What both shards found
+    assert [found['id'] for found in index.query(branch='marines')] == ['/sgt-b/1']
+
+    assert shards.merge([first, second], index) == 0  # Merging again changes nothing
+    saved = roster.Roster().load()
+    assert sorted(saved.records) == ['/sgt-a/1', '/sgt-b/1', '/sgt-c/1']
+
+
+def test_incomplete_merge_warns(tmp_path, state_dir, capsys):
+    path = write(tmp_path, 1, 3, [hero('sgt-a', 'April 1, 2003')])
+    shards.merge([path], roster.Roster())
+    assert 'missing shard(s) 0, 2 of 3' in capsys.readouterr().out
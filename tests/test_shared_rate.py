@@ -0,0 +1,85 @@
+import os
+
+import pytest
+
+from fallen import priority, shared_rate
+
+pytestmark = pytest.mark.skipif(shared_rate.fcntl is None, reason="the shared limiter needs fcntl")
+
+
+@pytest.fixture
+def now(monkeypatch):
+    """Wall clock seen by the buckets, advanced by hand"""
+    clock = [1_000_000.0]
+    monkeypatch.setattr(shared_rate.time, 'time', lambda: clock[0])
+    return clock
+
+
+@pytest.fixture
+def bucket(tmp_path, now):
+    return shared_rate.Bucket('thefallen.militarytimes.com', rate=2, burst=2, directory=str(tmp_path))
+
+
+def test_burst_then_paced(bucket):
+    assert bucket.reserve() == (True, 0.0)
+    assert bucket.reserve() == (True, 0.0)
+    assert bucket.reserve() == (True, pytest.approx(0.5))
+    assert bucket.reserve() == (True, pytest.approx(1.0))  # Queued behind the previous reservation
+
+
+def test_tokens_refill_up_to_the_burst(bucket, now):
+    bucket.reserve()
+    bucket.reserve()
+    now[0] += 0.5
+    assert bucket.reserve() == (True, 0.0)
+    now[0] += 60
+    assert [bucket.reserve()[1] for _ in range(3)] == [0.0, 0.0, pytest.approx(0.5)]
+
+
+def test_without_borrowing_an_empty_bucket_takes_nothing(bucket):
+    bucket.reserve()
+    bucket.reserve()
+    taken, wait = bucket.reserve(borrow=False)
+    assert not taken and wait == pytest.approx(0.5)
+    assert bucket.reserve(borrow=False) == (False, pytest.approx(0.5))
+    assert bucket.reserve() == (True, pytest.approx(0.5))  # Still next in line
+
+
+def test_pause_holds_every_caller(bucket, now):
+    bucket.pause(10)
+    assert bucket.reserve(borrow=False) == (False, pytest.approx(10.5))
+    assert bucket.reserve() == (True, pytest.approx(10.5))
+    now[0] += 11
+    assert bucket.reserve() == (True, 0.0)
+
+
+def test_processes_share_the_file(tmp_path, now):
+    first = shared_rate.Bucket('example.com:8080', rate=1, burst=1, directory=str(tmp_path))
+    second = shared_rate.Bucket('example.com:8080', rate=1, burst=1, directory=str(tmp_path))
+    assert first.path == second.path and ':' not in os.path.basename(first.path)
+    assert first.reserve() == (True, 0.0)
+    assert second.reserve() == (True, pytest.approx(1.0))
+    second.pause(5)
+    assert first.reserve(borrow=False)[0] is False
+
+
+def test_wait_only_borrows_for_critical_requests(monkeypatch, tmp_path, now):
+    monkeypatch.setattr(shared_rate, 'SHARED_RATE', 1.0)
+    monkeypatch.setattr(shared_rate, 'SHARED_RATE_DIR', str(tmp_path))
+    monkeypatch.setattr(shared_rate, '_buckets', {})
+    sleeps = []
+
+    def sleep(seconds, name=None):
+        sleeps.append(seconds)
+        now[0] += seconds
+    monkeypatch.setattr(shared_rate.tracing, 'sleep', sleep)
+    monkeypatch.setattr(shared_rate, 'SHARED_BURST', 1.0)
+
+    shared_rate.wait('example.com')
+    shared_rate.wait('example.com')
+    assert sleeps == [pytest.approx(1.0)]  # Borrowed the next token and slept until it was due
+
+    sleeps.clear()
+    with priority.level(priority.BACKFILL):
+        shared_rate.wait('example.com')
+    assert len(sleeps) == 1 and 1.0 <= sleeps[0] <= 1.5  # Waited for a free token, with jitter
@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+
+from fallen import singleflight
+
+
+class Counter:
+    def __init__(self, value='page'):
+        self.calls = 0
+        self.value = value
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_finished_results_are_kept():
+    group = singleflight.Group('test')
+    fetch = Counter()
+    assert group.do('a', fetch) == 'page'
+    assert group.do('a', fetch) == 'page'
+    assert fetch.calls == 1
+
+
+def test_results_failing_keep_run_again():
+    group = singleflight.Group('test')
+    fetch = Counter(None)
+    group.do('a', fetch)
+    group.do('a', fetch)
+    assert fetch.calls == 2
+
+    fetch = Counter(503)
+    group.do('b', fetch, keep=lambda status: status == 200)
+    group.do('b', fetch, keep=lambda status: status == 200)
+    assert fetch.calls == 2
+
+
+def test_errors_are_raised_and_not_kept():
+    group = singleflight.Group('test')
+
+    def fail():
+        raise ConnectionError('reset')
+
+    with pytest.raises(ConnectionError):
+        group.do('a', fail)
+    assert group.do('a', Counter()) == 'page'
+
+
+@pytest.fixture
+def coalesced(monkeypatch):
+    """Callers that joined a running call so far (counted as they start waiting)"""
+    joined = []
+    monkeypatch.setattr(singleflight.metrics, 'count', lambda name, amount=1: joined.append(name))
+    return joined
+
+
+def run_concurrently(group, func, callers, coalesced):
+    """Call group.do('a', func, keep=never) from several threads; func runs once they have all joined"""
+    outcomes = []
+    started, release = threading.Event(), threading.Event()
+
+    def held():
+        started.set()
+        release.wait(5)
+        return func()
+
+    def call():
+        try:
+            outcomes.append(group.do('a', held, keep=lambda value: False))
+        except Exception as e:
+            outcomes.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    while len(coalesced) < callers - 1 and any(thread.is_alive() for thread in threads):
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return outcomes
+
+
+def test_concurrent_callers_share_one_call(coalesced):
+    group = singleflight.Group('test')
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return object()
+
+    outcomes = run_concurrently(group, fetch, 5, coalesced)
+    assert len(calls) == 1
+    assert len(outcomes) == 5 and all(outcome is outcomes[0] for outcome in outcomes)
+    assert not group.results  # Not kept, so they really shared the call
+
+
+def test_concurrent_callers_share_the_error(coalesced):
+    group = singleflight.Group('test')
+
+    def fetch():
+        raise TimeoutError('slow')
+
+    outcomes = run_concurrently(group, fetch, 3, coalesced)
+    assert len(outcomes) == 3 and all(isinstance(outcome, TimeoutError) for outcome in outcomes)
+
+
+def test_lru_evicts_oldest():
+    group = singleflight.Group('test', maxsize=2)
+    for key in 'abc':
+        group.do(key, Counter(key))
+    group.do('b', Counter())  # Refreshes b
+    group.do('d', Counter('d'))
+    assert list(group.results) == ['b', 'd']
+
+
+def test_weight_limit():
+    group = singleflight.Group('test', max_weight=10, weigh=len)
+    group.do('big', Counter('x' * 11))
+    assert 'big' not in group.results
+    group.do('a', Counter('x' * 6))
+    group.do('b', Counter('x' * 6))
+    assert list(group.results) == ['b']
+    assert group.weight == 6
+    group.forget('b')
+    assert group.weight == 0 and not group.results
+
+
+def test_coalesce_hands_out_copies():
+    calls = []
+
+    @singleflight.coalesce('test_profile')
+    def scrape(url):
+        calls.append(url)
+        return {'url': url}
+
+    first = scrape('/a/1')
+    first['name'] = 'changed'
+    assert scrape('/a/1') == {'url': '/a/1'}
+    assert calls == ['/a/1']
+
+
+def test_coalesced_methods_share_results_across_instances():
+    class Scraper:
+        calls = []
+
+        @singleflight.coalesce('test_method', method=True)
+        def scrape(self, url, timeout=30):
+            Scraper.calls.append((url, timeout))
+            return {'url': url}
+
+    first, second = Scraper(), Scraper()
+    assert first.scrape('/a/1') == second.scrape('/a/1') == {'url': '/a/1'}
+    assert Scraper.calls == [('/a/1', 30)]
+
+    assert second.scrape('/a/1', timeout=5) == {'url': '/a/1'}  # Keyword arguments are part of the key
+    assert Scraper.calls == [('/a/1', 30), ('/a/1', 5)]
+    assert Scraper.scrape.__wrapped__(first, '/a/1') == {'url': '/a/1'}
+    assert len(Scraper.calls) == 3
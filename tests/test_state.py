@@ -0,0 +1,43 @@
+import json
+import os
+import stat
+
+import pytest
+
+from fallen import roster, state
+
+
+def test_write_json_replaces_the_file(tmp_path):
+    path = tmp_path / 'roster.json'
+    path.write_text('{"old": true}')
+    state.write_json(str(path), {'heroes': []})
+    assert json.loads(path.read_text()) == {'heroes': []}
+    assert os.listdir(tmp_path) == ['roster.json']
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / 'roster.json'
+    path.write_text('{"old": true}')
+    with pytest.raises(TypeError):
+        state.write_json(str(path), {'unserializable': object()})
+    assert json.loads(path.read_text()) == {'old': True}
+    assert os.listdir(tmp_path) == ['roster.json']
+
+
+def test_roster_saves_use_their_own_temporary_files(state_dir, monkeypatch):
+    written = []
+    replace = os.replace
+
+    def record(src, dst):
+        written.append(src)
+        replace(src, dst)
+    monkeypatch.setattr(state.os, 'replace', record)
+
+    first, second = roster.Roster(), roster.Roster()
+    first.add({'name': 'Sgt A', 'profile_url': 'https://thefallen.militarytimes.com/sgt-a/1'})
+    second.add({'name': 'Sgt B', 'profile_url': 'https://thefallen.militarytimes.com/sgt-b/1'})
+    first.save()
+    second.save()
+    assert len(set(written)) == 2 and all(os.path.dirname(src) == state.STATE_DIR for src in written)
+    assert sorted(roster.Roster().load().records) == ['/sgt-b/1']  # The last save wins, whole
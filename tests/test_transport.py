@@ -0,0 +1,37 @@
+import json
+from urllib.parse import parse_qs, urlsplit
+
+from fallen import transport
+
+SECRETS = ['EAAlive', 'exchange-me', 'app-secret', 'proof']
+
+
+def test_redact_url_drops_every_secret_parameter():
+    url = transport.redact_url('https://graph.facebook.com/oauth/access_token?grant_type=fb_exchange_token'
+                               '&fb_exchange_token=exchange-me&client_id=42&client_secret=app-secret'
+                               '&appsecret_proof=proof&access_token=EAAlive')
+    assert parse_qs(urlsplit(url).query) == {'grant_type': ['fb_exchange_token'], 'client_id': ['42']}
+
+
+def test_redact_json_body():
+    body = json.dumps({'access_token': 'EAAlive', 'id': '123',
+                       'data': [{'client_secret': 'app-secret'}],
+                       'paging': {'next': 'https://graph.facebook.com/123/feed?limit=25&access_token=EAAlive'}})
+    redacted = transport.redact_body(body.encode())
+    assert not any(secret.encode() in redacted for secret in SECRETS)
+    data = json.loads(redacted)
+    assert data['id'] == '123' and data['access_token'] == transport.REDACTED
+    assert parse_qs(urlsplit(data['paging']['next']).query)['limit'] == ['25']
+
+
+def test_redact_form_body():
+    redacted = transport.redact_body(b'access_token=EAAlive&token_type=bearer&expires=5183999')
+    assert parse_qs(redacted.decode()) == {'access_token': [transport.REDACTED], 'token_type': ['bearer'],
+                                           'expires': ['5183999']}
+
+
+def test_other_bodies_are_unchanged():
+    html = b'<p>Ask for an access_token=... in the docs</p>'
+    assert transport.redact_body(html) is html
+    image = b'\xff\xd8\xff access_token= \xff'
+    assert transport.redact_body(image) is image